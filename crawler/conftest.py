@@ -0,0 +1 @@
+# Makes the crawler directory importable for tests/ (as the container's WORKDIR is for scripts/).
@@ -1,52 +1,131 @@
+import functools
 import os
 import re
+import threading
+from collections import OrderedDict
+
 import requests
-from bs4 import BeautifulSoup
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
+
+# Prefer selectolax (lexbor backend, C parser + CSS selectors); fall back to lxml + XPath.
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None  # type: ignore[assignment,misc]
+from lxml import etree
+from lxml import html as lh
 
 BASE_WEB = "https://www.moltbook.com"
 
-def _get(url: str) -> str:
+# Compiled once; each scrape is a handful of C-level XPath evaluations over one parse.
+_XP_X_LINK = etree.XPath("(//a[contains(@href,'x.com/') or contains(@href,'twitter.com/')])[1]/@href")
+_XP_SIMILAR_HDR = etree.XPath("boolean(//text()[contains(., 'Similar Agents')])")
+_XP_U_LINKS = etree.XPath("//a[starts-with(@href,'/u/')]/@href")
+_CSS_X_LINK = 'a[href*="x.com/"], a[href*="twitter.com/"]'
+_CSS_SIMILAR_HDR = '*:lexbor-contains("Similar Agents")'
+_CSS_U_LINKS = 'a[href^="/u/"]'
+_SIMILAR_MARKER = "Similar Agents"
+_X_HANDLE_RE = re.compile(r"(?:x|twitter)\.com/([^/?#]+)")
+_SIM_RE = re.compile(r"^/u/([^/?#]+)")
+
+# Module-level Session so repeated scrapes reuse keep-alive connections.
+_SESSION: Optional[requests.Session] = None
+
+def _default_session() -> requests.Session:
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = requests.Session()
+    return _SESSION
+
+_CACHE_SIZE = int(os.getenv("SCRAPE_CACHE", "4096"))
+
+# url -> (etag, last_modified, body); lets cache misses revalidate with a 304
+_etag_cache: "OrderedDict[str, Tuple[Optional[str], Optional[str], str]]" = OrderedDict()
+_etag_lock = threading.Lock()
+
+def _get(url: str, session: Optional[requests.Session] = None) -> str:
     headers = {"User-Agent": os.getenv("USER_AGENT", "MoltGraphCrawler/0.1")}
-    r = requests.get(url, headers=headers, timeout=30)
+    with _etag_lock:
+        cached = _etag_cache.get(url)
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    r = (session or _default_session()).get(url, headers=headers, timeout=30)
+    if r.status_code == 304 and cached:
+        return cached[2]
     r.raise_for_status()
+
+    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _etag_lock:
+            _etag_cache[url] = (etag, last_modified, r.text)
+            _etag_cache.move_to_end(url)
+            while len(_etag_cache) > _CACHE_SIZE:
+                _etag_cache.popitem(last=False)
     return r.text
 
-def scrape_agent_page(agent_name: str) -> Dict[str, object]:
+def _extract_links(html: str) -> Tuple[Optional[str], bool, List[str]]:
+    """
+    Returns (first X link, has "Similar Agents" section, all "/u/..." hrefs).
+    """
+    # Raw substring probe first: most profiles have no similar section, and a str
+    # search is far cheaper than a DOM text query. The DOM check only confirms it.
+    maybe_similar = _SIMILAR_MARKER in html
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        a = tree.css_first(_CSS_X_LINK)
+        x_link = a.attributes.get("href") if a is not None else None
+        has_similar = maybe_similar and tree.css_first(_CSS_SIMILAR_HDR) is not None
+        hrefs = [n.attributes.get("href") or "" for n in tree.css(_CSS_U_LINKS)] if has_similar else []
+        return x_link, has_similar, hrefs
+
+    doc = lh.fromstring(html)
+    x_links = _XP_X_LINK(doc)
+    has_similar = maybe_similar and bool(_XP_SIMILAR_HDR(doc))
+    hrefs = [str(h) for h in _XP_U_LINKS(doc)] if has_similar else []
+    return (str(x_links[0]) if x_links else None), has_similar, hrefs
+
+def _scrape_agent_page_uncached(agent_name: str) -> Dict[str, object]:
     """
     Best-effort scrape of:
       - Human owner X handle/link (if present)
       - Similar agents (names + any visible tags)
     This is NOT guaranteed stable; keep behind SCRAPE_AGENT_HTML=1.
     """
-    html = _get(f"{BASE_WEB}/u/{agent_name}")
-    soup = BeautifulSoup(html, "lxml")
+    return _parse_agent_page(agent_name, _get(f"{BASE_WEB}/u/{agent_name}"))
+
+def _parse_agent_page(agent_name: str, html: str) -> Dict[str, object]:
+    x_link, has_similar, hrefs = _extract_links(html)
 
     out: Dict[str, object] = {}
 
-    # Human owner: look for x.com / twitter.com links
-    x_link = None
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        if "x.com/" in href or "twitter.com/" in href:
-            x_link = href
-            break
+    # Human owner: first x.com / twitter.com link
     if x_link:
-        m = re.search(r"(x\.com|twitter\.com)/([^/?#]+)", x_link)
+        m = _X_HANDLE_RE.search(x_link)
         if m:
-            out["owner_x_handle"] = m.group(2)
+            out["owner_x_handle"] = m.group(1)
             out["owner_x_url"] = x_link
 
-    # Similar agents: find "/u/<name>" links near "Similar Agents"
-    similar: List[str] = []
-    text = soup.get_text(" ", strip=True)
-    if "Similar Agents" in text:
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if href.startswith("/u/"):
-                name = href.split("/u/")[1].split("/")[0]
-                if name and name.lower() != agent_name.lower():
-                    similar.append(name)
-    out["similar_agents"] = sorted(set(similar))
+    # Similar agents: find "/u/<name>" links when the page has a "Similar Agents" section
+    # one pass into a set; the sort below gives a stable order
+    similar: Set[str] = set()
+    if has_similar:
+        self_lower = agent_name.lower()
+        for href in hrefs:
+            m = _SIM_RE.match(href)
+            if m:
+                name = m.group(1)
+                if name.lower() != self_lower:
+                    similar.add(name)
+    out["similar_agents"] = sorted(similar)
 
     return out
+
+
+# Per-process memo keyed by agent name (SCRAPE_CACHE entries). Callers must treat
+# the returned dict as read-only since it is shared between hits.
+scrape_agent_page = functools.lru_cache(maxsize=_CACHE_SIZE)(_scrape_agent_page_uncached)
@@ -1,15 +1,82 @@
 import os
+import random
+import threading
 import time
 import requests
 import urllib.parse
-from typing import Any, Dict, List, Optional, Union
+from email.utils import parsedate_to_datetime
+from collections import deque
+from enum import Enum
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
+
+try:
+    import orjson
+
+    json_loads: Callable[[Union[bytes, str]], Any] = orjson.loads
+except ImportError:  # stdlib fallback; same containers, just slower
+    import json
+
+    json_loads = json.loads
+
+# Fallback key orders for response-shape drift (tuples: no per-call allocation)
+_POSTS_KEYS = ("posts", "data")
+_COMMENTS_KEYS = ("comments", "data")
+_MODERATORS_KEYS = ("moderators", "data")
+
+class _StreamReader:
+    """File-like view over a streamed urllib3 body with already-consumed leading bytes put back."""
+
+    def __init__(self, head: bytes, raw: Any):
+        self._head = head
+        self._raw = raw
+
+    def read(self, n: int = -1) -> bytes:
+        if n == 0:  # ijson probes read(0) to detect bytes vs str
+            return b""
+        if self._head:
+            out, self._head = self._head, b""
+            return out
+        try:
+            return self._raw.read(n if n > 0 else None, decode_content=True)
+        except Exception as e:
+            raise requests.exceptions.ChunkedEncodingError(str(e)) from e
+
+
+class StreamDecodeError(requests.exceptions.ChunkedEncodingError):
+    """A streamed list body broke after some items were already yielded, so it can't be retried in place."""
+
+
+_Outcome = Enum("_Outcome", "OK RETRY FAIL REDIRECT")
+_REDIRECT_CODES = frozenset((301, 302, 303, 307, 308))
+_RETRY_CODES = frozenset((408, 429, 502, 503, 504))
+
+try:
+    import ijson
+except ImportError:  # streaming is an optimization; fall back to whole-body parsing
+    ijson = None
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised by MoltbookClient._req while the circuit breaker is open (upstream outage)."""
 
 class MoltbookClient:
     """
     Drop-in replacement Moltbook API client with:
-      - rate limiting (REQUESTS_PER_MINUTE)
-      - retry + exponential backoff for 429/502/503/504
+      - token-bucket rate limiting (REQUESTS_PER_MINUTE, burst up to BURST_CAPACITY),
+        drained early when X-RateLimit-Remaining hits 0
+      - persistent Session (keep-alive + connection pooling, POOL_MAXSIZE)
+      - optional ETag / Last-Modified revalidation cache (HTTP_CACHE=1, needs `cachecontrol`)
+      - optional HTTP/2 multiplexed transport (MOLTBOOK_HTTP2=1, needs `httpx[http2]`)
+      - retry + exponential backoff (decorrelated jitter) for 429/502/503/504
+      - circuit breaker that fails fast after CB_THRESHOLD consecutive outage failures
       - response-shape tolerant helpers for list endpoints
+      - map()/imap() for bounded concurrent fan-out sharing the Session + rate limiter
+      - streaming (ijson) decode of large top-level JSON arrays (> STREAM_MIN_BYTES)
     """
 
     def __init__(self):
@@ -17,115 +84,486 @@ class MoltbookClient:
         self.api_key = os.getenv("MOLTBOOK_API_KEY")
         self.ua = os.getenv("USER_AGENT", "MoltGraphCrawler/0.1")
         self.rpm = int(os.getenv("REQUESTS_PER_MINUTE", "80"))
-        self._min_interval = 60.0 / max(self.rpm, 1)
-        self._last = 0.0
+        # Token bucket: refill at rpm/60 tokens/sec, allow bursts up to capacity.
+        self._capacity = float(max(int(os.getenv("BURST_CAPACITY", str(self.rpm))), 1))
+        self._refill_rate = max(self.rpm, 1) / 60.0
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Retry config (read once; _req is hot)
+        self._max_tries = int(os.getenv("MAX_RETRIES", "8"))
+        self._backoff_base = float(os.getenv("RETRY_BACKOFF_SECONDS", "1.5"))
+        # (connect, read): a dead host fails in seconds, a slow body still gets time.
+        # Tune HTTP_READ_TIMEOUT to slightly above the observed p95 response time.
+        self._connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+        self._read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", os.getenv("HTTP_TIMEOUT_SECONDS", "60")))
+        self._timeout = (self._connect_timeout, self._read_timeout)
+        # Per-instance RNG so backoff jitter doesn't depend on global seed state
+        self._rng = random.Random()
+
+        # Circuit breaker: closed -> open (fail fast) -> half_open (one probe) -> closed
+        self._cb_threshold = max(int(os.getenv("CB_THRESHOLD", "5")), 1)
+        self._cb_base_cooldown = float(os.getenv("CB_COOLDOWN_SECONDS", "5"))
+        self._cb_state = "closed"
+        self._cb_fail_count = 0
+        self._cb_trips = 0
+        self._cb_open_until = 0.0
+        self._cb_probing = False
+        self._cb_lock = threading.Lock()
+
+        # Whether GET /posts?ids=a,b,... is honored (None = not probed yet)
+        self._multi_id_posts: Optional[bool] = None
+
+        # One Session per client: reuses TCP/TLS connections across calls.
+        # max_retries=0 because retries are handled in _req.
+        self.session = requests.Session()
+        self.pool_maxsize = int(os.getenv("POOL_MAXSIZE", "32"))
+        pool_kwargs = {
+            "pool_connections": 4,
+            "pool_maxsize": self.pool_maxsize,
+            "max_retries": 0,
+        }
+        self.http_cache = os.getenv("HTTP_CACHE", "0") == "1"
+        self._stream_min_bytes = int(os.getenv("STREAM_MIN_BYTES", str(64 * 1024)))
+        adapter: HTTPAdapter
+        if self.http_cache:
+            # Stores responses carrying ETag/Last-Modified and revalidates them with
+            # If-None-Match/If-Modified-Since; a 304 is served from the local cache.
+            from cachecontrol import CacheControlAdapter
+            from cachecontrol.caches.file_cache import FileCache
+
+            adapter = CacheControlAdapter(cache=FileCache(os.getenv("HTTP_CACHE_DIR", ".httpcache")), **pool_kwargs)
+        else:
+            adapter = HTTPAdapter(**pool_kwargs)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Static request headers, built once per instance
+        self._base_headers: Dict[str, str] = {
+            "User-Agent": self.ua,
+            "Accept": "application/json",
+            "Accept-Encoding": os.getenv("ACCEPT_ENCODING", "gzip, deflate"),
+        }
+        if not self.http_cache:
+            # Without a local cache, force fresh responses from any intermediate cache.
+            self._base_headers["Cache-Control"] = "no-cache"
+            self._base_headers["Pragma"] = "no-cache"
+        self._auth_headers: Dict[str, str] = dict(self._base_headers)
+        if self.api_key:
+            self._auth_headers["Authorization"] = f"Bearer {self.api_key}"
+
+        # Optional HTTP/2 transport: concurrent workers share multiplexed connections.
+        # Errors are mapped onto requests' exception types so callers are unchanged.
+        self._httpx = None
+        if os.getenv("MOLTBOOK_HTTP2", "0") == "1":
+            import httpx
+
+            self._httpx = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=64),
+            )
 
     def _sleep_if_needed(self):
-        now = time.time()
-        dt = now - self._last
-        if dt < self._min_interval:
-            time.sleep(self._min_interval - dt)
-        self._last = time.time()
+        # Sleeping under the lock is intentional: concurrent callers queue up
+        # behind it so the global rate stays within budget.
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._refill_rate)
+            self._last_refill = now
+            if self._tokens < 1.0:
+                time.sleep((1.0 - self._tokens) / self._refill_rate)
+                self._tokens = 0.0
+                self._last_refill = time.monotonic()
+            else:
+                self._tokens -= 1.0
+
+    # --------------------------
+    # Circuit breaker
+    # --------------------------
+    def _cb_check(self, probe: bool = False) -> bool:
+        """
+        Raise CircuitOpenError unless a request may go out now. While half_open only one
+        caller is let through; it gets True back, passes probe=True when re-checking within
+        the same call, and ends in _cb_success/_cb_failure (or _cb_release if neither).
+        """
+        with self._cb_lock:
+            if self._cb_state == "open":
+                if time.monotonic() < self._cb_open_until:
+                    raise CircuitOpenError(f"circuit open for {self._cb_open_until - time.monotonic():.1f}s more")
+                self._cb_state = "half_open"
+                self._cb_probing = False
+            if self._cb_state != "half_open":
+                return False
+            if self._cb_probing and not probe:
+                raise CircuitOpenError("circuit half-open; probe in flight")
+            self._cb_probing = True
+            return True
+
+    def _cb_release(self, probe: bool) -> None:
+        # The probe ended without a verdict (e.g. a 4xx): let the next caller probe instead
+        if probe:
+            with self._cb_lock:
+                if self._cb_state == "half_open":
+                    self._cb_probing = False
+
+    def _cb_success(self) -> None:
+        with self._cb_lock:
+            self._cb_state = "closed"
+            self._cb_probing = False
+            self._cb_fail_count = 0
+            self._cb_trips = 0
+
+    def _cb_failure(self) -> None:
+        with self._cb_lock:
+            self._cb_fail_count += 1
+            if self._cb_state == "half_open" or self._cb_fail_count >= self._cb_threshold:
+                cooldown = min(self._cb_base_cooldown * (2 ** self._cb_trips), 60.0)
+                self._cb_trips += 1
+                self._cb_state = "open"
+                self._cb_open_until = time.monotonic() + cooldown
+                self._cb_fail_count = 0
+                self._cb_probing = False
+                print(f"[http] circuit open for {cooldown:.1f}s after repeated failures")
+
+    def _next_backoff(self, prev: float) -> float:
+        # "Decorrelated jitter": spreads concurrent retries instead of lockstep doubling
+        return min(60.0, self._rng.uniform(self._backoff_base, max(prev * 3, self._backoff_base)))
+
+    @staticmethod
+    def _retry_after_seconds(value: str) -> Optional[float]:
+        """Parse Retry-After as delta-seconds or an HTTP-date (RFC 7231)."""
+        try:
+            return max(float(value), 1.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 1.0)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+
+    @staticmethod
+    def _reset_seconds(headers: Any) -> Optional[float]:
+        """
+        X-RateLimit-Reset / RateLimit-Reset as seconds from now. Deployments send epoch
+        milliseconds, epoch seconds or a delta in seconds; an epoch already past gives 0.
+        """
+        value = headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset")
+        if not value:
+            return None
+        try:
+            val = float(value)
+        except ValueError:
+            return None
+        if val > 1e12:  # epoch ms
+            val /= 1000.0
+        if val >= 1e9:  # epoch seconds
+            return max(val - time.time(), 0.0)
+        return max(val, 0.0)
+
+    @staticmethod
+    def _keeps_auth(src: str, dst: str) -> bool:
+        """
+        Whether Authorization may follow a redirect from src to dst.
+        Same host (ignoring a leading "www.") and no https -> http downgrade.
+        """
+        a, b = urllib.parse.urlsplit(src), urllib.parse.urlsplit(dst)
+        if a.scheme == "https" and b.scheme != "https":
+            return False
+        ha = (a.hostname or "").removeprefix("www.")
+        hb = (b.hostname or "").removeprefix("www.")
+        return ha == hb
+
+    def _send(self, method: str, url: str, *, headers: Dict[str, Any], params: Any, timeout: Tuple[float, float]) -> Any:
+        if self._httpx is None:
+            return self.session.request(method, url, headers=headers, params=params, timeout=timeout, allow_redirects=False)
+        import httpx
+
+        connect, read = timeout
+        try:
+            return self._httpx.request(method, url, headers=headers, params=params,
+                                       timeout=httpx.Timeout(read, connect=connect), follow_redirects=False)
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    @staticmethod
+    def _raise_for_status(r: Any) -> None:
+        if isinstance(r, requests.Response):
+            r.raise_for_status()
+        elif r.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{r.status_code} Error for url: {r.url}", response=r)
+
+    @staticmethod
+    def _classify(r: Any, hops: int) -> "_Outcome":
+        code = r.status_code
+        if code in _REDIRECT_CODES:
+            return _Outcome.REDIRECT if hops < 3 and r.headers.get("Location") else _Outcome.OK
+        if code in _RETRY_CODES or code >= 500:
+            return _Outcome.RETRY
+        if code >= 400:
+            return _Outcome.FAIL
+        return _Outcome.OK
+
+    def _rate_limit_wait(self, r: Any, backoff: float) -> float:
+        # Prefer standard header
+        ra = r.headers.get("Retry-After")
+        wait = self._retry_after_seconds(ra) if ra else None
+        if wait is not None:
+            return wait
+        # Some deployments use this custom header
+        reset = self._reset_seconds(r.headers)
+        if reset is not None:
+            return max(reset, 1.0)
+        # Fallback: guaranteed cooldown (prevents hammering)
+        return min(max(backoff, 10.0), 60.0)
 
-    def _req(self, method: str, path: str, params=None, *, no_auth: bool = False, extra_headers: Optional[Dict[str, Any]] = None) -> Any:
+    @staticmethod
+    def _window_pause(r: Any) -> float:
+        """
+        Seconds to hold off when X-RateLimit-Remaining says the server's window is spent
+        (until X-RateLimit-Reset, capped at 60s); 0 while requests remain or without headers.
+        """
+        try:
+            if float(r.headers.get("X-RateLimit-Remaining", 1)) > 0:
+                return 0.0
+        except ValueError:
+            return 0.0
+        return min(MoltbookClient._reset_seconds(r.headers) or 0.0, 60.0)
+
+    def _observe_rate_limit(self, r: Any) -> None:
+        # Drain the bucket into debt so every worker waits out the server's window in
+        # _sleep_if_needed, instead of each spending a request on a 429 first.
+        pause = self._window_pause(r)
+        if pause:
+            with self._lock:
+                self._tokens = min(self._tokens, -pause * self._refill_rate)
+
+    @staticmethod
+    def _is_outage(e: requests.exceptions.RequestException) -> bool:
+        # 4xx means the server answered; only transport errors and 5xx count against the breaker
+        resp = getattr(e, "response", None)
+        return resp is None or resp.status_code >= 500
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T], workers: Optional[int] = None, *, return_exceptions: bool = False) -> List[Any]:
+        """
+        Run fn over items on a thread pool; results are returned in input order.
+        The token bucket still caps global RPM, so this only overlaps latency.
+        Workers default to min(POOL_MAXSIZE, rpm) so the urllib3 pool never overflows.
+        With return_exceptions=True, per-item exceptions are returned in place of results.
+        """
+        items = list(items)
+        if not items:
+            return []
+        n = max(1, min(workers or min(self.pool_maxsize, self.rpm), self.pool_maxsize, len(items)))
+
+        def _call(x: T) -> Any:
+            try:
+                return fn(x)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        if n == 1:
+            return [_call(x) for x in items]
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            return list(ex.map(_call, items))
+
+    def imap(self, fn: Callable[[T], R], items: Iterable[T], workers: Optional[int] = None, *, return_exceptions: bool = False) -> Iterable[Any]:
+        """
+        Streaming map(): yields results in input order as they complete, keeping at most
+        2 x workers calls in flight, so long inputs start producing results immediately
+        and the caller can do its own (e.g. Neo4j) work between them.
+        """
+        n = max(1, min(workers or min(self.pool_maxsize, self.rpm), self.pool_maxsize))
+
+        def _call(x: T) -> Any:
+            try:
+                return fn(x)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        if n == 1:
+            for x in items:
+                yield _call(x)
+            return
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            pending: Deque[Future] = deque()
+            for x in items:
+                pending.append(ex.submit(_call, x))
+                if len(pending) >= 2 * n:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _req(self, method: str, path: str, params=None, *, no_auth: bool = False, extra_headers: Optional[Dict[str, Any]] = None, first: Any = None) -> Any:
         """
         Returns parsed JSON. Can be dict or list depending on endpoint.
+        `first` is a response (body already read) or RequestException from a send the caller
+        already made for this request; it is classified as attempt 1 instead of re-sending.
 
         Important gotchas (observed in the wild):
           - Some Moltbook API deployments issue redirects (e.g., adding a trailing slash or switching hosts).
             The `requests` library drops `Authorization` on cross-host redirects for safety.
             To avoid silently becoming "anonymous", we do *not* follow redirects automatically.
+            Redirects are followed manually (up to 3 hops); Authorization is kept within the same
+            site (e.g. moltbook.com <-> www.moltbook.com) and dropped for any other host.
         """
+        # `first` was sent by a caller that already passed (and owns) the breaker check
+        probe = self._cb_check() if first is None else False
+
         url = f"{self.base}{path}"
-        headers = {
-            "User-Agent": self.ua,
-            "Accept": "application/json",
-            "Accept-Encoding": os.getenv("ACCEPT_ENCODING", "gzip, deflate"),
-            "Cache-Control": "no-cache",
-            "Pragma": "no-cache",
-        }
-        if self.api_key and not no_auth:
-            headers["Authorization"] = f"Bearer {self.api_key}"
+        # Shared prebuilt dicts; never mutated below (redirects build a copy)
+        headers = self._auth_headers if (self.api_key and not no_auth) else self._base_headers
         if extra_headers:
-            headers.update(extra_headers)
+            headers = {**headers, **extra_headers}
 
-        max_tries = int(os.getenv("MAX_RETRIES", "8"))
-        backoff = float(os.getenv("RETRY_BACKOFF_SECONDS", "1.5"))
-        timeout = int(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+        max_tries = self._max_tries
+        timeout = self._timeout
+        backoff = self._backoff_base
+        attempt = 0  # counts real attempts; redirect hops are free
+        hops = 0
 
-        last_exc = None
+        try:
+            while True:
+                if first is None:
+                    self._sleep_if_needed()
+                    try:
+                        r = self._send(method, url, headers=headers, params=params, timeout=timeout)
+                    except requests.exceptions.RequestException as e:
+                        r = e
+                else:
+                    r, first = first, None
+                if isinstance(r, requests.exceptions.RequestException):
+                    r, outcome, exc = None, _Outcome.RETRY, r
+                else:
+                    outcome, exc = self._classify(r, hops), None
+                    self._observe_rate_limit(r)
 
-        def _do_request(final_url: str):
-            self._sleep_if_needed()
-            return requests.request(method, final_url, headers=headers, params=params, timeout=timeout, allow_redirects=False)
+                if outcome is _Outcome.REDIRECT:
+                    # Manual redirect handling (preserve params; headers minus cross-site auth)
+                    nxt_url = urllib.parse.urljoin(url, r.headers["Location"])
+                    if "Authorization" in headers and not self._keeps_auth(url, nxt_url):
+                        headers = {k: v for k, v in headers.items() if k != "Authorization"}
+                    url = nxt_url
+                    hops += 1
+                    continue
 
-        for attempt in range(1, max_tries + 1):
-            try:
-                r = _do_request(url)
-
-                # Manual redirect handling (preserve headers + params)
-                if r.status_code in (301, 302, 303, 307, 308):
-                    loc = r.headers.get("Location")
-                    if loc:
-                        # Join relative redirects and retry once immediately
-                        url2 = urllib.parse.urljoin(url, loc)
-                        r = _do_request(url2)
-
-                # Retryable status codes
-                if r.status_code in (429, 502, 503, 504):
-                    if r.status_code == 429:
-                        # Prefer standard header
-                        ra = r.headers.get("Retry-After")
-                        if ra:
-                            try:
-                                time.sleep(max(float(ra), 1.0))
-                                continue
-                            except Exception:
-                                pass
-
-                        # Some deployments use this custom header
-                        reset = r.headers.get("X-RateLimit-Reset")
-                        if reset:
-                            try:
-                                wait = max(float(reset) - time.time(), 1.0)
-                                time.sleep(wait)
-                                continue
-                            except Exception:
-                                pass
-
-                        # Fallback: guaranteed cooldown (prevents hammering)
-                        time.sleep(min(max(backoff, 10.0), 60.0))
-                        continue
-
-                    if attempt < max_tries:
-                        time.sleep(backoff)
-                        backoff = min(backoff * 2, 60.0)
-                        continue
-
-                r.raise_for_status()
-
-                if not r.content:
-                    return {}
-                return r.json()
+                if outcome is _Outcome.OK:
+                    try:
+                        data = json_loads(r.content) if r.content else {}
+                    except ValueError as e:
+                        # keep parity with r.json(): undecodable bodies go through the retry path
+                        outcome, exc = _Outcome.RETRY, requests.exceptions.InvalidJSONError(str(e), response=r)
+                    else:
+                        self._cb_success()
+                        return data
 
-            except requests.exceptions.RequestException as e:
-                last_exc = e
-                if attempt < max_tries:
-                    time.sleep(backoff)
-                    backoff = min(backoff * 2, 60.0)
+                if outcome is _Outcome.FAIL:
+                    # Non-retryable 4xx: not an outage, but not proof of recovery either,
+                    # so the breaker is left as it is
+                    self._raise_for_status(r)
+
+                # RETRY
+                attempt += 1
+                if attempt >= max_tries:
+                    if exc is None:
+                        try:
+                            self._raise_for_status(r)
+                        except requests.exceptions.HTTPError as e:
+                            exc = e
+                    if exc is not None and self._is_outage(exc):
+                        self._cb_failure()
+                    raise exc if exc is not None else RuntimeError("Request failed with unknown error")
+
+                if isinstance(exc, requests.exceptions.ConnectTimeout):
+                    # Nothing was sent, so retry straight away; the breaker (not backoff)
+                    # stops a dead host from eating the remaining attempts.
+                    self._cb_failure()
+                    probe = self._cb_check(probe)
                     continue
-                raise
+                if r is not None and r.status_code == 429:
+                    time.sleep(self._rate_limit_wait(r, backoff))
+                else:
+                    backoff = self._next_backoff(backoff)
+                    time.sleep(backoff)
+        finally:
+            self._cb_release(probe)
+
+    def _iter_req(self, method: str, path: str, params=None, *, no_auth: bool = False, keys: Sequence[str] = _POSTS_KEYS) -> Iterable[Dict[str, Any]]:
+        """
+        Yield the items of a list response.
+        Large (Content-Length > STREAM_MIN_BYTES) top-level JSON arrays are decoded item by
+        item from the socket instead of buffering the body and then parsing it. Anything
+        else (small, dict-shaped, non-200, HTTP/2 or cached transport) is parsed whole.
+        The response in hand goes through _req's classify/retry/backoff path rather than
+        being sent again; a body that breaks before any item is yielded is retried there
+        too. Breaking after that raises StreamDecodeError (see get_comments).
+        """
+        if ijson is None or self._httpx is not None or self.http_cache:
+            yield from self._list_from(self._req(method, path, params=params, no_auth=no_auth), keys)
+            return
 
-        if last_exc:
-            raise last_exc
-        raise RuntimeError("Request failed with unknown error")
+        probe = self._cb_check()
+        try:
+            headers = self._auth_headers if (self.api_key and not no_auth) else self._base_headers
+            self._sleep_if_needed()
+            try:
+                r = self.session.request(method, f"{self.base}{path}", headers=headers, params=params,
+                                         timeout=self._timeout, allow_redirects=False, stream=True)
+            except requests.exceptions.RequestException as e:
+                r = e
 
+            if isinstance(r, Exception) or r.status_code != 200 or int(r.headers.get("Content-Length") or 0) <= self._stream_min_bytes:
+                if not isinstance(r, Exception):
+                    # buffer the (small or error) body: releases the connection, and _req reads .content
+                    try:
+                        r.content
+                    except requests.exceptions.RequestException as e:
+                        r.close()
+                        r = e
+                yield from self._list_from(self._req(method, path, params=params, no_auth=no_auth, first=r), keys)
+                return
+
+            self._observe_rate_limit(r)
+            yielded = False
+            try:
+                with r:
+                    reader = _StreamReader(b"", r.raw)
+                    head = reader.read(1)
+                    while head.isspace():
+                        head = reader.read(1)
+                    if head != b"[":
+                        # dict-shaped: key order is unknown up front, so parse whole
+                        items = self._list_from(json_loads(head + reader.read()), keys)
+                    else:
+                        items = ijson.items(_StreamReader(head, r.raw), "item", use_float=True)
+                    for item in items:
+                        yield item
+                        yielded = True
+            except (requests.exceptions.RequestException, ValueError, ijson.JSONError) as e:
+                if yielded:
+                    raise StreamDecodeError(f"streamed body broke mid-list: {e}") from e
+                # nothing handed out yet: the failed attempt goes through _req's retry path
+                exc = e if isinstance(e, requests.exceptions.RequestException) else requests.exceptions.InvalidJSONError(str(e), response=r)
+                yield from self._list_from(self._req(method, path, params=params, no_auth=no_auth, first=exc), keys)
+                return
+            # only once the whole body decoded
+            self._cb_success()
+        finally:
+            self._cb_release(probe)
 
     # --------------------------
     # Response-shape helpers
     # --------------------------
     @staticmethod
-    def _list_from(resp: Any, preferred_keys: List[str]) -> List[Dict[str, Any]]:
+    def _list_from(resp: Any, preferred_keys: Sequence[str]) -> List[Dict[str, Any]]:
         """
         Extract a list from a response that may be dict or list.
         """
@@ -139,7 +577,7 @@ class MoltbookClient:
         return []
 
     @staticmethod
-    def _dict_from(resp: Any, preferred_keys: List[str]) -> Dict[str, Any]:
+    def _dict_from(resp: Any, preferred_keys: Sequence[str]) -> Dict[str, Any]:
         if isinstance(resp, dict):
             for k in preferred_keys:
                 v = resp.get(k)
@@ -149,11 +587,12 @@ class MoltbookClient:
 
     # --- Agents ---
     def get_me(self) -> Dict[str, Any]:
-        resp = self._req("GET", "/agents/me")
+        # Personalized + mutable; never serve from cache
+        resp = self._req("GET", "/agents/me", extra_headers={"Cache-Control": "no-cache"})
         # Observed shape: {"agent": {...}}
         if isinstance(resp, dict) and isinstance(resp.get("agent"), dict):
             return resp["agent"]
-        return self._dict_from(resp, ["agent"])
+        return {} if not isinstance(resp, dict) else resp
 
     def get_agent_profile(self, name: str) -> Dict[str, Any]:
         # Observed shape: {"agent": {...}, ...} (you already use prof.get("agent", {}))
@@ -161,7 +600,10 @@ class MoltbookClient:
         return resp if isinstance(resp, dict) else {}
 
     # --- Submolts ---
-    def list_submolts(self, limit: int = 100, offset: int = 0, sort: str = "popular", *, shuffle: bool = True, no_auth: bool = True) -> Dict[str, Any]:
+    # `shuffle=True` appends a ms-timestamp cache-buster. It guarantees a miss at every
+    # CDN / proxy / local cache, so it is opt-in: use it only when a cache is known to
+    # serve stale pages (e.g. ignoring `offset`).
+    def list_submolts(self, limit: int = 100, offset: int = 0, sort: str = "popular", *, shuffle: bool = False, no_auth: bool = True) -> Dict[str, Any]:
         # Observed shape: {"success": true, "submolts": [...], "count": ..., "total_posts": ...}
         limit = max(1, min(int(limit), 100))
         offset = max(0, int(offset))
@@ -169,22 +611,25 @@ class MoltbookClient:
         if shuffle:
             params["shuffle"] = int(time.time() * 1000)
         resp = self._req("GET", "/submolts", params=params, no_auth=no_auth)
-        return resp if isinstance(resp, dict) else {"submolts": self._list_from(resp, ["submolts", "data"])}
+        return resp if isinstance(resp, dict) else {"submolts": resp if isinstance(resp, list) else []}
 
     def get_submolt(self, name: str) -> Dict[str, Any]:
         # Observed (likely): {"submolt": {...}}
         resp = self._req("GET", f"/submolts/{name}")
         if isinstance(resp, dict) and isinstance(resp.get("submolt"), dict):
             return resp["submolt"]
-        return self._dict_from(resp, ["submolt"])
+        return {} if not isinstance(resp, dict) else resp
 
     def get_moderators(self, name: str) -> List[Dict[str, Any]]:
         # Observed (likely): {"moderators": [...]}
         resp = self._req("GET", f"/submolts/{name}/moderators")
-        return self._list_from(resp, ["moderators", "data"])
+        mods = resp.get("moderators") if isinstance(resp, dict) else None
+        if isinstance(mods, list):
+            return mods
+        return self._list_from(resp, _MODERATORS_KEYS)
 
     # --- Posts / Comments ---
-    def list_posts(self, sort: str = "new", limit: int = 50, offset: int = 0, submolt: Optional[str] = None, *, time_window: Optional[str] = None, shuffle: bool = True, no_auth: bool = True) -> Dict[str, Any]:
+    def list_posts(self, sort: str = "new", limit: int = 50, offset: int = 0, submolt: Optional[str] = None, *, time_window: Optional[str] = None, shuffle: bool = False, no_auth: bool = True) -> Dict[str, Any]:
         # Observed shape: {"success": true, "posts":[...], "count":..., "has_more":..., "next_offset":...}
         limit = max(1, min(int(limit), 50))
         offset = max(0, int(offset))
@@ -196,25 +641,80 @@ class MoltbookClient:
         if shuffle:
             params["shuffle"] = int(time.time() * 1000)
         resp = self._req("GET", "/posts", params=params, no_auth=no_auth)
-        return resp if isinstance(resp, dict) else {"posts": self._list_from(resp, ["posts", "data"])}
+        return resp if isinstance(resp, dict) else {"posts": resp if isinstance(resp, list) else []}
 
     def get_post(self, post_id: str) -> Dict[str, Any]:
         # Observed (likely): {"post": {...}}
         resp = self._req("GET", f"/posts/{post_id}")
         if isinstance(resp, dict) and isinstance(resp.get("post"), dict):
             return resp["post"]
-        return self._dict_from(resp, ["post"])
+        return {} if not isinstance(resp, dict) else resp
 
-    def get_comments(self, post_id: str, sort: str = "new", limit: int = 500, *, shuffle: bool = True, no_auth: bool = True) -> List[Dict[str, Any]]:
+    def get_comments(self, post_id: str, sort: str = "new", limit: int = 500, *, shuffle: bool = False, no_auth: bool = True) -> List[Dict[str, Any]]:
         # Observed: endpoint returns list directly; also support dict fallback
+        try:
+            return list(self.iter_comments(post_id, sort=sort, limit=limit, shuffle=shuffle, no_auth=no_auth))
+        except StreamDecodeError as e:
+            # broke after part of the list was decoded: refetch whole via _req (e counts as attempt 1)
+            params = {"sort": sort, "limit": limit}
+            if shuffle:
+                params["shuffle"] = int(time.time() * 1000)
+            resp = self._req("GET", f"/posts/{post_id}/comments", params=params, no_auth=no_auth, first=e)
+            return self._list_from(resp, _COMMENTS_KEYS)
+
+    def iter_comments(self, post_id: str, sort: str = "new", limit: int = 500, *, shuffle: bool = False, no_auth: bool = True) -> Iterable[Dict[str, Any]]:
+        """Like get_comments, but yields top-level comments as they are decoded (large bodies are streamed)."""
         params = {"sort": sort, "limit": limit}
         if shuffle:
             params["shuffle"] = int(time.time() * 1000)
-        resp = self._req("GET", f"/posts/{post_id}/comments", params=params, no_auth=no_auth)
-        return self._list_from(resp, ["comments", "data"])
+        return self._iter_req("GET", f"/posts/{post_id}/comments", params=params, no_auth=no_auth, keys=_COMMENTS_KEYS)
+
+    def _get_posts_multi(self, ids: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        One GET /posts?ids=... round-trip. Returns None if the server doesn't honor `ids`
+        (HTTP or transport error, open circuit, or it answers with posts we didn't ask for,
+        e.g. the default feed).
+        """
+        try:
+            resp = self._req("GET", "/posts", params={"ids": ",".join(ids), "limit": len(ids)})
+        except (requests.exceptions.RequestException, CircuitOpenError):
+            # only an optimisation: any failure falls back to per-id get_post()
+            return None
+        posts = self._list_from(resp, _POSTS_KEYS)
+        wanted = set(ids)
+        if not posts or any(not isinstance(p, dict) or p.get("id") not in wanted for p in posts):
+            return None
+        return posts
+
+    def get_posts_batch(self, post_ids: Iterable[str], chunk: int = 50, *, return_exceptions: bool = False) -> Dict[str, Any]:
+        """
+        post_id -> post dict for many ids.
+        Uses the multi-id /posts query when the deployment supports it (probed once per
+        instance); otherwise falls back to concurrent get_post() calls via map().
+        Ids the multi-id query doesn't return are fetched individually.
+        With return_exceptions=True, failed ids map to their exception (e.g. a 404 HTTPError).
+        """
+        ids = list(dict.fromkeys(i for i in post_ids if i))
+        out: Dict[str, Any] = {}
+        if self._multi_id_posts is not False:
+            for i in range(0, len(ids), chunk):
+                part = ids[i:i + chunk]
+                posts = self._get_posts_multi(part)
+                if posts is None:
+                    if self._multi_id_posts is None:
+                        self._multi_id_posts = False
+                    break
+                self._multi_id_posts = True
+                for p in posts:
+                    out[p["id"]] = p
+
+        missing = [i for i in ids if i not in out]
+        for pid, res in zip(missing, self.map(self.get_post, missing, return_exceptions=return_exceptions)):
+            out[pid] = res
+        return out
 
     # --- Personalized feed ---
     def get_feed(self, sort: str = "hot", limit: int = 100, offset: int = 0) -> Dict[str, Any]:
         # Some deployments use {"posts":[...]} others may use {"data":[...]}
         resp = self._req("GET", "/feed", params={"sort": sort, "limit": limit, "offset": offset})
-        return resp if isinstance(resp, dict) else {"posts": self._list_from(resp, ["posts", "data"])}
+        return resp if isinstance(resp, dict) else {"posts": resp if isinstance(resp, list) else []}
@@ -0,0 +1,402 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+import urllib.parse
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, TypeVar
+
+import aiohttp
+import requests
+
+from moltbook_client import (
+    MoltbookClient,
+    _COMMENTS_KEYS,
+    _MODERATORS_KEYS,
+    _Outcome,
+    json_loads,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()  # imap() end-of-stream sentinel
+
+
+class _Response:
+    """
+    Buffered aiohttp response exposing the attributes MoltbookClient's helpers read
+    (status_code / headers / content / url), so errors surface as requests.HTTPError
+    with a usable `.response` exactly like the sync client.
+    """
+
+    __slots__ = ("status_code", "headers", "content", "url")
+
+    def __init__(self, status_code: int, headers: Any, content: bytes, url: str):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+
+class AsyncMoltbookClient:
+    """
+    asyncio/aiohttp port of MoltbookClient for overlapping many requests on one loop:
+      - async token-bucket rate limiting (REQUESTS_PER_MINUTE, BURST_CAPACITY)
+      - same retry / redirect / circuit-breaker semantics as MoltbookClient._req
+      - bounded concurrency via MAX_CONCURRENCY (asyncio.Semaphore)
+    Use as `async with AsyncMoltbookClient() as c: ...`, or `c.run("get_post", pid)` /
+    `c.imap(c.get_post, ids)` from synchronous code.
+    """
+
+    def __init__(self):
+        self.base = os.getenv("MOLTBOOK_BASE_URL", "https://www.moltbook.com/api/v1").rstrip("/")
+        self.api_key = os.getenv("MOLTBOOK_API_KEY")
+        self.ua = os.getenv("USER_AGENT", "MoltGraphCrawler/0.1")
+        self.rpm = int(os.getenv("REQUESTS_PER_MINUTE", "80"))
+        self._capacity = float(max(int(os.getenv("BURST_CAPACITY", str(self.rpm))), 1))
+        self._refill_rate = max(self.rpm, 1) / 60.0
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+        self._max_tries = int(os.getenv("MAX_RETRIES", "8"))
+        self._backoff_base = float(os.getenv("RETRY_BACKOFF_SECONDS", "1.5"))
+        self._connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+        self._read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", os.getenv("HTTP_TIMEOUT_SECONDS", "60")))
+        self._rng = random.Random()
+
+        self._cb_threshold = max(int(os.getenv("CB_THRESHOLD", "5")), 1)
+        self._cb_base_cooldown = float(os.getenv("CB_COOLDOWN_SECONDS", "5"))
+        self._cb_state = "closed"
+        self._cb_fail_count = 0
+        self._cb_trips = 0
+        self._cb_open_until = 0.0
+        self._cb_probing = False
+
+        self.concurrency = max(int(os.getenv("MAX_CONCURRENCY", "32")), 1)
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        self._base_headers: Dict[str, str] = {
+            "User-Agent": self.ua,
+            "Accept": "application/json",
+            "Accept-Encoding": os.getenv("ACCEPT_ENCODING", "gzip, deflate"),
+            "Cache-Control": "no-cache",
+            "Pragma": "no-cache",
+        }
+        self._auth_headers: Dict[str, str] = dict(self._base_headers)
+        if self.api_key:
+            self._auth_headers["Authorization"] = f"Bearer {self.api_key}"
+
+    # --------------------------
+    # Lifecycle
+    # --------------------------
+    async def __aenter__(self) -> "AsyncMoltbookClient":
+        self._ensure_session()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        # Loop-bound primitives are created lazily inside the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=64, limit_per_host=32)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._lock = asyncio.Lock()
+            self._sem = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def run(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Sync shim: run one endpoint coroutine on a fresh loop (and session)."""
+        async def _main() -> Any:
+            async with self:
+                return await getattr(self, method)(*args, **kwargs)
+
+        return asyncio.run(_main())
+
+    def imap(self, fn: Callable[[T], Awaitable[R]], items: Iterable[T], workers: Optional[int] = None, *, return_exceptions: bool = False) -> Iterable[Any]:
+        """
+        Sync generator over fn(x) results in input order, driven by an event loop on a
+        background thread: drop-in for MoltbookClient.imap when the caller's own work
+        (e.g. Neo4j writes) is synchronous. At most 2 x workers (default MAX_CONCURRENCY)
+        calls are in flight, and a slow consumer backs up the loop through a bounded queue.
+        """
+        n = max(int(workers or self.concurrency), 1)
+        out: "queue.Queue[Any]" = queue.Queue(maxsize=2 * n)
+        stop = threading.Event()
+
+        def _put(item: Any) -> None:
+            # runs in the loop's default executor so a full queue never blocks the loop
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        async def _call(x: T) -> Any:
+            try:
+                return await fn(x)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        async def _main() -> None:
+            loop = asyncio.get_running_loop()
+            async with self:
+                window: Deque["asyncio.Task[Any]"] = deque()
+                for x in items:
+                    if stop.is_set():
+                        break
+                    window.append(asyncio.ensure_future(_call(x)))
+                    if len(window) >= 2 * n:
+                        await loop.run_in_executor(None, _put, (True, await window.popleft()))
+                while window and not stop.is_set():
+                    await loop.run_in_executor(None, _put, (True, await window.popleft()))
+                for t in window:
+                    t.cancel()
+
+        def _thread() -> None:
+            try:
+                asyncio.run(_main())
+            except BaseException as e:
+                _put((False, e))
+            _put(_DONE)
+
+        threading.Thread(target=_thread, name="moltbook-aio", daemon=True).start()
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    return
+                ok, value = item
+                if not ok:
+                    raise value
+                yield value
+        finally:
+            stop.set()
+
+    # --------------------------
+    # Rate limit / breaker / backoff
+    # --------------------------
+    async def _sleep_if_needed(self) -> None:
+        assert self._lock is not None
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._refill_rate)
+            self._last_refill = now
+            # _observe_rate_limit doesn't take this lock: debt recorded during the sleep
+            # must survive, so refill and re-check rather than reset to 0
+            while self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self._refill_rate)
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._refill_rate)
+                self._last_refill = now
+            self._tokens -= 1.0
+
+    # Single-threaded event loop: no lock needed around breaker state
+    _cb_check = MoltbookClient._cb_check
+    _cb_release = MoltbookClient._cb_release
+    _cb_success = MoltbookClient._cb_success
+    _cb_failure = MoltbookClient._cb_failure
+    _next_backoff = MoltbookClient._next_backoff
+    _rate_limit_wait = MoltbookClient._rate_limit_wait
+    _window_pause = staticmethod(MoltbookClient._window_pause)
+    _keeps_auth = staticmethod(MoltbookClient._keeps_auth)
+    _classify = staticmethod(MoltbookClient._classify)
+    _raise_for_status = staticmethod(MoltbookClient._raise_for_status)
+    _is_outage = staticmethod(MoltbookClient._is_outage)
+    _retry_after_seconds = staticmethod(MoltbookClient._retry_after_seconds)
+    _reset_seconds = staticmethod(MoltbookClient._reset_seconds)
+    _list_from = staticmethod(MoltbookClient._list_from)
+
+    def _observe_rate_limit(self, r: _Response) -> None:
+        # See MoltbookClient._observe_rate_limit; no await in between, so no lock needed
+        pause = self._window_pause(r)
+        if pause:
+            self._tokens = min(self._tokens, -pause * self._refill_rate)
+
+    @property
+    def _cb_lock(self) -> "_NullLock":
+        return _NULL_LOCK
+
+    async def _send(self, method: str, url: str, *, headers: Dict[str, str], params: Any) -> _Response:
+        session = self._ensure_session()
+        try:
+            async with session.request(
+                method,
+                url,
+                headers=headers,
+                params=params,
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(sock_connect=self._connect_timeout, sock_read=self._read_timeout),
+            ) as r:
+                body = await r.read()
+                return _Response(r.status, r.headers, body, str(r.url))
+        except aiohttp.ConnectionTimeoutError as e:
+            raise requests.exceptions.ConnectTimeout(str(e)) from e
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.ReadTimeout(str(e)) from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    async def _req(self, method: str, path: str, params=None, *, no_auth: bool = False, extra_headers: Optional[Dict[str, Any]] = None) -> Any:
+        """Async port of MoltbookClient._req (see there for redirect/auth notes)."""
+        self._ensure_session()
+        assert self._sem is not None
+        probe = self._cb_check()
+
+        url = f"{self.base}{path}"
+        headers = self._auth_headers if (self.api_key and not no_auth) else self._base_headers
+        if extra_headers:
+            headers = {**headers, **extra_headers}
+
+        backoff = self._backoff_base
+        attempt = 0
+        hops = 0
+
+        try:
+            async with self._sem:
+                while True:
+                    await self._sleep_if_needed()
+                    try:
+                        r: Optional[_Response] = await self._send(method, url, headers=headers, params=params)
+                        outcome = self._classify(r, hops)
+                    except requests.exceptions.RequestException as e:
+                        r, outcome, exc = None, _Outcome.RETRY, e
+                    else:
+                        exc = None
+                        self._observe_rate_limit(r)
+
+                    if outcome is _Outcome.REDIRECT:
+                        nxt_url = urllib.parse.urljoin(url, r.headers["Location"])
+                        if "Authorization" in headers and not self._keeps_auth(url, nxt_url):
+                            headers = {k: v for k, v in headers.items() if k != "Authorization"}
+                        url = nxt_url
+                        hops += 1
+                        continue
+
+                    if outcome is _Outcome.OK:
+                        try:
+                            data = json_loads(r.content) if r.content else {}
+                        except ValueError as e:
+                            outcome, exc = _Outcome.RETRY, requests.exceptions.InvalidJSONError(str(e), response=r)
+                        else:
+                            self._cb_success()
+                            return data
+
+                    if outcome is _Outcome.FAIL:
+                        self._raise_for_status(r)
+
+                    attempt += 1
+                    if attempt >= self._max_tries:
+                        if exc is None:
+                            try:
+                                self._raise_for_status(r)
+                            except requests.exceptions.HTTPError as e:
+                                exc = e
+                        if exc is not None and self._is_outage(exc):
+                            self._cb_failure()
+                        raise exc if exc is not None else RuntimeError("Request failed with unknown error")
+
+                    if isinstance(exc, requests.exceptions.ConnectTimeout):
+                        self._cb_failure()
+                        probe = self._cb_check(probe)
+                        continue
+                    if r is not None and r.status_code == 429:
+                        await asyncio.sleep(self._rate_limit_wait(r, backoff))
+                    else:
+                        backoff = self._next_backoff(backoff)
+                        await asyncio.sleep(backoff)
+        finally:
+            self._cb_release(probe)
+
+    # --- Agents ---
+    async def get_me(self) -> Dict[str, Any]:
+        resp = await self._req("GET", "/agents/me", extra_headers={"Cache-Control": "no-cache"})
+        if isinstance(resp, dict) and isinstance(resp.get("agent"), dict):
+            return resp["agent"]
+        return {} if not isinstance(resp, dict) else resp
+
+    async def get_agent_profile(self, name: str) -> Dict[str, Any]:
+        resp = await self._req("GET", "/agents/profile", params={"name": name})
+        return resp if isinstance(resp, dict) else {}
+
+    # --- Submolts ---
+    # `shuffle` is opt-in here too (see MoltbookClient.list_submolts)
+    async def list_submolts(self, limit: int = 100, offset: int = 0, sort: str = "popular", *, shuffle: bool = False, no_auth: bool = True) -> Dict[str, Any]:
+        limit = max(1, min(int(limit), 100))
+        offset = max(0, int(offset))
+        params: Dict[str, Any] = {"limit": limit, "offset": offset, "sort": sort}
+        if shuffle:
+            params["shuffle"] = int(time.time() * 1000)
+        resp = await self._req("GET", "/submolts", params=params, no_auth=no_auth)
+        return resp if isinstance(resp, dict) else {"submolts": resp if isinstance(resp, list) else []}
+
+    async def get_submolt(self, name: str) -> Dict[str, Any]:
+        resp = await self._req("GET", f"/submolts/{name}")
+        if isinstance(resp, dict) and isinstance(resp.get("submolt"), dict):
+            return resp["submolt"]
+        return {} if not isinstance(resp, dict) else resp
+
+    async def get_moderators(self, name: str) -> List[Dict[str, Any]]:
+        resp = await self._req("GET", f"/submolts/{name}/moderators")
+        mods = resp.get("moderators") if isinstance(resp, dict) else None
+        if isinstance(mods, list):
+            return mods
+        return self._list_from(resp, _MODERATORS_KEYS)
+
+    # --- Posts / Comments ---
+    async def list_posts(self, sort: str = "new", limit: int = 50, offset: int = 0, submolt: Optional[str] = None, *, time_window: Optional[str] = None, shuffle: bool = False, no_auth: bool = True) -> Dict[str, Any]:
+        limit = max(1, min(int(limit), 50))
+        offset = max(0, int(offset))
+        params: Dict[str, Any] = {"sort": sort, "limit": limit, "offset": offset}
+        if time_window:
+            params["time"] = time_window
+        if submolt:
+            params["submolt"] = submolt
+        if shuffle:
+            params["shuffle"] = int(time.time() * 1000)
+        resp = await self._req("GET", "/posts", params=params, no_auth=no_auth)
+        return resp if isinstance(resp, dict) else {"posts": resp if isinstance(resp, list) else []}
+
+    async def get_post(self, post_id: str) -> Dict[str, Any]:
+        resp = await self._req("GET", f"/posts/{post_id}")
+        if isinstance(resp, dict) and isinstance(resp.get("post"), dict):
+            return resp["post"]
+        return {} if not isinstance(resp, dict) else resp
+
+    async def get_comments(self, post_id: str, sort: str = "new", limit: int = 500, *, shuffle: bool = False, no_auth: bool = True) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {"sort": sort, "limit": limit}
+        if shuffle:
+            params["shuffle"] = int(time.time() * 1000)
+        resp = await self._req("GET", f"/posts/{post_id}/comments", params=params, no_auth=no_auth)
+        if isinstance(resp, list):
+            return resp
+        return self._list_from(resp, _COMMENTS_KEYS)
+
+    # --- Personalized feed ---
+    async def get_feed(self, sort: str = "hot", limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        resp = await self._req("GET", "/feed", params={"sort": sort, "limit": limit, "offset": offset})
+        return resp if isinstance(resp, dict) else {"posts": resp if isinstance(resp, list) else []}
+
+
+class _NullLock:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NULL_LOCK = _NullLock()
@@ -1,168 +1,784 @@
-import json
+import functools
+import itertools
+import operator
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterable, List, Optional, Tuple
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
     
+from dateutil.parser import isoparse
 from neo4j import GraphDatabase
+from neo4j.exceptions import ClientError, TransientError
+
+# (constraint name, label, key) for every node label the upserts MERGE on
+UNIQUE_KEYS: Tuple[Tuple[str, str, str], ...] = (
+    ("agent_name_unique", "Agent", "name"),
+    ("submolt_name_unique", "Submolt", "name"),
+    ("post_id_unique", "Post", "id"),
+    ("comment_id_unique", "Comment", "id"),
+    ("crawl_id_unique", "Crawl", "id"),
+    ("feedsnapshot_id_unique", "FeedSnapshot", "id"),
+    ("x_handle_unique", "XAccount", "handle"),
+)
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
-def chunked(xs: List[Dict[str, Any]], n: int) -> Iterable[List[Dict[str, Any]]]:
-    for i in range(0, len(xs), n):
-        yield xs[i:i+n]
+@functools.lru_cache(maxsize=4096)
+def _parse_iso(value: str) -> Optional[datetime]:
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            dt = isoparse(value)
+        except (ValueError, OverflowError):
+            return None
+    # Offset-less strings meant UTC to Cypher's datetime(); keep them DateTime, not LocalDateTime
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+def as_datetime(value: Any) -> Optional[datetime]:
+    """
+    ISO-8601 string -> datetime, parsed once in Python (memoized: timestamps repeat across
+    rows and calls). The driver sends it as a native temporal, so Cypher uses it directly
+    instead of re-parsing a string per row with datetime(...). Unparseable -> None.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return _parse_iso(value)
+    return None
+
+def chunked(xs: Iterable[Dict[str, Any]], n: int) -> Iterable[List[Dict[str, Any]]]:
+    # Works on generators too: only one batch is materialized at a time
+    it = iter(xs)
+    while batch := list(itertools.islice(it, n)):
+        yield batch
+
+def dedupe(rows: Iterable[Dict[str, Any]], key: str) -> List[Dict[str, Any]]:
+    # One row per primary key (last one wins, first position kept): duplicate MERGEs
+    # are no-ops on the server but still pay the lock + index lookup, and two of them
+    # in concurrent batches can deadlock each other
+    return list({r[key]: r for r in rows}.values())
+
+def _unique_by(rows: Iterable[Dict[str, Any]], key: str) -> Iterator[Dict[str, Any]]:
+    # streaming dedupe (first one wins): unlike dedupe() it never holds the whole stream
+    seen = set()
+    for r in rows:
+        k = r[key]
+        if k not in seen:
+            seen.add(k)
+            yield r
+
+# Sort keys for parallel dispatch: batches take their MERGE locks in one global order,
+# so two workers can't each hold a node the other is waiting on (ABBA deadlock).
+# Posts sort by author then submolt, so the shared nodes in q_rels mostly fall
+# inside a single batch.
+_BY_NAME = operator.itemgetter("name")
+_BY_POST = operator.itemgetter("author_name", "submolt", "id")
+_BY_X_OWNER = operator.itemgetter("agent", "handle")
+
+# upsert_posts_with_comments only shards when each shard gets about this many posts + trees
+_SHARD_MIN_POSTS = 50
+
+# ---- Row normalization (API mixes camelCase/snake_case) ----
+# Alias tables: (output key, source keys in priority order). The first non-None value
+# wins, so falsy-but-real values (0, False, "") are kept rather than skipped by `or`.
+_AGENT_ALIASES: Tuple[Tuple[str, ...], ...] = (
+    ("name", "name"),
+    ("display_name", "displayName", "display_name"),
+    ("description", "description"),
+    ("status", "status"),
+    ("karma", "karma"),
+    ("owner_twitter_id", "owner_twitter_id"),
+    ("owner_twitter_handle", "owner_twitter_handle"),
+    ("updated_at", "updated_at"),
+    ("claimed_at", "claimed_at"),
+    ("avatar_url", "avatarUrl", "avatar_url"),
+    ("follower_count", "followerCount", "follower_count"),
+    ("following_count", "followingCount", "following_count"),
+    ("is_claimed", "isClaimed", "is_claimed"),
+    ("is_active", "isActive", "is_active"),
+    ("created_at", "createdAt", "created_at"),
+    ("last_active", "lastActive", "last_active"),
+)
+
+_SUBMOLT_ALIASES: Tuple[Tuple[str, ...], ...] = (
+    ("name", "name"),
+    ("display_name", "display_name", "displayName"),
+    ("description", "description"),
+    ("avatar_url", "avatarUrl", "avatar_url"),
+    ("banner_url", "bannerUrl", "banner_url"),
+    ("banner_color", "bannerColor", "banner_color"),
+    ("theme_color", "themeColor", "theme_color"),
+    ("subscriber_count", "subscriberCount", "subscriber_count"),
+    ("post_count", "postCount", "post_count"),
+    ("created_at", "createdAt", "created_at"),
+    ("updated_at", "updatedAt", "updated_at"),
+)
+
+# Embedded author dict on posts/comments -> "author_*" row keys
+_AUTHOR_ALIASES: Tuple[Tuple[str, ...], ...] = (
+    ("author_description", "description"),
+    ("author_avatar_url", "avatarUrl", "avatar_url"),
+    ("author_karma", "karma"),
+    ("author_follower_count", "followerCount", "follower_count"),
+    ("author_following_count", "followingCount", "following_count"),
+    ("author_is_claimed", "isClaimed", "is_claimed"),
+    ("author_is_active", "isActive", "is_active"),
+    ("author_created_at", "createdAt", "created_at"),
+    ("author_last_active", "lastActive", "last_active"),
+    ("author_display_name", "displayName", "display_name"),
+)
+
+_POST_KEYS = (
+    "id", "title", "content", "url", "type", "score", "upvotes", "downvotes", "comment_count",
+    "hot_score", "is_pinned", "is_locked", "is_deleted", "created_at", "updated_at",
+    "verification_status", "is_spam",
+)
+
+_COMMENT_KEYS = (
+    "id", "post_id", "content", "upvotes", "downvotes", "score", "reply_count", "is_deleted",
+    "depth", "verification_status", "is_spam", "created_at", "updated_at", "parent_id",
+)
+
+# Row shape sent to Cypher: the few keys a query reads directly (MERGE keys, created_at for
+# ON CREATE), plus `props` / `author` maps applied with `SET n += ...`. None values are
+# dropped in Python, so `+=` leaves existing properties alone exactly like coalesce() did.
+# Timestamp fields are converted to datetime first (see as_datetime).
+_DATETIME_KEYS = ("created_at", "updated_at", "claimed_at", "last_active", "author_created_at", "author_last_active")
+_AGENT_ROW = ("name", "created_at")
+_AGENT_PROPS = (
+    "display_name", "description", "avatar_url", "status", "is_claimed", "is_active", "karma",
+    "follower_count", "following_count", "owner_twitter_id", "owner_twitter_handle",
+    "claimed_at", "last_active", "updated_at",
+)
+_SUBMOLT_ROW = ("name", "created_at")
+_SUBMOLT_PROPS = (
+    "display_name", "description", "avatar_url", "banner_url", "banner_color", "theme_color",
+    "subscriber_count", "post_count", "updated_at",
+)
+_POST_ROW = ("id", "created_at", "submolt", "author_name")
+_POST_PROPS = (
+    "title", "content", "url", "submolt", "type", "score", "upvotes", "downvotes", "comment_count",
+    "hot_score", "is_pinned", "is_locked", "is_deleted", "verification_status", "is_spam", "submolt_id",
+    "updated_at",
+)
+_COMMENT_ROW = ("id", "post_id", "parent_id", "created_at", "author_name")
+_COMMENT_PROPS = (
+    "content", "score", "upvotes", "downvotes", "reply_count", "is_deleted", "depth",
+    "verification_status", "is_spam", "updated_at",
+)
+# (Agent property, "author_*" row key)
+_AUTHOR_PROPS = tuple((k, f"author_{k}") for k in (
+    "id", "display_name", "description", "avatar_url", "karma", "follower_count",
+    "following_count", "is_claimed", "is_active", "created_at", "last_active",
+))
+
+# (XAccount property, upsert_x_owner argument)
+_X_OWNER_PROPS = (
+    ("url", "url"),
+    ("name", "x_name"),
+    ("avatar_url", "x_avatar"),
+    ("bio", "x_bio"),
+    ("follower_count", "x_follower_count"),
+    ("following_count", "x_following_count"),
+    ("is_verified", "x_verified"),
+)
+
+def _shape(row: Dict[str, Any], keys: Tuple[str, ...], props: Tuple[str, ...], *, author: bool = False) -> Dict[str, Any]:
+    for k in _DATETIME_KEYS:
+        v = row.get(k)
+        if v is not None:
+            row[k] = as_datetime(v)
+    out = {k: v for k in keys if (v := row.get(k)) is not None}
+    out["props"] = {k: v for k in props if (v := row.get(k)) is not None}
+    if author:
+        out["author"] = {k: v for k, src in _AUTHOR_PROPS if (v := row.get(src)) is not None}
+    return out
+
+def _compile_aliases(name: str, table: Tuple[Tuple[str, ...], ...]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Generate a straight-line projection for an alias table (this is the per-row hot loop of
+    every upsert), e.g. for ("avatar_url", "avatarUrl", "avatar_url"):
+        v3 = g('avatarUrl')
+        if v3 is None: v3 = g('avatar_url')
+    and a single dict display at the end. No per-row loop over the table or helper calls.
+    """
+    lines = [f"def {name}(d):", "    g = d.get"]
+    for i, (_, first, *rest) in enumerate(table):
+        lines.append(f"    v{i} = g({first!r})")
+        lines.extend(f"    if v{i} is None: v{i} = g({k!r})" for k in rest)
+    lines.append("    return {" + ", ".join(f"{out!r}: v{i}" for i, (out, *_) in enumerate(table)) + "}")
+    ns: Dict[str, Any] = {}
+    exec("\n".join(lines), ns)
+    return ns[name]
+
+_agent_fields = _compile_aliases("_agent_fields", _AGENT_ALIASES)
+_submolt_fields = _compile_aliases("_submolt_fields", _SUBMOLT_ALIASES)
+_author_fields = _compile_aliases("_author_fields", _AUTHOR_ALIASES)
+_post_fields = _compile_aliases("_post_fields", tuple((k, k) for k in _POST_KEYS))
+_comment_fields = _compile_aliases("_comment_fields", tuple((k, k) for k in _COMMENT_KEYS))
+
+# Normalized submolt fields (the snake_case keys norm_submolt accepts), for callers that
+# keep discovered submolts around without holding on to the raw API dicts
+SUBMOLT_FIELDS: Tuple[str, ...] = tuple(out for out, *_ in _SUBMOLT_ALIASES)
+submolt_fields = _submolt_fields
+
+def norm_agent(x: Dict[str, Any]) -> Dict[str, Any]:
+    return _shape(_agent_fields(x), _AGENT_ROW, _AGENT_PROPS)
+
+def norm_submolt(x: Dict[str, Any]) -> Dict[str, Any]:
+    return _shape(_submolt_fields(x), _SUBMOLT_ROW, _SUBMOLT_PROPS)
+
+def norm_post(p: Dict[str, Any]) -> Dict[str, Any]:
+    author_raw = p.get("author")
+    author = author_raw if isinstance(author_raw, dict) else {}
+    sub = p.get("submolt")
+    row = _post_fields(p)
+    row["submolt"] = sub.get("name") if isinstance(sub, dict) else sub
+    row["submolt_id"] = sub.get("id") if isinstance(sub, dict) else None
+    row["author_id"] = author.get("id") or p.get("author_id")
+    row["author_name"] = author.get("name") or (author_raw if isinstance(author_raw, str) else None)
+    row.update(_author_fields(author))
+    return _shape(row, _POST_ROW, _POST_PROPS, author=True)
+
+def norm_comment(x: Dict[str, Any], *, parent_id: Optional[str] = None, post_id: Optional[str] = None) -> Dict[str, Any]:
+    """parent_id / post_id fill in when the comment itself doesn't carry them."""
+    # author can be a dict OR a string (observed in the wild)
+    author_raw = x.get("author")
+    if isinstance(author_raw, dict):
+        author = author_raw
+        author_name = author.get("name") or x.get("author_name")
+    elif isinstance(author_raw, str):
+        author = {}
+        author_name = author_raw
+    else:
+        author = {}
+        author_name = x.get("author_name")
+
+    row = _comment_fields(x)
+    if not row["parent_id"]:
+        row["parent_id"] = parent_id
+    if not row["post_id"]:
+        row["post_id"] = post_id
+    row["author_id"] = author.get("id") or x.get("author_id")
+    row["author_name"] = author_name
+    row.update(_author_fields(author))
+    return _shape(row, _COMMENT_ROW, _COMMENT_PROPS, author=True)
+
+def _post_rows(posts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalized, deduped Post rows (sorted to keep concurrent batches apart)."""
+    tmp = [norm_post(p) for p in posts if p.get("id") and p.get("created_at")]
+    rows = dedupe((r for r in tmp if r.get("author_name") and r.get("submolt")), "id")
+    rows.sort(key=_BY_POST)
+    return rows
+
+
+def _pipeline(*parts: str) -> str:
+    """
+    Chain UNWIND-driven statements into one query (one round-trip + one commit per batch).
+    `WITH count(*)` closes each part so the next one can re-UNWIND $rows from scratch.
+    """
+    return "\nWITH count(*) AS _\n".join(parts)
 
 def flatten_comments(tree: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    flat: List[Dict[str, Any]] = []
+    return list(iter_flatten_comments(tree))
 
-    def rec(node: Dict[str, Any], parent_id: Optional[str]):
-        replies = node.get("replies", []) or []
+def iter_flatten_comments(tree: List[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """
+    Flattened copies of the comments (without `replies`, with `parent_id` filled in).
+    Nodes are shallow-copied once: callers keep walking `replies` on the original tree.
+    """
+    for node, parent_id in _walk_comments(tree):
         n = dict(node)
-        n["parent_id"] = n.get("parent_id") or parent_id
         n.pop("replies", None)
-        flat.append(n)
-        for r in replies:
-            rec(r, n["id"])
+        if not n.get("parent_id"):
+            n["parent_id"] = parent_id
+        yield n
+
+def _walk_comments(tree: List[Dict[str, Any]]) -> Iterable[Tuple[Dict[str, Any], Optional[str]]]:
+    """
+    Pre-order (node, inherited parent_id) pairs, iteratively (no recursion limit on deep
+    threads). Yields the original dicts: nothing is copied per node.
+    """
+    stack: List[Tuple[Dict[str, Any], Optional[str]]] = [(c, c.get("parent_id")) for c in reversed(tree)]
+    while stack:
+        node, parent_id = stack.pop()
+        replies = node.get("replies") or ()
+        nid = node.get("id")
+        stack.extend((r, nid) for r in reversed(replies))
+        yield node, parent_id
+
+def _comment_rows(post_id: str, tree: List[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    # walk -> filter -> norm in one lazy pass: the only per-comment allocation is the
+    # row that is actually sent (no flattened copy of the tree)
+    for c, parent_id in _walk_comments(tree):
+        if not (c.get("id") and c.get("created_at")):
+            continue
+        r = norm_comment(c, parent_id=parent_id, post_id=post_id)
+        if r.get("author_name") and r.get("post_id"):
+            yield r
+
+# ---- Cypher ----
+# Every statement is a module-level constant: built once at import, and the same
+# text on every call, so the server's query plan cache always hits.
 
-    for c in tree:
-        rec(c, c.get("parent_id"))
-    return flat
+# checkpoint / crawl bookkeeping
+_Q_GET_CHECKPOINT = """
+MATCH (cr:Crawl {id:$id})
+RETURN coalesce(cr[$prop], 0) AS v
+"""
+_Q_SET_CHECKPOINT = """
+MATCH (cr:Crawl {id:$id})
+SET cr[$prop] = $value,
+    cr.last_updated_at = $ts
+"""
+_Q_BEGIN_CRAWL = """
+MERGE (cr:Crawl {id:$id})
+ON CREATE SET cr.started_at = $started_at
+SET cr.mode = $mode, cr.cutoff = $cutoff, cr.last_updated_at = $started_at
+"""
+_Q_END_CRAWL = """
+MATCH (cr:Crawl {id:$id})
+SET cr.ended_at = $ended_at, cr.last_updated_at = $ended_at
+"""
+_Q_LATEST_CUTOFF = """
+MATCH (cr:Crawl)
+WHERE cr.cutoff IS NOT NULL
+RETURN cr.cutoff AS cutoff
+ORDER BY cr.cutoff DESC
+LIMIT 1
+"""
+_Q_PROFILE_REFRESH = """
+MATCH (a:Agent)
+WHERE a.name IS NOT NULL
+AND (
+    a.profile_last_fetched_at IS NULL OR
+    a.profile_last_fetched_at < datetime() - duration({days: $days})
+)
+RETURN a.name AS name
+ORDER BY coalesce(a.profile_last_fetched_at, datetime("1970-01-01T00:00:00Z")) ASC
+LIMIT $limit
+"""
+
+# node upserts
+# Probes by name (unique constraint) instead of scanning every Agent
+_Q_RECENTLY_PROFILED = """
+UNWIND $names AS name
+MATCH (a:Agent {name: name})
+WHERE a.profile_last_fetched_at >= datetime() - duration({days: $days})
+RETURN a.name AS name
+"""
+_Q_UPSERT_AGENTS = """
+UNWIND $rows AS row
+MERGE (a:Agent {name: row.name})
+ON CREATE SET a.first_seen_at = $obs,
+            a.created_at = coalesce(row.created_at, $obs)
+SET a += row.props,
+    a.last_seen_at = $obs,
+    a.profile_last_fetched_at = CASE
+        WHEN $mark_profile THEN $obs
+        ELSE a.profile_last_fetched_at
+    END
+"""
+_Q_UPSERT_X_OWNERS = """
+UNWIND $rows AS row
+MATCH (a:Agent {name: row.agent})
+MERGE (x:XAccount {handle: row.handle})
+ON CREATE SET x.first_seen_at=$obs
+SET x += row.props,
+    x.last_seen_at=$obs
+MERGE (a)-[r:HAS_OWNER_X]->(x)
+ON CREATE SET r.first_seen_at=$obs
+SET r.last_seen_at=$obs
+"""
+_Q_UPSERT_SUBMOLTS = """
+UNWIND $rows AS row
+MERGE (s:Submolt {name: row.name})
+ON CREATE SET s.first_seen_at=$obs, s.created_at=coalesce(row.created_at, $obs)
+SET s += row.props,
+    s.last_seen_at=$obs
+"""
+
+# posts: nodes, then author/submolt relationships, in one statement per batch
+_Q_NODES_POST = """
+UNWIND $rows AS row
+MERGE (p:Post {id: row.id})
+ON CREATE SET p.first_seen_at=$obs,
+    p.created_at = coalesce(row.created_at, $obs)
+SET p += row.props,
+    p.last_seen_at=$obs
+"""
+_Q_RELS_POST = """
+UNWIND $rows AS row
+MERGE (a:Agent {name: row.author_name})
+ON CREATE SET a.first_seen_at=$obs
+SET a += row.author,
+    a.last_seen_at=$obs
+
+WITH row, a
+MERGE (s:Submolt {name: row.submolt})
+ON CREATE SET s.first_seen_at=$obs
+SET s.last_seen_at=$obs
+
+WITH row, a, s
+MATCH (p:Post {id: row.id})
+MERGE (a)-[r1:AUTHORED]->(p)
+ON CREATE SET r1.first_seen_at=$obs, r1.created_at = p.created_at
+SET r1.last_seen_at=$obs
+
+MERGE (p)-[r2:IN_SUBMOLT]->(s)
+ON CREATE SET r2.first_seen_at=$obs, r2.created_at = p.created_at
+SET r2.last_seen_at=$obs
+"""
+_Q_UPSERT_POSTS = _pipeline(_Q_NODES_POST, _Q_RELS_POST)
+
+# comments: roots and replies go through separate statements
+_Q_NODES_COMMENT = """
+UNWIND $rows AS row
+MERGE (c:Comment {id: row.id})
+ON CREATE SET c.first_seen_at=$obs, c.created_at=row.created_at
+SET c += row.props,
+    c.last_seen_at=$obs
+"""
+_Q_RELS_COMMENT = """
+UNWIND $rows AS row
+MERGE (a:Agent {name: row.author_name})
+ON CREATE SET a.first_seen_at=$obs
+SET a += row.author,
+    a.last_seen_at=$obs
+
+WITH row, a
+MATCH (c:Comment {id: row.id})
+MATCH (p:Post {id: row.post_id})
+
+MERGE (a)-[r1:AUTHORED]->(c)
+ON CREATE SET r1.first_seen_at=$obs, r1.created_at = c.created_at
+SET r1.last_seen_at=$obs
+
+MERGE (c)-[r2:ON_POST]->(p)
+ON CREATE SET r2.first_seen_at=$obs, r2.created_at = c.created_at
+SET r2.last_seen_at=$obs
+"""
+# Replies only: every row has a parent_id, so no per-row WHERE
+_Q_REPLY_TO = """
+UNWIND $rows AS row
+MATCH (c:Comment {id: row.id})
+MATCH (parent:Comment {id: row.parent_id})
+MERGE (c)-[r3:REPLY_TO]->(parent)
+ON CREATE SET r3.first_seen_at=$obs, r3.created_at = c.created_at
+SET r3.last_seen_at=$obs
+"""
+_Q_COMMENT_ROOTS = _pipeline(_Q_NODES_COMMENT, _Q_RELS_COMMENT)
+_Q_COMMENT_REPLIES = _pipeline(_Q_NODES_COMMENT, _Q_RELS_COMMENT, _Q_REPLY_TO)
+
+# moderators, one row per submolt: {submolt, current, mods}. Expire and merge in one
+# statement; the expire subquery runs before UNWIND sub.mods, so an empty list still
+# ends stale edges.
+_Q_UPSERT_MODERATORS_BULK = """
+UNWIND $rows AS sub
+MERGE (s:Submolt {name: sub.submolt})
+ON CREATE SET s.first_seen_at=$obs
+SET s.last_seen_at=$obs
+WITH s, sub
+CALL {
+  WITH s, sub
+  MATCH (a:Agent)-[r:MODERATES]->(s)
+  WHERE r.ended_at IS NULL AND NOT a.name IN sub.current
+  SET r.ended_at=$obs, r.last_seen_at=$obs
+}
+WITH s, sub
+UNWIND sub.mods AS row
+MERGE (a:Agent {name: row.name})
+ON CREATE SET a.first_seen_at=$obs
+SET a.last_seen_at=$obs,
+    a.display_name = coalesce(row.display_name, a.display_name)
+
+MERGE (a)-[r:MODERATES]->(s)
+ON CREATE SET r.first_seen_at=$obs
+SET r.last_seen_at=$obs,
+    r.role = coalesce(row.role, r.role),
+    r.ended_at = NULL
+"""
+
+# similar agents: expire-only, or expire + merge in one statement
+_Q_EXPIRE_SIMILAR = """
+MATCH (:Agent {name:$agent})-[r:SIMILAR_TO {source:$source}]->(b:Agent)
+WHERE r.ended_at IS NULL AND NOT b.name IN $current
+SET r.ended_at=$obs, r.last_seen_at=$obs
+"""
+_Q_MERGE_SIMILAR = """
+UNWIND $rows AS row
+MERGE (a:Agent {name:$agent})
+ON CREATE SET a.first_seen_at=$obs
+SET a.last_seen_at=$obs
+
+MERGE (b:Agent {name: row.other})
+ON CREATE SET b.first_seen_at=$obs
+SET b.last_seen_at=$obs
+
+MERGE (a)-[r:SIMILAR_TO {source:$source}]->(b)
+ON CREATE SET r.first_seen_at=$obs
+SET r.last_seen_at=$obs,
+    r.ended_at = NULL
+"""
+_Q_UPSERT_SIMILAR = "CALL {\n" + _Q_EXPIRE_SIMILAR + "\n}\n" + _Q_MERGE_SIMILAR
+
+_Q_FEED_SNAPSHOT = """
+MERGE (fs:FeedSnapshot {id:$id})
+ON CREATE SET fs.first_seen_at=$obs, fs.observed_at=$obs
+SET fs.last_seen_at=$obs,
+    fs.sort = $sort
+
+WITH fs
+UNWIND $rows AS row
+MERGE (p:Post {id: row.id})
+ON CREATE SET p.first_seen_at=$obs, p.created_at=row.created_at
+SET p.last_seen_at=$obs,
+    p.title = coalesce(row.title, p.title),
+    p.submolt = coalesce(row.submolt, p.submolt),
+    p.score = coalesce(row.score, p.score)
+
+MERGE (fs)-[r:CONTAINS]->(p)
+ON CREATE SET r.first_seen_at=$obs
+SET r.last_seen_at=$obs,
+    r.rank = row.rank
+"""
+
+_NODE_KEYS = {label: prop for _, label, prop in UNIQUE_KEYS}
+
+@functools.lru_cache(maxsize=None)
+def _q_recently_seen(label: str, key: str, after: bool, where: str) -> str:
+    # One text per (label, key, has-cursor, filter) so the plan cache still hits. The
+    # (last_seen_at, key) keyset is needed because a crawl stamps thousands of nodes
+    # with the same last_seen_at; ordering follows the *_last_seen index.
+    cursor = f" AND (n.last_seen_at < $seen OR (n.last_seen_at = $seen AND n.{key} < $key))" if after else ""
+    extra = f" AND ({where})" if where else ""
+    return f"""
+MATCH (n:{label})
+WHERE n.last_seen_at IS NOT NULL{cursor}{extra}
+RETURN n.{key} AS key, n.last_seen_at AS seen
+ORDER BY n.last_seen_at DESC, n.{key} DESC
+LIMIT $limit
+"""
+
+@functools.lru_cache(maxsize=None)
+def _q_never_seen(label: str, key: str, after: bool, where: str) -> str:
+    # Second pass of get_recently_seen_keys: nodes without last_seen_at (legacy rows the
+    # old coalesce(last_seen_at, created_at) order still picked up), paged on the key alone
+    cursor = f" AND n.{key} < $key" if after else ""
+    extra = f" AND ({where})" if where else ""
+    return f"""
+MATCH (n:{label})
+WHERE n.last_seen_at IS NULL{cursor}{extra}
+RETURN n.{key} AS key
+ORDER BY n.{key} DESC
+LIMIT $limit
+"""
 
 class Neo4jStore:
-    def __init__(self, uri: str, user: str, pwd: str):
-        self.driver = GraphDatabase.driver(uri, auth=(user, pwd))
+    """
+    One store (one driver, one connection pool) per process, shared by every thread: the
+    driver is thread-safe, sessions are not (see _session()). `pool_size` and
+    `driver_config` override the driver defaults below.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        user: str,
+        pwd: str,
+        *,
+        ensure_schema: bool = True,
+        batch_size: Optional[int] = None,
+        relationship_batch_size: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        **driver_config: Any,
+    ):
+        self.workers = max(int(os.getenv("MOLT_NEO4J_WORKERS", "8")), 1)
+        # Server notifications are not sent/parsed. The pool covers the batch workers
+        # below plus the caller's own threads, so a burst never waits on a checkout.
+        config: Dict[str, Any] = {
+            "max_connection_pool_size": max(int(pool_size or os.getenv("NEO4J_POOL_SIZE", "64")), 2 * self.workers),
+            "max_connection_lifetime": 3600,
+            "connection_acquisition_timeout": 60,
+            "keep_alive": True,
+            "notifications_min_severity": "OFF",
+            "user_agent": os.getenv("USER_AGENT", "MoltGraphCrawler/0.1"),
+        }
+        config.update(driver_config)
+        self.driver = GraphDatabase.driver(uri, auth=(user, pwd), **config)
+        # Rows per UNWIND. Node-only upserts take the larger batch; posts/comments also
+        # MERGE relationships (more locks per row), so they use the smaller one.
+        self.batch_size = max(int(batch_size or os.getenv("MOLT_NEO4J_BATCH", "1000")), 1)
+        self.relationship_batch_size = max(int(relationship_batch_size or os.getenv("MOLT_NEO4J_REL_BATCH", "500")), 1)
+        # One long-lived session per thread (sessions are not thread-safe); avoids a
+        # pool checkout + session setup for every small write like set_checkpoint.
+        self._local = threading.local()
+        self._sessions: List[Any] = []
+        self._sessions_lock = threading.Lock()
+        # Independent batches of one upsert are dispatched concurrently; each worker
+        # thread gets its own session through _session().
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="neo4j")
+        if ensure_schema:
+            self.ensure_schema()
+
+    def ensure_schema(self) -> None:
+        """
+        Create the uniqueness constraint behind every MERGE key (idempotent), so upserts
+        are index lookups even if scripts/init_db.py was never run. Names match
+        cypher/schema.cypher; its secondary indexes are still applied by init_db.
+        """
+        s = self._session()
+        for name, label, prop in UNIQUE_KEYS:
+            try:
+                s.run(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE").consume()
+            except ClientError as e:
+                # e.g. no schema privileges: keep crawling, MERGE still works (just slower)
+                print(f"[neo4j] could not ensure {name}: {e.message}")
+
+    def _session(self):
+        sess = getattr(self._local, "session", None)
+        if sess is None or sess.closed():
+            # Upserts return no records, so these sessions pull results in one go. Only
+            # here: sessions opened on self.driver (backfill read cursors) keep the
+            # default fetch_size and stream.
+            sess = self.driver.session(fetch_size=-1)
+            self._local.session = sess
+            with self._sessions_lock:
+                self._sessions.append(sess)
+        return sess
+
+    def _run_batch(self, q: str, batch: List[Dict[str, Any]], params: Dict[str, Any]) -> None:
+        # Concurrent batches can deadlock on shared nodes (e.g. the same author); those
+        # surface as TransientError and are safe to replay.
+        for attempt in range(3):
+            try:
+                self._session().run(q, rows=batch, **params).consume()
+                return
+            except TransientError:
+                if attempt == 2:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
+
+    def _run_batches(self, q: str, rows: Iterable[Dict[str, Any]], size: int, *, parallel: bool = True, **params: Any) -> None:
+        if not parallel or self.workers == 1:
+            # lazy: a generator of rows is consumed one batch at a time
+            for batch in chunked(rows, size):
+                self._run_batch(q, batch, params)
+            return
+        batches = list(chunked(rows, size))
+        if len(batches) <= 1:
+            for batch in batches:
+                self._run_batch(q, batch, params)
+            return
+        # list() drains the iterator so the first worker exception is raised here
+        list(self._pool.map(lambda b: self._run_batch(q, b, params), batches))
 
     def close(self):
+        self._pool.shutdown(wait=True)
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for sess in sessions:
+            sess.close()
         self.driver.close()
-        
+
     def _submolt_name(self, sub):
         return sub.get("name") if isinstance(sub, dict) else sub
 
     # checkpoint
     def get_checkpoint(self, crawl_id: str, prop: str) -> int:
-        q = """
-        MATCH (cr:Crawl {id:$id})
-        RETURN coalesce(cr[$prop], 0) AS v
-        """
-        with self.driver.session() as s:
-            rec = s.run(q, id=crawl_id, prop=prop).single()
-            return int(rec["v"]) if rec and rec["v"] is not None else 0
+        s = self._session()
+        rec = s.run(_Q_GET_CHECKPOINT, id=crawl_id, prop=prop).single()
+        return int(rec["v"]) if rec and rec["v"] is not None else 0
 
     def set_checkpoint(self, crawl_id: str, prop: str, value: int) -> None:
-        q = """
-        MATCH (cr:Crawl {id:$id})
-        SET cr[$prop] = $value,
-            cr.last_updated_at = datetime($ts)
-        """
-        with self.driver.session() as s:
-            s.run(q, id=crawl_id, prop=prop, value=value, ts=now_iso())
+        s = self._session()
+        s.run(_Q_SET_CHECKPOINT, id=crawl_id, prop=prop, value=value, ts=datetime.now(timezone.utc)).consume()
 
     # ---- Crawl bookkeeping ----
     def begin_crawl(self, crawl_id: str, mode: str, cutoff_iso: str) -> None:
-        q = """
-        MERGE (cr:Crawl {id:$id})
-        ON CREATE SET cr.started_at = datetime($started_at)
-        SET cr.mode = $mode, cr.cutoff = datetime($cutoff), cr.last_updated_at = datetime($started_at)
-        """
-        with self.driver.session() as s:
-            s.run(q, id=crawl_id, mode=mode, cutoff=cutoff_iso, started_at=now_iso())
+        s = self._session()
+        s.run(_Q_BEGIN_CRAWL, id=crawl_id, mode=mode, cutoff=as_datetime(cutoff_iso), started_at=datetime.now(timezone.utc)).consume()
 
     def end_crawl(self, crawl_id: str) -> None:
-        q = """
-        MATCH (cr:Crawl {id:$id})
-        SET cr.ended_at = datetime($ended_at), cr.last_updated_at = datetime($ended_at)
-        """
-        with self.driver.session() as s:
-            s.run(q, id=crawl_id, ended_at=now_iso())
+        s = self._session()
+        s.run(_Q_END_CRAWL, id=crawl_id, ended_at=datetime.now(timezone.utc)).consume()
 
     def get_latest_crawl_cutoff(self) -> Optional[str]:
-        q = """
-        MATCH (cr:Crawl)
-        WHERE cr.cutoff IS NOT NULL
-        RETURN cr.cutoff AS cutoff
-        ORDER BY cr.cutoff DESC
-        LIMIT 1
+        s = self._session()
+        r = s.run(_Q_LATEST_CUTOFF).single()
+        if not r:
+            return None
+        return r["cutoff"].to_native().isoformat()
+
+    def get_recently_seen_keys(
+        self,
+        label: str,
+        limit: int,
+        *,
+        cursor: Optional[Tuple[Optional[str], str]] = None,
+        where: str = "",
+    ) -> Tuple[List[str], Optional[Tuple[Optional[str], str]]]:
+        """
+        Primary keys of `label` nodes, most recently seen first, one page at a time.
+        `cursor` is the (last_seen_at ISO, key) returned by the previous page; the next page
+        starts strictly after it, so successive calls (or runs) walk the whole label without
+        the planner sorting every node. `where` is an extra trusted predicate on `n`.
+        Nodes with no last_seen_at come after all the others, in key order (their cursor
+        is (None, key)).
+        Returns (keys, next_cursor); next_cursor is None once a page comes back empty.
         """
-        with self.driver.session() as s:
-            r = s.run(q).single()
-            if not r:
-                return None
-            return r["cutoff"].to_native().isoformat()
+        key = _NODE_KEYS[label]
+        limit = int(limit)
+        s = self._session()
+        keys: List[str] = []
+        next_cursor: Optional[Tuple[Optional[str], str]] = None
+        if cursor is None or cursor[0] is not None:
+            params: Dict[str, Any] = {"limit": limit}
+            if cursor is not None:
+                params["seen"], params["key"] = as_datetime(cursor[0]), cursor[1]
+            for r in s.run(_q_recently_seen(label, key, cursor is not None, where), **params):
+                keys.append(r["key"])
+                next_cursor = (r["seen"].to_native().isoformat(), r["key"])
+            if len(keys) >= limit:
+                return keys, next_cursor
+            cursor = None  # seen nodes exhausted: top the page up from the unseen ones
+        params = {"limit": limit - len(keys)}
+        if cursor is not None:
+            params["key"] = cursor[1]
+        for r in s.run(_q_never_seen(label, key, cursor is not None, where), **params):
+            keys.append(r["key"])
+            next_cursor = (None, r["key"])
+        return keys, next_cursor
 
     def get_agents_needing_profile_refresh(self, days: int = 7, limit: int = 500) -> List[str]:
         """
         Returns agent names whose profile is missing or stale.
         Uses Agent.profile_last_fetched_at (set only when mark_profile=True in upsert_agents).
         """
-        q = """
-        MATCH (a:Agent)
-        WHERE a.name IS NOT NULL
-        AND (
-            a.profile_last_fetched_at IS NULL OR
-            a.profile_last_fetched_at < datetime() - duration({days: $days})
-        )
-        RETURN a.name AS name
-        ORDER BY coalesce(a.profile_last_fetched_at, datetime("1970-01-01T00:00:00Z")) ASC
-        LIMIT $limit
-        """
-        with self.driver.session() as s:
-            res = s.run(q, days=int(days), limit=int(limit))
-            return [r["name"] for r in res if r and r.get("name")]
+        s = self._session()
+        # a.name IS NOT NULL is enforced in the query; pull the single column directly
+        return s.run(_Q_PROFILE_REFRESH, days=int(days), limit=int(limit)).value("name")
 
+    def get_recently_profiled(self, names: Iterable[str], days: int) -> Set[str]:
+        """
+        The subset of `names` whose profile was fetched (upsert_agents(mark_profile=True))
+        within the last `days`, so callers can skip re-fetching unchanged profiles.
+        """
+        s = self._session()
+        out: Set[str] = set()
+        for batch in chunked(names, 5000):
+            out.update(s.run(_Q_RECENTLY_PROFILED, names=batch, days=int(days)).value("name"))
+        return out
 
     # ---- Upserts ----
     def upsert_agents(self, agents: List[Dict[str, Any]], observed_at_iso: str, mark_profile: bool = False):
-        q = """
-        UNWIND $rows AS row
-        MERGE (a:Agent {name: row.name})
-        ON CREATE SET a.first_seen_at = datetime($obs),
-                    a.created_at = datetime(coalesce(row.created_at, $obs))
-        SET a.last_seen_at = datetime($obs),
-            a.display_name = coalesce(row.display_name, a.display_name),
-            a.description = coalesce(row.description, a.description),
-            a.avatar_url = coalesce(row.avatar_url, a.avatar_url),
-            a.status = coalesce(row.status, a.status),
-            a.is_claimed = coalesce(row.is_claimed, a.is_claimed),
-            a.is_active = coalesce(row.is_active, a.is_active),
-            a.karma = coalesce(row.karma, a.karma),
-            a.follower_count = coalesce(row.follower_count, a.follower_count),
-            a.following_count = coalesce(row.following_count, a.following_count),
-            a.owner_twitter_id = coalesce(row.owner_twitter_id, a.owner_twitter_id),
-            a.owner_twitter_handle = coalesce(row.owner_twitter_handle, a.owner_twitter_handle),
-            a.claimed_at = CASE WHEN row.claimed_at IS NULL THEN a.claimed_at ELSE datetime(row.claimed_at) END,
-            a.last_active = CASE WHEN row.last_active IS NULL THEN a.last_active ELSE datetime(row.last_active) END,
-            a.updated_at = CASE WHEN row.updated_at IS NULL THEN a.updated_at ELSE datetime(row.updated_at) END,
-            a.profile_last_fetched_at = CASE
-                WHEN $mark_profile THEN datetime($obs)
-                ELSE a.profile_last_fetched_at
-            END
-        """
-
-        # Normalize keys (API mixes camelCase/snake_case)
-        def norm(x: Dict[str, Any]) -> Dict[str, Any]:
-            return {
-                "name": x.get("name"),
-                "display_name": x.get("displayName") or x.get("display_name"),
-                "description": x.get("description"),
-                "status": x.get("status"),
-                "karma": x.get("karma"),
-                "owner_twitter_id": x.get("owner_twitter_id"),
-                "owner_twitter_handle": x.get("owner_twitter_handle"),
-                "updated_at": x.get("updated_at"),
-                "claimed_at": x.get("claimed_at"),
-                "avatar_url": x.get("avatarUrl") or x.get("avatar_url"),
-                "follower_count": x.get("followerCount") or x.get("follower_count"),
-                "following_count": x.get("followingCount") or x.get("following_count"),
-                "is_claimed": x.get("isClaimed") if "isClaimed" in x else x.get("is_claimed"),
-                "is_active": x.get("isActive") if "isActive" in x else x.get("is_active"),
-                "created_at": x.get("createdAt") or x.get("created_at"),
-                "last_active": x.get("lastActive") or x.get("last_active"),
-            }
-
-        rows = [norm(a) for a in agents if a.get("name")]
-        with self.driver.session() as s:
-            for batch in chunked(rows, 500):
-                s.run(q, rows=batch, obs=observed_at_iso, mark_profile=mark_profile)
+        rows = dedupe((norm_agent(a) for a in agents if a.get("name")), "name")
+        rows.sort(key=_BY_NAME)
+        self._run_batches(_Q_UPSERT_AGENTS, rows, self.batch_size, obs=as_datetime(observed_at_iso), mark_profile=mark_profile)
 
     def upsert_x_owner(
         self,
@@ -178,297 +794,151 @@ class Neo4jStore:
         x_following_count: Optional[int] = None,
         x_verified: Optional[bool] = None,
         ):
-        if not isinstance(handle, str) or not handle.strip():
-            return
-        handle = handle.strip().lstrip("@")
-
-        q = """
-        MATCH (a:Agent {name:$agent})
-        MERGE (x:XAccount {handle:$handle})
-        ON CREATE SET x.first_seen_at=datetime($obs)
-        SET x.last_seen_at=datetime($obs),
-            x.url = coalesce($url, x.url),
-            x.name = coalesce($x_name, x.name),
-            x.avatar_url = coalesce($x_avatar, x.avatar_url),
-            x.bio = coalesce($x_bio, x.bio),
-            x.follower_count = coalesce($x_follower_count, x.follower_count),
-            x.following_count = coalesce($x_following_count, x.following_count),
-            x.is_verified = coalesce($x_verified, x.is_verified)
-        MERGE (a)-[r:HAS_OWNER_X]->(x)
-        ON CREATE SET r.first_seen_at=datetime($obs)
-        SET r.last_seen_at=datetime($obs)
+        self.upsert_x_owners([{
+            "agent": agent_name,
+            "handle": handle,
+            "url": url,
+            "x_name": x_name,
+            "x_avatar": x_avatar,
+            "x_bio": x_bio,
+            "x_follower_count": x_follower_count,
+            "x_following_count": x_following_count,
+            "x_verified": x_verified,
+        }], observed_at_iso)
+
+    def upsert_x_owners(self, owners: List[Dict[str, Any]], observed_at_iso: str):
         """
-        with self.driver.session() as s:
-            s.run(
-                q,
-                agent=agent_name,
-                handle=handle,
-                url=url,
-                obs=observed_at_iso,
-                x_name=x_name,
-                x_avatar=x_avatar,
-                x_bio=x_bio,
-                x_follower_count=x_follower_count,
-                x_following_count=x_following_count,
-                x_verified=x_verified,
-            )
+        Batched upsert_x_owner: each dict has `agent`, `handle` and optionally `url` plus the
+        x_* keyword fields of upsert_x_owner. Rows with no agent or an empty handle are skipped.
+        """
+        rows = []
+        for o in owners:
+            agent, handle = o.get("agent"), o.get("handle")
+            if not agent or not isinstance(handle, str) or not handle.strip():
+                continue
+            rows.append({
+                "agent": agent,
+                "handle": handle.strip().lstrip("@"),
+                "props": {k: v for k, src in _X_OWNER_PROPS if (v := o.get(src)) is not None},
+            })
+        rows.sort(key=_BY_X_OWNER)
+        self._run_batches(_Q_UPSERT_X_OWNERS, rows, self.relationship_batch_size, obs=as_datetime(observed_at_iso))
 
     def upsert_submolts(self, submolts: List[Dict[str, Any]], observed_at_iso: str):
-        q = """
-        UNWIND $rows AS row
-        MERGE (s:Submolt {name: row.name})
-        ON CREATE SET s.first_seen_at=datetime($obs), s.created_at=datetime(coalesce(row.created_at, $obs))
-        SET s.last_seen_at=datetime($obs),
-            s.display_name = coalesce(row.display_name, s.display_name),
-            s.description  = coalesce(row.description, s.description),
-            s.avatar_url   = coalesce(row.avatar_url, s.avatar_url),
-            s.banner_url   = coalesce(row.banner_url, s.banner_url),
-            s.banner_color = coalesce(row.banner_color, s.banner_color),
-            s.theme_color  = coalesce(row.theme_color, s.theme_color),
-            s.subscriber_count = coalesce(row.subscriber_count, s.subscriber_count),
-            s.post_count   = coalesce(row.post_count, s.post_count),
-            s.updated_at   = CASE WHEN row.updated_at IS NULL THEN s.updated_at ELSE datetime(row.updated_at) END
-        """
-        def norm(x: Dict[str, Any]) -> Dict[str, Any]:
-            return {
-                "name": x.get("name"),
-                "display_name": x.get("display_name") or x.get("displayName"),
-                "description": x.get("description"),
-                "avatar_url": x.get("avatarUrl") or x.get("avatar_url"),
-                "banner_url": x.get("bannerUrl") or x.get("banner_url"),
-                "banner_color": x.get("bannerColor") or x.get("banner_color"),
-                "theme_color": x.get("themeColor") or x.get("theme_color"),
-                "subscriber_count": x.get("subscriberCount") or x.get("subscriber_count"),
-                "post_count": x.get("postCount") or x.get("post_count"),
-                "created_at": x.get("createdAt") or x.get("created_at"),
-                "updated_at": x.get("updatedAt") or x.get("updated_at"),
-            }
-
-        rows = [norm(s) for s in submolts if s.get("name")]
-        with self.driver.session() as sess:
-            for batch in chunked(rows, 500):
-                sess.run(q, rows=batch, obs=observed_at_iso)
+        rows = dedupe((norm_submolt(s) for s in submolts if s.get("name")), "name")
+        rows.sort(key=_BY_NAME)
+        self._run_batches(_Q_UPSERT_SUBMOLTS, rows, self.batch_size, obs=as_datetime(observed_at_iso))
 
     def upsert_posts(self, posts: List[Dict[str, Any]], observed_at_iso: str):
-        q_nodes = """
-        UNWIND $rows AS row
-        MERGE (p:Post {id: row.id})
-        ON CREATE SET p.first_seen_at=datetime($obs),
-            p.created_at = CASE WHEN row.created_at IS NULL THEN datetime($obs) ELSE datetime(row.created_at) END
-        SET p.last_seen_at=datetime($obs),
-            p.title = coalesce(row.title, p.title),
-            p.content = coalesce(row.content, p.content),
-            p.url = coalesce(row.url, p.url),
-            p.submolt = coalesce(row.submolt, p.submolt),
-            p.type = coalesce(row.type, p.type),
-            p.score = coalesce(row.score, p.score),
-            p.upvotes = coalesce(row.upvotes, p.upvotes),
-            p.downvotes = coalesce(row.downvotes, p.downvotes),
-            p.comment_count = coalesce(row.comment_count, p.comment_count),
-            p.hot_score = coalesce(row.hot_score, p.hot_score),
-            p.is_pinned = coalesce(row.is_pinned, p.is_pinned),
-            p.is_locked = coalesce(row.is_locked, p.is_locked),
-            p.is_deleted = coalesce(row.is_deleted, p.is_deleted),
-            p.verification_status = coalesce(row.verification_status, p.verification_status),
-            p.is_spam = coalesce(row.is_spam, p.is_spam),
-            p.submolt_id = coalesce(row.submolt_id, p.submolt_id),
-            p.updated_at = CASE WHEN row.updated_at IS NULL THEN p.updated_at ELSE datetime(row.updated_at) END
+        rows = _post_rows(posts)
+        self._run_batches(_Q_UPSERT_POSTS, rows, self.relationship_batch_size, obs=as_datetime(observed_at_iso))
+
+    def upsert_comments(self, post_id: str, comments_tree: List[Dict[str, Any]], observed_at_iso: str):
+        # comments_tree is a LIST. Each comment may include nested replies.
+        self.upsert_comments_bulk([(post_id, comments_tree)], observed_at_iso)
+
+    def _comment_batches(self, trees: Iterable[Tuple[str, List[Dict[str, Any]]]]) -> Iterable[Tuple[str, List[Dict[str, Any]]]]:
         """
-        q_rels = """
-        UNWIND $rows AS row
-        MERGE (a:Agent {name: row.author_name})
-        ON CREATE SET a.first_seen_at=datetime($obs)
-        SET a.last_seen_at=datetime($obs),
-            a.id = coalesce(row.author_id, a.id),
-            a.display_name = coalesce(row.author_display_name, a.display_name),
-            a.description = coalesce(row.author_description, a.description),
-            a.avatar_url = coalesce(row.author_avatar_url, a.avatar_url),
-            a.karma = coalesce(row.author_karma, a.karma),
-            a.follower_count = coalesce(row.author_follower_count, a.follower_count),
-            a.following_count = coalesce(row.author_following_count, a.following_count),
-            a.is_claimed = coalesce(row.author_is_claimed, a.is_claimed),
-            a.is_active = coalesce(row.author_is_active, a.is_active),
-            a.created_at = CASE WHEN row.author_created_at IS NULL THEN a.created_at ELSE datetime(row.author_created_at) END,
-            a.last_active = CASE WHEN row.author_last_active IS NULL THEN a.last_active ELSE datetime(row.author_last_active) END
-
-        WITH row, a
-        MERGE (s:Submolt {name: row.submolt})
-        ON CREATE SET s.first_seen_at=datetime($obs)
-        SET s.last_seen_at=datetime($obs)
-
-        WITH row, a, s
-        MATCH (p:Post {id: row.id})
-        MERGE (a)-[r1:AUTHORED]->(p)
-        ON CREATE SET r1.first_seen_at=datetime($obs), r1.created_at = p.created_at
-        SET r1.last_seen_at=datetime($obs)
-
-        MERGE (p)-[r2:IN_SUBMOLT]->(s)
-        ON CREATE SET r2.first_seen_at=datetime($obs), r2.created_at = p.created_at
-        SET r2.last_seen_at=datetime($obs)
+        (query, rows) batches for comment trees, in the order they must be committed.
+
+        REPLY_TO MATCHes the parent Comment, which (pre-order) comes earlier in the stream.
+        Pending roots are yielded before any replies batch, so a parent is always written
+        first (or merged earlier in the same batch).
         """
+        rows = itertools.chain.from_iterable(_comment_rows(pid, tree) for pid, tree in trees)
+        size = self.relationship_batch_size
+        roots: List[Dict[str, Any]] = []
+        replies: List[Dict[str, Any]] = []
+        for r in _unique_by(rows, "id"):
+            if r.get("parent_id"):
+                replies.append(r)
+                if len(replies) >= size:
+                    if roots:
+                        yield _Q_COMMENT_ROOTS, roots
+                        roots = []
+                    yield _Q_COMMENT_REPLIES, replies
+                    replies = []
+            else:
+                roots.append(r)
+                if len(roots) >= size:
+                    yield _Q_COMMENT_ROOTS, roots
+                    roots = []
+        if roots:
+            yield _Q_COMMENT_ROOTS, roots
+        if replies:
+            yield _Q_COMMENT_REPLIES, replies
 
-        def norm(p: Dict[str, Any]) -> Dict[str, Any]:
-            author = p.get("author") or {}
-            sub = p.get("submolt")
-            submolt_name = sub.get("name") if isinstance(sub, dict) else sub
-            return {
-                "id": p.get("id"),
-                "title": p.get("title"),
-                "content": p.get("content"),
-                "url": p.get("url"),
-                "submolt": submolt_name,
-                "submolt_id": sub.get("id") if isinstance(sub, dict) else None,
-                "type": p.get("type"),  # 'text'/'link'
-                "score": p.get("score"),
-                "upvotes": p.get("upvotes"),
-                "downvotes": p.get("downvotes"),
-                "comment_count": p.get("comment_count"),
-                "hot_score": p.get("hot_score"),
-                "is_pinned": p.get("is_pinned"),
-                "is_locked": p.get("is_locked"),
-                "is_deleted": p.get("is_deleted"),
-                "created_at": p.get("created_at"),
-                "updated_at": p.get("updated_at"),
-                "verification_status": p.get("verification_status"),
-                "is_spam": p.get("is_spam"),
-
-                # author fields
-                "author_id": author.get("id") or p.get("author_id"),
-                "author_name": author.get("name") or (p.get("author") if isinstance(p.get("author"), str) else None),
-                "author_description": author.get("description"),
-                "author_avatar_url": author.get("avatarUrl") or author.get("avatar_url"),
-                "author_karma": author.get("karma"),
-                "author_follower_count": author.get("followerCount") or author.get("follower_count"),
-                "author_following_count": author.get("followingCount") or author.get("following_count"),
-                "author_is_claimed": author.get("isClaimed") if "isClaimed" in author else author.get("is_claimed"),
-                "author_is_active": author.get("isActive") if "isActive" in author else author.get("is_active"),
-                "author_created_at": author.get("createdAt") or author.get("created_at"),
-                "author_last_active": author.get("lastActive") or author.get("last_active"),
-                "author_display_name": author.get("displayName") or author.get("display_name"),
-            }
-
-        tmp = [norm(p) for p in posts if p.get("id") and p.get("created_at")]
-        rows = [r for r in tmp if r.get("author_name") and r.get("submolt")]
-        with self.driver.session() as s:
-            for batch in chunked(rows, 300):
-                s.run(q_nodes, rows=batch, obs=observed_at_iso)
-                s.run(q_rels, rows=batch, obs=observed_at_iso)
+    def upsert_comments_bulk(self, trees: Iterable[Tuple[str, List[Dict[str, Any]]]], observed_at_iso: str):
+        """
+        upsert_comments for many posts at once: (post_id, comments_tree) pairs are flattened
+        into one row stream, so a hundred small posts share a few full UNWIND batches
+        instead of paying a transaction each.
+        """
+        params = {"obs": as_datetime(observed_at_iso)}
+        # Serial on purpose: see _comment_batches for the ordering
+        for q, batch in self._comment_batches(trees):
+            self._run_batch(q, batch, params)
 
-    def upsert_comments(self, post_id: str, comments_tree: List[Dict[str, Any]], observed_at_iso: str):
-        # comments_tree is a LIST. Each comment may include nested replies.
-        flat = flatten_comments(comments_tree)
-        for c in flat:
-            c["post_id"] = c.get("post_id") or post_id
-
-        q_nodes = """
-        UNWIND $rows AS row
-        MERGE (c:Comment {id: row.id})
-        ON CREATE SET c.first_seen_at=datetime($obs), c.created_at=datetime(row.created_at)
-        SET c.last_seen_at=datetime($obs),
-            c.content = coalesce(row.content, c.content),
-            c.score = coalesce(row.score, c.score),
-            c.upvotes = coalesce(row.upvotes, c.upvotes),
-            c.downvotes = coalesce(row.downvotes, c.downvotes),
-            c.reply_count = coalesce(row.reply_count, c.reply_count),
-            c.is_deleted = coalesce(row.is_deleted, c.is_deleted),
-            c.depth = coalesce(row.depth, c.depth),
-            c.verification_status = coalesce(row.verification_status, c.verification_status),
-            c.is_spam = coalesce(row.is_spam, c.is_spam),
-            c.updated_at = CASE WHEN row.updated_at IS NULL THEN c.updated_at ELSE datetime(row.updated_at) END
+    def upsert_posts_with_comments(
+        self,
+        posts: List[Dict[str, Any]],
+        trees: Iterable[Tuple[str, List[Dict[str, Any]]]],
+        observed_at_iso: str,
+        *,
+        parallel: bool = True,
+    ):
         """
+        upsert_posts + upsert_comments_bulk in ONE write transaction (one commit instead of
+        one per batch). Posts go first so the comments' ON_POST rels find them.
 
-        q_rels = """
-        UNWIND $rows AS row
-        MERGE (a:Agent {name: row.author_name})
-        ON CREATE SET a.first_seen_at=datetime($obs)
-        SET a.last_seen_at=datetime($obs),
-            a.id = coalesce(row.author_id, a.id),
-            a.description = coalesce(row.author_description, a.description),
-            a.avatar_url = coalesce(row.author_avatar_url, a.avatar_url),
-            a.karma = coalesce(row.author_karma, a.karma),
-            a.follower_count = coalesce(row.author_follower_count, a.follower_count),
-            a.following_count = coalesce(row.author_following_count, a.following_count),
-            a.is_claimed = coalesce(row.author_is_claimed, a.is_claimed),
-            a.is_active = coalesce(row.author_is_active, a.is_active),
-            a.created_at = CASE WHEN row.author_created_at IS NULL THEN a.created_at ELSE datetime(row.author_created_at) END,
-            a.last_active = CASE WHEN row.author_last_active IS NULL THEN a.last_active ELSE datetime(row.author_last_active) END
-
-        WITH row, a
-        MATCH (c:Comment {id: row.id})
-        MATCH (p:Post {id: row.post_id})
-
-        MERGE (a)-[r1:AUTHORED]->(c)
-        ON CREATE SET r1.first_seen_at=datetime($obs), r1.created_at = c.created_at
-        SET r1.last_seen_at=datetime($obs)
-
-        MERGE (c)-[r2:ON_POST]->(p)
-        ON CREATE SET r2.first_seen_at=datetime($obs), r2.created_at = c.created_at
-        SET r2.last_seen_at=datetime($obs)
-
-        WITH row, c
-        WHERE row.parent_id IS NOT NULL
-        MATCH (parent:Comment {id: row.parent_id})
-        MERGE (c)-[r3:REPLY_TO]->(parent)
-        ON CREATE SET r3.first_seen_at=datetime($obs), r3.created_at = c.created_at
-        SET r3.last_seen_at=datetime($obs)
+        With `parallel`, large calls are sharded by post id over the worker pool: one
+        transaction per shard, each holding its posts AND their comment trees (so REPLY_TO
+        parents never cross shards). Shards only meet on shared Agent nodes; a deadlock
+        there is a TransientError that execute_write replays.
         """
+        trees = list(trees)
+        k = min(self.workers, (len(posts) + len(trees)) // _SHARD_MIN_POSTS) if parallel else 1
+        if k <= 1:
+            self._write_posts_with_comments(posts, trees, observed_at_iso)
+            return
+        shard_posts: List[List[Dict[str, Any]]] = [[] for _ in range(k)]
+        shard_trees: List[List[Tuple[str, List[Dict[str, Any]]]]] = [[] for _ in range(k)]
+        for p in posts:
+            shard_posts[hash(p.get("id")) % k].append(p)
+        for t in trees:
+            shard_trees[hash(t[0]) % k].append(t)
+        # list() drains the iterator so the first worker exception is raised here
+        list(self._pool.map(
+            lambda shard: self._write_posts_with_comments(shard[0], shard[1], observed_at_iso),
+            [(ps, ts) for ps, ts in zip(shard_posts, shard_trees) if ps or ts],
+        ))
+
+    def _write_posts_with_comments(
+        self,
+        posts: List[Dict[str, Any]],
+        trees: List[Tuple[str, List[Dict[str, Any]]]],
+        observed_at_iso: str,
+    ) -> None:
+        # Rows are built up front: execute_write may replay the whole unit on a transient error
+        rows = _post_rows(posts)
+        size = self.relationship_batch_size
+        work = [(_Q_UPSERT_POSTS, batch) for batch in chunked(rows, size)]
+        work.extend(self._comment_batches(trees))
+        if not work:
+            return
+        obs = as_datetime(observed_at_iso)
 
+        def _write(tx):
+            for q, batch in work:
+                tx.run(q, rows=batch, obs=obs).consume()
 
-        def norm(x: Dict[str, Any]) -> Dict[str, Any]:
-            author_raw = x.get("author")
+        self._session().execute_write(_write)
 
-            # author can be a dict OR a string (observed in the wild)
-            if isinstance(author_raw, dict):
-                author = author_raw
-                author_name = author.get("name") or x.get("author_name")
-            elif isinstance(author_raw, str):
-                author = {}
-                author_name = author_raw
-            else:
-                author = {}
-                author_name = x.get("author_name")
-
-            return {
-                "id": x.get("id"),
-                "post_id": x.get("post_id"),
-                "content": x.get("content"),
-                "upvotes": x.get("upvotes"),
-                "downvotes": x.get("downvotes"),
-                "score": x.get("score"),
-                "reply_count": x.get("reply_count"),
-                "is_deleted": x.get("is_deleted"),
-                "depth": x.get("depth"),
-                "verification_status": x.get("verification_status"),
-                "is_spam": x.get("is_spam"),
-                "created_at": x.get("created_at"),
-                "updated_at": x.get("updated_at"),
-
-                # flatten_comments provides parent_id if we pass it through
-                "parent_id": x.get("parent_id"),
-
-                # author nested (dict case) + safe fallbacks
-                "author_id": author.get("id") or x.get("author_id"),
-                "author_name": author_name,
-                "author_description": author.get("description"),
-                "author_avatar_url": author.get("avatarUrl") or author.get("avatar_url"),
-                "author_karma": author.get("karma"),
-                "author_follower_count": author.get("followerCount") or author.get("follower_count"),
-                "author_following_count": author.get("followingCount") or author.get("following_count"),
-                "author_is_claimed": author.get("isClaimed") if "isClaimed" in author else author.get("is_claimed"),
-                "author_is_active": author.get("isActive") if "isActive" in author else author.get("is_active"),
-                "author_created_at": author.get("createdAt") or author.get("created_at"),
-                "author_last_active": author.get("lastActive") or author.get("last_active"),
-            }
-
-        rows = [norm(c) for c in flat if c.get("id") and c.get("created_at")]
-        rows = [r for r in rows if r.get("author_name") and (r.get("post_id") or post_id)]
-        # rows = [norm(c) for c in flat if c.get("id") and c.get("created_at") and (c.get("post_id") or post_id)]
-        with self.driver.session() as s:
-            for batch in chunked(rows, 500):
-                s.run(q_nodes, rows=batch, obs=observed_at_iso)
-                s.run(q_rels, rows=batch, obs=observed_at_iso)
-
-    def upsert_moderators_for_submolt(self, submolt_name: str, moderators: List[Dict[str, Any]], observed_at_iso: str):
+    def upsert_post_with_comments(self, post: Dict[str, Any], comments_tree: List[Dict[str, Any]], observed_at_iso: str):
+        self.upsert_posts_with_comments([post], [(post["id"], comments_tree)], observed_at_iso)
+
+    @staticmethod
+    def _moderator_rows(moderators: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
         # Best-effort normalization (the API returns {moderators:[...]} but exact keys can evolve)
         # IMPORTANT: Some endpoints return wrapper objects like {"role": "...", "agent": {<full agent dict>}}
         # In that case, m["agent"] is a dict, and we MUST extract agent["name"] (Neo4j properties can't store maps).
@@ -507,84 +977,45 @@ class Neo4jStore:
                 "display_name": display_name,
                 "role": role,
             })
-        q_end_missing = """
-        MATCH (s:Submolt {name:$submolt})
-        OPTIONAL MATCH (a:Agent)-[r:MODERATES]->(s)
-        WHERE r.ended_at IS NULL AND NOT a.name IN $current
-        SET r.ended_at=datetime($obs), r.last_seen_at=datetime($obs)
+        return current_names, rows
+
+    def upsert_moderators_bulk(self, pairs: Iterable[Tuple[str, List[Dict[str, Any]]]], observed_at_iso: str):
         """
-        q_merge = """
-        UNWIND $rows AS row
-        MERGE (s:Submolt {name:$submolt})
-        ON CREATE SET s.first_seen_at=datetime($obs)
-        SET s.last_seen_at=datetime($obs)
-
-        MERGE (a:Agent {name: row.name})
-        ON CREATE SET a.first_seen_at=datetime($obs)
-        SET a.last_seen_at=datetime($obs),
-            a.display_name = coalesce(row.display_name, a.display_name)
-
-        MERGE (a)-[r:MODERATES]->(s)
-        ON CREATE SET r.first_seen_at=datetime($obs)
-        SET r.last_seen_at=datetime($obs),
-            r.role = coalesce(row.role, r.role),
-            r.ended_at = NULL
+        End MODERATES edges no longer listed, then merge the current moderators, for many
+        (submolt_name, moderators) pairs: one UNWIND per `relationship_batch_size` submolts
+        instead of one round trip each. Batches run serially: the same agent often
+        moderates several submolts.
         """
-        with self.driver.session() as s:
-            s.run(q_end_missing, submolt=submolt_name, current=current_names, obs=observed_at_iso)
-            s.run(q_merge, submolt=submolt_name, rows=rows, obs=observed_at_iso)
-
-    def upsert_similar(self, agent_name: str, similar_names: List[str], observed_at_iso: str, source: str="html_profile"):
-        # End old edges not present now, then merge current.
-        q_end_missing = """
-        MATCH (a:Agent {name:$agent})
-        OPTIONAL MATCH (a)-[r:SIMILAR_TO {source:$source}]->(b:Agent)
-        WHERE r.ended_at IS NULL AND NOT b.name IN $current
-        SET r.ended_at=datetime($obs), r.last_seen_at=datetime($obs)
+        subs = []
+        for submolt_name, moderators in pairs:
+            if not submolt_name:
+                continue
+            current_names, rows = self._moderator_rows(moderators)
+            subs.append({"submolt": submolt_name, "current": current_names, "mods": rows})
+        self._run_batches(_Q_UPSERT_MODERATORS_BULK, subs, self.relationship_batch_size, parallel=False, obs=as_datetime(observed_at_iso))
+
+    def upsert_similar(
+        self,
+        agent_name: str,
+        similar_names: List[str],
+        observed_at_iso: str,
+        source: str="html_profile",
+        ):
         """
-        q_merge = """
-        UNWIND $rows AS row
-        MERGE (a:Agent {name:$agent})
-        ON CREATE SET a.first_seen_at=datetime($obs)
-        SET a.last_seen_at=datetime($obs)
-
-        MERGE (b:Agent {name: row.other})
-        ON CREATE SET b.first_seen_at=datetime($obs)
-        SET b.last_seen_at=datetime($obs)
-
-        MERGE (a)-[r:SIMILAR_TO {source:$source}]->(b)
-        ON CREATE SET r.first_seen_at=datetime($obs)
-        SET r.last_seen_at=datetime($obs),
-            r.ended_at = NULL
+        End old SIMILAR_TO edges from `source` that are not in `similar_names`, then merge
+        the current ones. With an empty list it only expires, without the UNWIND/MERGE half.
         """
-        rows = [{"other": n} for n in sorted(set(similar_names)) if n and n != agent_name]
-        with self.driver.session() as s:
-            s.run(q_end_missing, agent=agent_name, source=source, current=[r["other"] for r in rows], obs=observed_at_iso)
-            if rows:
-                s.run(q_merge, agent=agent_name, rows=rows, source=source, obs=observed_at_iso)
+        # Order-preserving dedup; no sort needed, every row merges under the same `a`
+        rows = [{"other": n} for n in dict.fromkeys(n for n in similar_names if n and n != agent_name)]
+        obs = as_datetime(observed_at_iso)
+        if not rows:
+            self._session().run(_Q_EXPIRE_SIMILAR, agent=agent_name, source=source, current=[], obs=obs).consume()
+            return
+        # Expire and merge in one statement (as upsert_moderators_bulk does)
+        self._session().run(_Q_UPSERT_SIMILAR, agent=agent_name, source=source, current=[r["other"] for r in rows], rows=rows, obs=obs).consume()
 
     def write_feed_snapshot(self, crawl_id: str, sort: str, posts: List[Dict[str, Any]], observed_at_iso: str):
         fs_id = f"{crawl_id}:{sort}"
-        q = """
-        MERGE (fs:FeedSnapshot {id:$id})
-        ON CREATE SET fs.first_seen_at=datetime($obs), fs.observed_at=datetime($obs)
-        SET fs.last_seen_at=datetime($obs),
-            fs.sort = $sort
-
-        WITH fs
-        UNWIND $rows AS row
-        MERGE (p:Post {id: row.id})
-        ON CREATE SET p.first_seen_at=datetime($obs), p.created_at=datetime(row.created_at)
-        SET p.last_seen_at=datetime($obs),
-            p.title = coalesce(row.title, p.title),
-            p.submolt = coalesce(row.submolt, p.submolt),
-            p.score = coalesce(row.score, p.score)
-
-        MERGE (fs)-[r:CONTAINS]->(p)
-        ON CREATE SET r.first_seen_at=datetime($obs)
-        SET r.last_seen_at=datetime($obs),
-            r.rank = row.rank
-        """
         rows = []
         for i, p in enumerate(posts):
             rows.append({
@@ -592,8 +1023,8 @@ class Neo4jStore:
                 "title": p.get("title"),
                 "submolt": self._submolt_name(p.get("submolt")),
                 "score": p.get("score"),
-                "created_at": p.get("created_at"),
+                "created_at": as_datetime(p.get("created_at")),
                 "rank": i+1,
             })
-        with self.driver.session() as s:
-            s.run(q, id=fs_id, sort=sort, rows=[r for r in rows if r["id"]], obs=observed_at_iso)
+        s = self._session()
+        s.run(_Q_FEED_SNAPSHOT, id=fs_id, sort=sort, rows=[r for r in rows if r["id"]], obs=as_datetime(observed_at_iso)).consume()
@@ -3,7 +3,8 @@
 Backfill missing comments for posts already in Neo4j by:
   1) querying Neo4j for posts where stored_comments < p.comment_count
   2) fetching comments from Moltbook API for those post_ids
-  3) upserting comments + edges into Neo4j via Neo4jStore.upsert_comments()
+  3) upserting comments + edges into Neo4j via Neo4jStore.upsert_comments_bulk(),
+     --write-batch posts at a time
 
 Best used after you patch upsert_comments() to handle author as dict OR string.
 """
@@ -11,10 +12,14 @@ Best used after you patch upsert_comments() to handle author as dict OR string.
 import os
 import time
 import argparse
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 import requests
+from neo4j import Session
 
 from moltbook_client import MoltbookClient
 from neo4j_store import Neo4jStore
@@ -25,52 +30,108 @@ def iso_now() -> str:
     return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
 
 
+# (camelCase, snake_case) drift pairs; the snake_case key wins when both are present
+_COMMENT_KEY_DRIFT = (
+    ("createdAt", "created_at"),
+    ("updatedAt", "updated_at"),
+    ("replyCount", "reply_count"),
+    ("authorName", "author_name"),
+)
+
+
 def _normalize_comment_tree(tree: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Make comment objects tolerant to camelCase vs snake_case drift.
-    Recurses over `replies`.
+    Walks `replies` iteratively and fills the snake_case keys IN PLACE: the tree is a
+    freshly decoded API response owned by the caller, so no per-node copies are made.
+    A `replies` list is only rebuilt when it contains non-dict entries.
+    Decoding is not done here: MoltbookClient already parses bodies with orjson when it
+    is installed (json_loads), so this pass is only the drift-key lookups on each node.
+    """
+    out = [x for x in tree if isinstance(x, dict)]
+    stack = list(out)
+    while stack:
+        c = stack.pop()
+        for camel, snake in _COMMENT_KEY_DRIFT:
+            if camel in c and snake not in c:
+                c[snake] = c[camel]
+        replies = c.get("replies")
+        if isinstance(replies, list) and replies:
+            if not all(isinstance(r, dict) for r in replies):
+                replies = c["replies"] = [r for r in replies if isinstance(r, dict)]
+            stack.extend(replies)
+    return out
+
+
+def _tree_ids(tree: List[Dict[str, Any]]) -> Set[str]:
+    out: Set[str] = set()
+    stack = list(tree)
+    while stack:
+        c = stack.pop()
+        if c.get("id"):
+            out.add(c["id"])
+        stack.extend(c.get("replies") or ())
+    return out
+
+
+class _AuthOrder:
     """
-    def norm_one(c: Dict[str, Any]) -> Dict[str, Any]:
-        c2 = dict(c)
+    Per endpoint kind: after AUTH_FIRST_AFTER consecutive 401/403s on the no-auth attempt,
+    go auth-first (one round-trip instead of two on auth-only deployments). A no-auth
+    success resets the count; the other order stays as the fallback either way.
+    Shared by the client.imap worker threads, hence the lock.
+    """
+
+    def __init__(self, threshold: int) -> None:
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._denied: Dict[str, int] = {}
 
-        # common key drift
-        if "created_at" not in c2 and "createdAt" in c2:
-            c2["created_at"] = c2.get("createdAt")
-        if "updated_at" not in c2 and "updatedAt" in c2:
-            c2["updated_at"] = c2.get("updatedAt")
-        if "reply_count" not in c2 and "replyCount" in c2:
-            c2["reply_count"] = c2.get("replyCount")
+    def auth_first(self, kind: str) -> bool:
+        return self._denied.get(kind, 0) >= self.threshold
 
-        # authorName drift (if present)
-        if "author_name" not in c2 and "authorName" in c2:
-            c2["author_name"] = c2.get("authorName")
+    def record(self, kind: str, *, denied: bool) -> None:
+        with self._lock:
+            self._denied[kind] = self._denied.get(kind, 0) + 1 if denied else 0
 
-        # recurse
-        replies = c2.get("replies")
-        if isinstance(replies, list):
-            c2["replies"] = [norm_one(r) for r in replies if isinstance(r, dict)]
-        return c2
 
-    return [norm_one(x) for x in tree if isinstance(x, dict)]
+_auth_order = _AuthOrder(int(os.getenv("AUTH_FIRST_AFTER", "20")))
 
 
-def _req_noauth_then_auth(client: MoltbookClient, method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+def _is_auth_denied(e: requests.exceptions.HTTPError) -> bool:
+    resp = e.response
+    return resp is not None and resp.status_code in (401, 403)
+
+
+def _req_noauth_then_auth(client: MoltbookClient, method: str, path: str, params: Optional[Dict[str, Any]] = None, *, kind: str) -> Any:
     """
     Prefer no-auth first (public endpoints often behave better), then fallback to auth on 401/403.
+    Once `kind` has been denied without auth AUTH_FIRST_AFTER times in a row, auth goes first.
     """
+    if _auth_order.auth_first(kind):
+        try:
+            return client._req(method, path, params=params, no_auth=False)  # type: ignore[attr-defined]
+        except requests.exceptions.HTTPError as e:
+            if not _is_auth_denied(e):
+                raise
     try:
-        return client._req(method, path, params=params, no_auth=True)  # type: ignore[attr-defined]
+        resp = client._req(method, path, params=params, no_auth=True)  # type: ignore[attr-defined]
     except requests.exceptions.HTTPError as e:
-        resp = e.response
-        code = resp.status_code if resp is not None else None
-        if code in (401, 403):
+        if _is_auth_denied(e):
+            _auth_order.record(kind, denied=True)
             return client._req(method, path, params=params, no_auth=False)  # type: ignore[attr-defined]
         raise
+    _auth_order.record(kind, denied=False)
+    return resp
 
 
-def fetch_comments_any(client: MoltbookClient, post_id: str, *, sort: str, limit: int) -> List[Dict[str, Any]]:
-    params = {"sort": sort, "limit": int(limit), "shuffle": int(time.time() * 1000)}
-    resp = _req_noauth_then_auth(client, "GET", f"/posts/{post_id}/comments", params=params)
+def fetch_comments_any(client: MoltbookClient, post_id: str, *, sort: str, limit: int, shuffle: Optional[int] = None) -> List[Dict[str, Any]]:
+    # `shuffle` is an optional cache-buster (computed once per run, see --shuffle); without it
+    # identical GETs stay cacheable (HTTP_CACHE=1 / CDN), e.g. across retries
+    params: Dict[str, Any] = {"sort": sort, "limit": int(limit)}
+    if shuffle is not None:
+        params["shuffle"] = shuffle
+    resp = _req_noauth_then_auth(client, "GET", f"/posts/{post_id}/comments", params=params, kind="comments")
 
     if isinstance(resp, list):
         return resp
@@ -80,16 +141,19 @@ def fetch_comments_any(client: MoltbookClient, post_id: str, *, sort: str, limit
     return []
 
 
-def fetch_post_details_any(client: MoltbookClient, post_id: str) -> Dict[str, Any]:
-    resp = _req_noauth_then_auth(client, "GET", f"/posts/{post_id}", params={"shuffle": int(time.time() * 1000)})
+def fetch_post_details_any(client: MoltbookClient, post_id: str, *, shuffle: Optional[int] = None) -> Dict[str, Any]:
+    params = {"shuffle": shuffle} if shuffle is not None else None
+    resp = _req_noauth_then_auth(client, "GET", f"/posts/{post_id}", params=params, kind="post")
     if isinstance(resp, dict) and isinstance(resp.get("post"), dict):
         return resp["post"]
     return resp if isinstance(resp, dict) else {}
 
 
-def get_candidate_posts(store: Neo4jStore, *, limit_posts: int, min_missing: int) -> List[Tuple[str, int, int]]:
+def get_candidate_posts(store: Neo4jStore, *, limit_posts: int, min_missing: int) -> Iterator[Tuple[str, int, int]]:
     """
-    Returns list of (post_id, expected, got) where got < expected.
+    Yields (post_id, expected, got) where got < expected, streamed from the cursor.
+    Reads on its own session, held open until the generator is exhausted or closed: the
+    run's write session would otherwise buffer the whole open result on its next write.
     """
     q = """
     MATCH (p:Post)
@@ -103,15 +167,22 @@ def get_candidate_posts(store: Neo4jStore, *, limit_posts: int, min_missing: int
     LIMIT $limit
     """
     with store.driver.session() as s:
-        res = s.run(q, limit=int(limit_posts), min_missing=int(min_missing))
-        out = []
-        for r in res:
+        for r in s.run(q, limit=int(limit_posts), min_missing=int(min_missing)):
             if r and r.get("id"):
-                out.append((r["id"], int(r["expected"]), int(r["got"])))
-        return out
+                yield (r["id"], int(r["expected"]), int(r["got"]))
 
 
-def mark_post_backfill(store: Neo4jStore, post_id: str, *, status: str, expected: int, got_before: int, got_fetched: int, obs: str) -> None:
+def get_existing_comment_ids(session: Session, post_ids: List[str]) -> Dict[str, Set[str]]:
+    """Comment ids already stored per post, for a whole write batch in one read."""
+    q = """
+    UNWIND $pids AS pid
+    MATCH (:Post {id: pid})<-[:ON_POST]-(c:Comment)
+    RETURN pid, collect(c.id) AS existing
+    """
+    return {r["pid"]: set(r["existing"]) for r in session.run(q, pids=post_ids)}
+
+
+def mark_post_backfill(session: Session, post_id: str, *, status: str, expected: int, got_before: int, got_fetched: int, obs: str) -> None:
     q = """
     MATCH (p:Post {id:$id})
     SET p.comments_backfilled_at = datetime($obs),
@@ -120,10 +191,27 @@ def mark_post_backfill(store: Neo4jStore, post_id: str, *, status: str, expected
         p.comments_backfill_got_before = $got_before,
         p.comments_backfill_fetched = $got_fetched
     """
-    with store.driver.session() as s:
-        s.run(q, id=post_id, obs=obs, status=status, expected=expected, got_before=got_before, got_fetched=got_fetched)
+    session.run(q, id=post_id, obs=obs, status=status, expected=expected, got_before=got_before, got_fetched=got_fetched).consume()
+
+def mark_posts_backfill(session: Session, rows: List[Dict[str, Any]], obs: str) -> None:
+    """
+    Batched mark_post_backfill: one UNWIND for a whole flush instead of a transaction per
+    post. Rows carry id, status, expected, got_before, got_fetched.
+    """
+    if not rows:
+        return
+    q = """
+    UNWIND $rows AS row
+    MATCH (p:Post {id: row.id})
+    SET p.comments_backfilled_at = datetime($obs),
+        p.comments_backfill_status = row.status,
+        p.comments_backfill_expected = row.expected,
+        p.comments_backfill_got_before = row.got_before,
+        p.comments_backfill_fetched = row.got_fetched
+    """
+    session.run(q, rows=rows, obs=obs).consume()
 
-def mark_post_deleted_404(store: Neo4jStore, post_id: str, obs: str, *, reason: str = "api_404") -> None:
+def mark_post_deleted_404(session: Session, post_id: str, obs: str, *, reason: str = "api_404") -> None:
     """404 from /posts/:id or /posts/:id/comments => post no longer exists (mark deleted but keep node)."""
     q = """
     MERGE (p:Post {id:$id})
@@ -135,11 +223,10 @@ def mark_post_deleted_404(store: Neo4jStore, post_id: str, obs: str, *, reason:
         p.deleted_at = datetime($obs),
         p.deletion_reason = $reason
     """
-    with store.driver.session() as s:
-        s.run(q, id=post_id, obs=obs, reason=reason)
+    session.run(q, id=post_id, obs=obs, reason=reason).consume()
 
 
-def mark_comments_deleted_for_post(store: Neo4jStore, post_id: str, obs: str, *, reason: str = "api_404") -> None:
+def mark_comments_deleted_for_post(session: Session, post_id: str, obs: str, *, reason: str = "api_404") -> None:
     """If a post is deleted, any comments we previously stored under it should be marked deleted too."""
     q = """
     MATCH (p:Post {id:$id})
@@ -153,8 +240,7 @@ def mark_comments_deleted_for_post(store: Neo4jStore, post_id: str, obs: str, *,
             c.deletion_reason = $reason
     )
     """
-    with store.driver.session() as s:
-        s.run(q, id=post_id, obs=obs, reason=reason)
+    session.run(q, id=post_id, obs=obs, reason=reason).consume()
 
 
 def main() -> int:
@@ -167,6 +253,12 @@ def main() -> int:
                     help="Try /posts/:id and use post.comments if present (often a fuller tree)")
     ap.add_argument("--mark", action="store_true", help="Write backfill status fields onto Post")
     ap.add_argument("--sleep-seconds", type=float, default=0.0, help="Extra sleep between posts (in addition to client rpm)")
+    ap.add_argument("--shuffle", action="store_true",
+                    help="Add a per-run `shuffle` cache-buster param to API GETs (off: responses stay cacheable)")
+    ap.add_argument("--write-batch", type=int, default=500,
+                    help="Posts buffered per bulk comment write (one upsert_comments_bulk call)")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Concurrent API fetches (default: min(POOL_MAXSIZE, REQUESTS_PER_MINUTE)); rpm still applies")
     args = ap.parse_args()
 
     # Neo4j env required
@@ -177,75 +269,158 @@ def main() -> int:
     client = MoltbookClient()
     store = Neo4jStore(os.environ["NEO4J_URI"], os.environ["NEO4J_USER"], os.environ["NEO4J_PASSWORD"])
 
+    # One session for the whole run (driver sessions are cheap to reuse, not to open per write);
+    # every write helper below takes it instead of the store
+    session = store.driver.session()
+
     obs = iso_now()
     cands = get_candidate_posts(store, limit_posts=args.limit_posts, min_missing=args.min_missing)
-    print(f"[backfill-comments] candidates={len(cands)} limit_posts={args.limit_posts} min_missing={args.min_missing}")
+    print(f"[backfill-comments] streaming candidates limit_posts={args.limit_posts} min_missing={args.min_missing}")
+
+    shuffle = int(time.time() * 1000) if args.shuffle else None
+
+    def fetch_one(post_id: str) -> List[Dict[str, Any]]:
+        # API work only (runs on client.imap worker threads); Neo4j writes stay on this thread
+        tree: Optional[List[Dict[str, Any]]] = None
+
+        if args.prefer_post_details:
+            post_obj = fetch_post_details_any(client, post_id, shuffle=shuffle)
+            comments = post_obj.get("comments")
+            if isinstance(comments, list) and comments:
+                tree = comments
+
+        if tree is None:
+            tree = fetch_comments_any(client, post_id, sort=args.sort, limit=args.max_comments, shuffle=shuffle)
+
+        return _normalize_comment_tree(tree or [])
 
     ok = 0
     skipped_empty = 0
+    skipped_complete = 0
     skipped_deleted = 0
     errors = 0
+    i = 0
+    # (post_id, tree, expected, got_before) waiting for the next bulk write
+    pending: List[Tuple[str, List[Dict[str, Any]], int, int]] = []
+
+    # Bulk writes run on one writer thread (with its own session; sessions are not
+    # thread-safe) so imap keeps fetching while a batch is written. One batch in flight:
+    # the next flush waits for it, which bounds memory when Neo4j is the slower side.
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backfill-writer")
+    write_session = store.driver.session()
+    inflight: Optional[Future] = None
+
+    def write_batch(batch: List[Tuple[str, List[Dict[str, Any]], int, int]]) -> Tuple[int, int, int]:
+        # (ok, error, already_complete) counts; failures are counted here, never raised, so
+        # they can't surface in the fetch loop against whichever post triggered the flush
+        # Posts whose fetched tree holds no comment we don't already have are not re-merged
+        # (status already_complete): one read per batch instead of a MERGE per comment
+        todo = batch  # if the read fails, the whole batch counts (and is marked) as error
+        try:
+            existing = get_existing_comment_ids(write_session, [pid for pid, _, _, _ in batch])
+            todo = [b for b in batch if not _tree_ids(b[1]) <= existing.get(b[0], set())]
+            if todo:
+                store.upsert_comments_bulk([(pid, tree) for pid, tree, _, _ in todo], obs)
+        except Exception as e:
+            print(f"[error] bulk write of {len(todo)} posts: {e}")
+            status = "error"
+        else:
+            status = "ok"
+        todo_ids = {b[0] for b in todo}
+        if args.mark:
+            rows = []
+            for pid, tree, expected, got_before in batch:
+                st = status if pid in todo_ids else "already_complete"
+                rows.append({
+                    "id": pid,
+                    "status": st,
+                    "expected": expected,
+                    "got_before": got_before,
+                    "got_fetched": 0 if st == "error" else len(tree),
+                })
+            try:
+                mark_posts_backfill(write_session, rows, obs)
+            except Exception as e:
+                # the comments are written either way; a missed mark only means a re-check next run
+                print(f"[error] marking {len(rows)} posts: {e}")
+        n_done = len(todo) if status == "ok" else 0
+        return n_done, len(todo) - n_done, len(batch) - len(todo)
+
+    def drain() -> None:
+        nonlocal ok, errors, skipped_complete, inflight
+        if inflight is not None:
+            f, inflight = inflight, None
+            n_ok, n_err, n_complete = f.result()
+            ok += n_ok
+            errors += n_err
+            skipped_complete += n_complete
+
+    def flush() -> None:
+        nonlocal inflight
+        if not pending:
+            return
+        batch = pending[:]
+        pending.clear()
+        drain()
+        inflight = writer.submit(write_batch, batch)
 
     try:
-        for i, (post_id, expected, got_before) in enumerate(cands, 1):
+        # tee: imap reads ahead of the loop by at most its in-flight window
+        to_fetch, rows = itertools.tee(cands)
+        fetched = client.imap(fetch_one, (c[0] for c in to_fetch), workers=args.workers, return_exceptions=True)
+        for i, ((post_id, expected, got_before), tree) in enumerate(zip(rows, fetched), 1):
             try:
-                tree: Optional[List[Dict[str, Any]]] = None
-
-                if args.prefer_post_details:
-                    post_obj = fetch_post_details_any(client, post_id)
-                    comments = post_obj.get("comments")
-                    if isinstance(comments, list) and comments:
-                        tree = comments
-
-                if tree is None:
-                    tree = fetch_comments_any(client, post_id, sort=args.sort, limit=args.max_comments)
-
-                tree = _normalize_comment_tree(tree or [])
+                if isinstance(tree, Exception):
+                    raise tree
 
                 if not tree:
                     skipped_empty += 1
                     if args.mark:
-                        mark_post_backfill(store, post_id, status="empty", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
+                        mark_post_backfill(session, post_id, status="empty", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
                     continue
 
-                store.upsert_comments(post_id, tree, obs)
-                ok += 1
-
-                if args.mark:
-                    mark_post_backfill(store, post_id, status="ok", expected=expected, got_before=got_before, got_fetched=len(tree), obs=obs)
+                pending.append((post_id, tree, expected, got_before))
+                if len(pending) >= args.write_batch:
+                    flush()
 
             except requests.exceptions.HTTPError as e:
                 code = getattr(getattr(e, "response", None), "status_code", None)
                 if code == 404:
                     # Treat 404 as a deletion signal (keep the nodes, just mark them).
-                    mark_post_deleted_404(store, post_id, obs)
-                    mark_comments_deleted_for_post(store, post_id, obs)
+                    mark_post_deleted_404(session, post_id, obs)
+                    mark_comments_deleted_for_post(session, post_id, obs)
                     skipped_deleted += 1
                     print(f"[deleted][post] {post_id}: inferred via 404")
                     if args.mark:
-                        mark_post_backfill(store, post_id, status="deleted_404", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
+                        mark_post_backfill(session, post_id, status="deleted_404", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
                     continue
 
                 errors += 1
                 print(f"[error][http] post={post_id}: {e}")
                 if args.mark:
-                    mark_post_backfill(store, post_id, status="error", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
+                    mark_post_backfill(session, post_id, status="error", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
 
             except Exception as e:
                 errors += 1
                 print(f"[error] post={post_id}: {e}")
                 if args.mark:
-                    mark_post_backfill(store, post_id, status="error", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
+                    mark_post_backfill(session, post_id, status="error", expected=expected, got_before=got_before, got_fetched=0, obs=obs)
             if args.sleep_seconds > 0:
                 time.sleep(args.sleep_seconds)
 
             if i % 50 == 0:
-                print(f"[backfill-comments] {i}/{len(cands)} ok={ok} empty={skipped_empty} deleted={skipped_deleted} errors={errors}")
+                print(f"[backfill-comments] {i}/{args.limit_posts} ok={ok} empty={skipped_empty} complete={skipped_complete} deleted={skipped_deleted} errors={errors}")
 
+        flush()
+        drain()
     finally:
+        writer.shutdown(wait=True)
+        write_session.close()
+        cands.close()  # releases the candidate read session if the loop stopped early
+        session.close()
         store.close()
 
-    print(f"[done] ok={ok} empty={skipped_empty} deleted={skipped_deleted} errors={errors}")
+    print(f"[done] candidates={i} ok={ok} empty={skipped_empty} complete={skipped_complete} deleted={skipped_deleted} errors={errors}")
     return 0
 
 
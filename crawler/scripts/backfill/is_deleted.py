@@ -18,14 +18,16 @@ Behavior:
 """
 
 import os
+import json
 import time
 import argparse
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
+from neo4j import ManagedTransaction, Session
 
-from neo4j_store import Neo4jStore
+from neo4j_store import Neo4jStore, as_datetime, dedupe
 from moltbook_client import MoltbookClient
 
 
@@ -34,56 +36,57 @@ def iso_now() -> str:
 
 
 def flatten_comments(tree: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Iterative pre-order walk (same order as the old recursion): deep reply chains
+    # can't hit the recursion limit, and there is no per-call closure
     flat: List[Dict[str, Any]] = []
-
-    def rec(node: Dict[str, Any]) -> None:
+    stack = list(reversed(tree or []))
+    while stack:
+        node = stack.pop()
         if not isinstance(node, dict):
-            return
+            continue
         flat.append(node)
-        replies = node.get("replies") or []
+        replies = node.get("replies")
         if isinstance(replies, list):
-            for r in replies:
-                rec(r)
-
-    for c in tree or []:
-        rec(c)
+            stack.extend(reversed(replies))
     return flat
 
 
-def get_agent_names(store: Neo4jStore, limit_n: int) -> List[str]:
-    q = """
-    MATCH (a:Agent)
-    WHERE a.name IS NOT NULL
-    RETURN a.name AS name
-    ORDER BY coalesce(a.last_seen_at, a.created_at) DESC
-    LIMIT $limit
-    """
-    with store.driver.session() as s:
-        return [r["name"] for r in s.run(q, limit=int(limit_n)) if r and r.get("name")]
+Cursor = Optional[Tuple[Optional[str], str]]  # (last_seen_at ISO or None, key)
 
 
-def get_submolt_names(store: Neo4jStore, limit_n: int) -> List[str]:
-    q = """
-    MATCH (s:Submolt)
-    WHERE s.name IS NOT NULL
-    RETURN s.name AS name
-    ORDER BY coalesce(s.last_seen_at, s.created_at) DESC
-    LIMIT $limit
-    """
-    with store.driver.session() as s:
-        return [r["name"] for r in s.run(q, limit=int(limit_n)) if r and r.get("name")]
+def load_cursors(path: Optional[str]) -> Dict[str, Any]:
+    """--cursor-file state: {"agents"|"submolts"|"posts": [last_seen_at ISO, key]}."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
-def get_post_ids(store: Neo4jStore, limit_n: int) -> List[str]:
-    q = """
-    MATCH (p:Post)
-    WHERE p.id IS NOT NULL
-    RETURN p.id AS id
-    ORDER BY coalesce(p.last_seen_at, p.created_at) DESC
-    LIMIT $limit
-    """
-    with store.driver.session() as s:
-        return [r["id"] for r in s.run(q, limit=int(limit_n)) if r and r.get("id")]
+def save_cursors(path: Optional[str], cursors: Dict[str, Any]) -> None:
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cursors, f)
+
+
+def _cursor(cursors: Dict[str, Any], kind: str) -> Cursor:
+    c = cursors.get(kind)
+    return (c[0], c[1]) if c else None
+
+
+# Keyset pages over the *_last_seen indexes (most recently seen first): each call reads
+# `limit` index entries instead of sorting every node. Nodes without last_seen_at (which
+# the old coalesce(last_seen_at, created_at) order ranked by created_at) now come last,
+# after every seen node, in key order.
+def get_agent_names(store: Neo4jStore, limit_n: int, cursor: Cursor = None) -> Tuple[List[str], Cursor]:
+    return store.get_recently_seen_keys("Agent", limit_n, cursor=cursor)
+
+
+def get_submolt_names(store: Neo4jStore, limit_n: int, cursor: Cursor = None) -> Tuple[List[str], Cursor]:
+    return store.get_recently_seen_keys("Submolt", limit_n, cursor=cursor)
+
+
+def get_post_ids(store: Neo4jStore, limit_n: int, cursor: Cursor = None) -> Tuple[List[str], Cursor]:
+    return store.get_recently_seen_keys("Post", limit_n, cursor=cursor)
 
 
 def fetch_comments_public_then_auth(
@@ -101,53 +104,71 @@ def fetch_comments_public_then_auth(
         raise
 
 
-def update_agent(store: Neo4jStore, name: str, is_deleted: Any, updated_at: Optional[str]) -> int:
+async def fetch_comments_public_then_auth_async(aclient: Any, post_id: str, sort: str, limit: int) -> List[Dict[str, Any]]:
+    """fetch_comments_public_then_auth on AsyncMoltbookClient (--async-http)."""
+    try:
+        return await aclient.get_comments(post_id, sort=sort, limit=limit, no_auth=True) or []
+    except requests.exceptions.HTTPError as e:
+        code = getattr(e.response, "status_code", None)
+        if code in (401, 403):
+            return await aclient.get_comments(post_id, sort=sort, limit=limit, no_auth=False) or []
+        raise
+
+
+def _deleted_row(key_name: str, key: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Row for the batched updates' `SET n += row.props`. updated_at is parsed here once
+    (as_datetime, sent as a native temporal) and left out when missing or unparseable,
+    which keeps the stored value without a per-row CASE/datetime() in Cypher.
+    """
+    props = {"is_deleted": obj.get("is_deleted")}
+    ts = as_datetime(obj.get("updated_at") or obj.get("updatedAt"))
+    if ts is not None:
+        props["updated_at"] = ts
+    return {key_name: key, "props": props}
+
+
+def _update_batch(tx: ManagedTransaction, q: str, rows: List[Dict[str, Any]]) -> int:
+    if not rows:
+        return 0
+    rec = tx.run(q, rows=rows).single()
+    return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+
+
+def update_agents_batch(tx: ManagedTransaction, rows: List[Dict[str, Any]]) -> int:
+    """rows: {name, props} (see _deleted_row); one UNWIND per batch instead of a transaction per agent."""
     q = """
-    MATCH (a:Agent {name:$name})
-    SET a.is_deleted = $is_deleted,
-        a.updated_at = CASE
-            WHEN $updated_at IS NULL THEN a.updated_at
-            ELSE datetime($updated_at)
-        END
+    UNWIND $rows AS row
+    MATCH (a:Agent {name: row.name})
+    SET a += row.props
     RETURN count(a) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, name=name, is_deleted=is_deleted, updated_at=updated_at).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    return _update_batch(tx, q, rows)
 
 
-def update_submolt(store: Neo4jStore, name: str, is_deleted: Any, updated_at: Optional[str]) -> int:
+def update_submolts_batch(tx: ManagedTransaction, rows: List[Dict[str, Any]]) -> int:
+    """rows: {name, props}"""
     q = """
-    MATCH (s:Submolt {name:$name})
-    SET s.is_deleted = $is_deleted,
-        s.updated_at = CASE
-            WHEN $updated_at IS NULL THEN s.updated_at
-            ELSE datetime($updated_at)
-        END
+    UNWIND $rows AS row
+    MATCH (s:Submolt {name: row.name})
+    SET s += row.props
     RETURN count(s) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, name=name, is_deleted=is_deleted, updated_at=updated_at).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    return _update_batch(tx, q, rows)
 
 
-def update_post(store: Neo4jStore, post_id: str, is_deleted: Any, updated_at: Optional[str]) -> int:
+def update_posts_batch(tx: ManagedTransaction, rows: List[Dict[str, Any]]) -> int:
+    """rows: {id, props}"""
     q = """
-    MATCH (p:Post {id:$id})
-    SET p.is_deleted = $is_deleted,
-        p.updated_at = CASE
-            WHEN $updated_at IS NULL THEN p.updated_at
-            ELSE datetime($updated_at)
-        END
+    UNWIND $rows AS row
+    MATCH (p:Post {id: row.id})
+    SET p += row.props
     RETURN count(p) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, id=post_id, is_deleted=is_deleted, updated_at=updated_at).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
-
+    return _update_batch(tx, q, rows)
 
 
-def mark_post_deleted_404(store: Neo4jStore, post_id: str, observed_at: str, *, reason: str = "api_404") -> int:
+def mark_post_deleted_404(session: Session, post_id: str, observed_at: str, *, reason: str = "api_404") -> int:
     """
     If Moltbook returns 404 for a post fetch/comments fetch, infer post was deleted.
     Keep the node; mark it deleted and record when observed.
@@ -161,11 +182,10 @@ def mark_post_deleted_404(store: Neo4jStore, post_id: str, observed_at: str, *,
         p.deletion_reason = $reason
     RETURN count(p) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, id=post_id, obs=observed_at, reason=reason).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    rec = session.run(q, id=post_id, obs=observed_at, reason=reason).single()
+    return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
 
-def mark_agent_deleted_404(store: Neo4jStore, name: str, observed_at: str, *, reason: str = "api_404") -> int:
+def mark_agent_deleted_404(session: Session, name: str, observed_at: str, *, reason: str = "api_404") -> int:
     """If Moltbook returns 404 for an agent profile fetch, infer agent was deleted."""
     q = """
     MATCH (a:Agent {name:$name})
@@ -176,11 +196,10 @@ def mark_agent_deleted_404(store: Neo4jStore, name: str, observed_at: str, *, re
         a.deletion_reason = $reason
     RETURN count(a) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, name=name, obs=observed_at, reason=reason).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    rec = session.run(q, name=name, obs=observed_at, reason=reason).single()
+    return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
 
-def mark_submolt_deleted_404(store: Neo4jStore, name: str, observed_at: str, *, reason: str = "api_404") -> int:
+def mark_submolt_deleted_404(session: Session, name: str, observed_at: str, *, reason: str = "api_404") -> int:
     """If Moltbook returns 404 for a submolt fetch, infer submolt was deleted."""
     q = """
     MATCH (s:Submolt {name:$name})
@@ -191,11 +210,10 @@ def mark_submolt_deleted_404(store: Neo4jStore, name: str, observed_at: str, *,
         s.deletion_reason = $reason
     RETURN count(s) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, name=name, obs=observed_at, reason=reason).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    rec = session.run(q, name=name, obs=observed_at, reason=reason).single()
+    return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
 
-def mark_comments_deleted_by_post_404(store: Neo4jStore, post_id: str, observed_at: str, *, reason: str = "post_api_404") -> int:
+def mark_comments_deleted_by_post_404(session: Session, post_id: str, observed_at: str, *, reason: str = "post_api_404") -> int:
     """If a Post 404s, comments under that post are typically also gone/unreachable. Mark them deleted."""
     q = """
     MATCH (c:Comment)-[:ON_POST]->(p:Post {id:$id})
@@ -206,29 +224,31 @@ def mark_comments_deleted_by_post_404(store: Neo4jStore, post_id: str, observed_
         c.deletion_reason = $reason
     RETURN count(c) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, id=post_id, obs=observed_at, reason=reason).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    rec = session.run(q, id=post_id, obs=observed_at, reason=reason).single()
+    return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
 
 
 
-def update_comments_batch(store: Neo4jStore, rows: List[Dict[str, Any]]) -> int:
+def update_comments_batch(tx: ManagedTransaction, rows: List[Dict[str, Any]]) -> int:
     if not rows:
         return 0
 
     q = """
     UNWIND $rows AS row
     MATCH (c:Comment {id: row.id})
-    SET c.is_deleted = row.is_deleted,
-        c.updated_at = CASE
-            WHEN row.updated_at IS NULL THEN c.updated_at
-            ELSE datetime(row.updated_at)
-        END
+    SET c += row.props
     RETURN count(c) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, rows=rows).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    return _update_batch(tx, q, rows)
+
+
+# kind -> batched updater; main() writes every kind queued so far in one transaction
+_BATCH_UPDATES = {
+    "agent": update_agents_batch,
+    "submolt": update_submolts_batch,
+    "post": update_posts_batch,
+    "comment": update_comments_batch,
+}
 
 
 def main() -> int:
@@ -243,6 +263,15 @@ def main() -> int:
     ap.add_argument("--skip-posts", action="store_true")
     ap.add_argument("--skip-comments", action="store_true")
     ap.add_argument("--sleep-seconds", type=float, default=0.0)
+    ap.add_argument("--cursor-file", type=str, default=None,
+                    help="JSON file holding where the previous run stopped; each run resumes with the next "
+                         "--limit-* nodes by last_seen_at and starts over once a label is exhausted")
+    ap.add_argument("--write-batch", type=int, default=500, help="Rows per batched Neo4j update")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Concurrent API fetches (default: min(POOL_MAXSIZE, REQUESTS_PER_MINUTE), "
+                         "or MAX_CONCURRENCY with --async-http); rpm still applies")
+    ap.add_argument("--async-http", action="store_true",
+                    help="Fetch with AsyncMoltbookClient (aiohttp, one event loop) instead of worker threads")
     args = ap.parse_args()
 
     for k in ("NEO4J_URI", "NEO4J_USER", "NEO4J_PASSWORD"):
@@ -250,45 +279,83 @@ def main() -> int:
             raise SystemExit(f"Missing env var: {k}")
 
     client = MoltbookClient()
+    aclient: Any = None
+    if args.async_http:
+        from moltbook_client_async import AsyncMoltbookClient
+
+        aclient = AsyncMoltbookClient()
     store = Neo4jStore(
         os.environ["NEO4J_URI"],
         os.environ["NEO4J_USER"],
         os.environ["NEO4J_PASSWORD"],
     )
 
+    # One session for the whole run, shared by every write helper (main thread only)
+    session = store.driver.session()
+
     obs = iso_now()
+    cursors = load_cursors(args.cursor_file)
 
-    agent_updates = 0
-    submolt_updates = 0
-    post_updates = 0
-    comment_updates = 0
+    updated = dict.fromkeys(_BATCH_UPDATES, 0)
     deleted_404 = 0
     comments_deleted_404 = 0
     no_delete_field = 0
     errors = 0
 
+    def fan_out(fetch, afetch, items: List[str]):
+        # Results in input order; either way the Neo4j writes below stay on this thread
+        if aclient is not None:
+            return aclient.imap(afetch, items, workers=args.workers, return_exceptions=True)
+        return client.imap(fetch, items, workers=args.workers, return_exceptions=True)
+
+    # Rows wait here per kind until --write-batch rows are queued in total; flush() then
+    # writes all kinds in one execute_write (one commit, retried on transient errors), so
+    # the tail of one pass rides along with the head of the next
+    pending: Dict[str, List[Dict[str, Any]]] = {k: [] for k in _BATCH_UPDATES}
+
+    def queue(kind: str, rows: List[Dict[str, Any]]) -> None:
+        pending[kind].extend(rows)
+        if sum(map(len, pending.values())) >= args.write_batch:
+            flush()
+
+    def flush() -> None:
+        # A failed batch counts as one error; its rows are dropped like a failed single update
+        nonlocal errors
+        batch = {k: rows for k, rows in pending.items() if rows}
+        if not batch:
+            return
+        for k in batch:
+            pending[k] = []
+        try:
+            counts = session.execute_write(lambda tx: {k: _BATCH_UPDATES[k](tx, rows) for k, rows in batch.items()})
+        except Exception as e:
+            errors += 1
+            print(f"[error][batch] {' '.join(f'{k}s={len(rows)}' for k, rows in batch.items())}: {e}")
+            return
+        for k, n in counts.items():
+            updated[k] += n
+
     try:
         if not args.skip_agents:
-            names = get_agent_names(store, args.limit_agents)
+            names, cursors["agents"] = get_agent_names(store, args.limit_agents, _cursor(cursors, "agents"))
             print(f"[agents] checking {len(names)}")
-            for i, name in enumerate(names, 1):
+            # Fetches run ahead of this loop (see fan_out); writes are queued (see flush)
+            profiles = fan_out(client.get_agent_profile, lambda n: aclient.get_agent_profile(n), names)
+            for i, (name, prof) in enumerate(zip(names, profiles), 1):
                 try:
                     try:
-                        prof = client.get_agent_profile(name) or {}
+                        if isinstance(prof, Exception):
+                            raise prof
+                        prof = prof or {}
                     except requests.exceptions.HTTPError as e:
                         code = getattr(getattr(e, "response", None), "status_code", None)
                         if code == 404:
-                            deleted_404 += mark_agent_deleted_404(store, name, obs)
+                            deleted_404 += mark_agent_deleted_404(session, name, obs)
                             continue
                         raise
                     agent = prof.get("agent") if isinstance(prof.get("agent"), dict) else prof
                     if isinstance(agent, dict) and "is_deleted" in agent:
-                        agent_updates += update_agent(
-                            store,
-                            name,
-                            agent.get("is_deleted"),
-                            agent.get("updated_at") or agent.get("updatedAt"),
-                        )
+                        queue("agent", [_deleted_row("name", name, agent)])
                     else:
                         no_delete_field += 1
                 except Exception as e:
@@ -298,28 +365,26 @@ def main() -> int:
                 if args.sleep_seconds > 0:
                     time.sleep(args.sleep_seconds)
                 if i % 100 == 0:
-                    print(f"[agents] {i}/{len(names)} updated={agent_updates} no_field={no_delete_field} errors={errors}")
+                    print(f"[agents] {i}/{len(names)} updated={updated['agent']} no_field={no_delete_field} errors={errors}")
 
         if not args.skip_submolts:
-            names = get_submolt_names(store, args.limit_submolts)
+            names, cursors["submolts"] = get_submolt_names(store, args.limit_submolts, _cursor(cursors, "submolts"))
             print(f"[submolts] checking {len(names)}")
-            for i, name in enumerate(names, 1):
+            subs = fan_out(client.get_submolt, lambda n: aclient.get_submolt(n), names)
+            for i, (name, sub) in enumerate(zip(names, subs), 1):
                 try:
                     try:
-                        sub = client.get_submolt(name) or {}
+                        if isinstance(sub, Exception):
+                            raise sub
+                        sub = sub or {}
                     except requests.exceptions.HTTPError as e:
                         code = getattr(getattr(e, "response", None), "status_code", None)
                         if code == 404:
-                            deleted_404 += mark_submolt_deleted_404(store, name, obs)
+                            deleted_404 += mark_submolt_deleted_404(session, name, obs)
                             continue
                         raise
                     if isinstance(sub, dict) and "is_deleted" in sub:
-                        submolt_updates += update_submolt(
-                            store,
-                            name,
-                            sub.get("is_deleted"),
-                            sub.get("updated_at") or sub.get("updatedAt"),
-                        )
+                        queue("submolt", [_deleted_row("name", name, sub)])
                     else:
                         no_delete_field += 1
                 except Exception as e:
@@ -329,32 +394,36 @@ def main() -> int:
                 if args.sleep_seconds > 0:
                     time.sleep(args.sleep_seconds)
                 if i % 100 == 0:
-                    print(f"[submolts] {i}/{len(names)} updated={submolt_updates} no_field={no_delete_field} errors={errors}")
+                    print(f"[submolts] {i}/{len(names)} updated={updated['submolt']} no_field={no_delete_field} errors={errors}")
 
         post_ids: List[str] = []
         if not args.skip_posts or not args.skip_comments:
-            post_ids = get_post_ids(store, args.limit_posts)
+            post_ids, cursors["posts"] = get_post_ids(store, args.limit_posts, _cursor(cursors, "posts"))
 
         if not args.skip_posts:
             print(f"[posts] checking {len(post_ids)}")
-            for i, post_id in enumerate(post_ids, 1):
+            if aclient is None:
+                # N posts per GET /posts?ids=... where supported (the client probes once and
+                # falls back to concurrent get_post); failed ids map to their exception
+                by_id = client.get_posts_batch(post_ids, return_exceptions=True)
+                posts = (by_id.get(pid) for pid in post_ids)
+            else:
+                posts = fan_out(client.get_post, lambda pid: aclient.get_post(pid), post_ids)
+            for i, (post_id, post) in enumerate(zip(post_ids, posts), 1):
                 try:
                     try:
-                        post = client.get_post(post_id) or {}
+                        if isinstance(post, Exception):
+                            raise post
+                        post = post or {}
                     except requests.exceptions.HTTPError as e:
                         code = getattr(getattr(e, "response", None), "status_code", None)
                         if code == 404:
-                            deleted_404 += mark_post_deleted_404(store, post_id, obs)
-                            comments_deleted_404 += mark_comments_deleted_by_post_404(store, post_id, obs)
+                            deleted_404 += mark_post_deleted_404(session, post_id, obs)
+                            comments_deleted_404 += mark_comments_deleted_by_post_404(session, post_id, obs)
                             continue
                         raise
                     if isinstance(post, dict) and "is_deleted" in post:
-                        post_updates += update_post(
-                            store,
-                            post_id,
-                            post.get("is_deleted"),
-                            post.get("updated_at") or post.get("updatedAt"),
-                        )
+                        queue("post", [_deleted_row("id", post_id, post)])
                     else:
                         no_delete_field += 1
                 except Exception as e:
@@ -364,29 +433,32 @@ def main() -> int:
                 if args.sleep_seconds > 0:
                     time.sleep(args.sleep_seconds)
                 if i % 100 == 0:
-                    print(f"[posts] {i}/{len(post_ids)} updated={post_updates} no_field={no_delete_field} errors={errors}")
+                    print(f"[posts] {i}/{len(post_ids)} updated={updated['post']} no_field={no_delete_field} errors={errors}")
 
         if not args.skip_comments:
             print(f"[comments] checking comments for {len(post_ids)} posts")
-            for i, post_id in enumerate(post_ids, 1):
+            trees = fan_out(
+                lambda pid: fetch_comments_public_then_auth(client, pid, sort=args.comments_sort, limit=args.max_comments),
+                lambda pid: fetch_comments_public_then_auth_async(aclient, pid, sort=args.comments_sort, limit=args.max_comments),
+                post_ids,
+            )
+            for i, (post_id, tree) in enumerate(zip(post_ids, trees), 1):
                 try:
                     try:
-                        tree = fetch_comments_public_then_auth(
-                            client,
-                            post_id,
-                            sort=args.comments_sort,
-                            limit=args.max_comments,
-                        )
+                        if isinstance(tree, Exception):
+                            raise tree
                     except requests.exceptions.HTTPError as e:
                         code = getattr(getattr(e, "response", None), "status_code", None)
                         if code == 404:
-                            deleted_404 += mark_post_deleted_404(store, post_id, obs)
-                            comments_deleted_404 += mark_comments_deleted_by_post_404(store, post_id, obs)
+                            deleted_404 += mark_post_deleted_404(session, post_id, obs)
+                            comments_deleted_404 += mark_comments_deleted_by_post_404(session, post_id, obs)
                             continue
                         raise
 
                     flat = flatten_comments(tree)
 
+                    # Paginated trees can repeat a comment (top level and as a reply); rows
+                    # without is_deleted are dropped first, then dedupe keeps one per id
                     rows = []
                     for c in flat:
                         cid = c.get("id")
@@ -394,15 +466,9 @@ def main() -> int:
                             continue
                         if "is_deleted" not in c:
                             continue
-                        rows.append(
-                            {
-                                "id": cid,
-                                "is_deleted": c.get("is_deleted"),
-                                "updated_at": c.get("updated_at") or c.get("updatedAt"),
-                            }
-                        )
-
-                    comment_updates += update_comments_batch(store, rows)
+                        rows.append(_deleted_row("id", cid, c))
+
+                    queue("comment", dedupe(rows, "id"))
                 except Exception as e:
                     errors += 1
                     print(f"[error][comments] post={post_id}: {e}")
@@ -410,17 +476,22 @@ def main() -> int:
                 if args.sleep_seconds > 0:
                     time.sleep(args.sleep_seconds)
                 if i % 100 == 0:
-                    print(f"[comments] {i}/{len(post_ids)} updated={comment_updates} errors={errors}")
+                    print(f"[comments] {i}/{len(post_ids)} updated={updated['comment']} errors={errors}")
+
+        flush()
 
+        # Only after a completed run, so a crash re-checks the same page next time
+        save_cursors(args.cursor_file, cursors)
     finally:
+        session.close()
         store.close()
 
     print(
         "[done] "
-        f"agents_updated={agent_updates} "
-        f"submolts_updated={submolt_updates} "
-        f"posts_updated={post_updates} "
-        f"comments_updated={comment_updates} "
+        f"agents_updated={updated['agent']} "
+        f"submolts_updated={updated['submolt']} "
+        f"posts_updated={updated['post']} "
+        f"comments_updated={updated['comment']} "
         f"deleted_404={deleted_404} "
         f"comments_deleted_404={comments_deleted_404} "
         f"no_delete_field={no_delete_field} "
@@ -13,14 +13,16 @@ and updates existing nodes only.
 """
 
 import os
+import json
 import time
 import argparse
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
+from neo4j import Session
 
-from neo4j_store import Neo4jStore
+from neo4j_store import Neo4jStore, dedupe
 from moltbook_client import MoltbookClient
 
 
@@ -29,51 +31,44 @@ def iso_now() -> str:
 
 
 def flatten_comments(tree: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Iterative pre-order walk (same order as the old recursion): deep reply chains
+    # can't hit the recursion limit, and there is no per-call closure
     flat: List[Dict[str, Any]] = []
-
-    def rec(node: Dict[str, Any]) -> None:
+    stack = list(reversed(tree or []))
+    while stack:
+        node = stack.pop()
         if not isinstance(node, dict):
-            return
+            continue
         flat.append(node)
-        replies = node.get("replies") or []
+        replies = node.get("replies")
         if isinstance(replies, list):
-            for r in replies:
-                rec(r)
-
-    for c in tree or []:
-        rec(c)
+            stack.extend(reversed(replies))
     return flat
 
 
-def get_post_ids(store: Neo4jStore, limit_posts: int, only_missing: bool) -> List[str]:
-    if only_missing:
-        q = """
-        MATCH (p:Post)
-        WHERE p.id IS NOT NULL
-          AND (
-                p.is_spam IS NULL OR
-                p.verification_status IS NULL
-              )
-        RETURN p.id AS id
-        ORDER BY coalesce(p.last_seen_at, p.created_at) DESC
-        LIMIT $limit
-        """
-    else:
-        q = """
-        MATCH (p:Post)
-        WHERE p.id IS NOT NULL
-        RETURN p.id AS id
-        ORDER BY coalesce(p.last_seen_at, p.created_at) DESC
-        LIMIT $limit
-        """
+Cursor = Optional[Tuple[Optional[str], str]]  # (last_seen_at ISO or None, key)
+
 
-    with store.driver.session() as s:
-        return [r["id"] for r in s.run(q, limit=int(limit_posts)) if r and r.get("id")]
+def load_cursor(path: Optional[str]) -> Cursor:
+    """--cursor-file state: [last_seen_at ISO, post id] of the last post the previous run reached."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        c = json.load(f)
+    return (c[0], c[1]) if c else None
 
 
-def fetch_post(client: MoltbookClient, post_id: str) -> Dict[str, Any]:
-    # get_post() is already public in your client
-    return client.get_post(post_id) or {}
+def save_cursor(path: Optional[str], cursor: Cursor) -> None:
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cursor, f)
+
+
+def get_post_ids(store: Neo4jStore, limit_posts: int, only_missing: bool, cursor: Cursor = None) -> Tuple[List[str], Cursor]:
+    # Keyset page over post_last_seen (most recently seen first) instead of sorting every
+    # Post. Posts without last_seen_at come after all the others, in id order.
+    where = "n.is_spam IS NULL OR n.verification_status IS NULL" if only_missing else ""
+    return store.get_recently_seen_keys("Post", limit_posts, cursor=cursor, where=where)
 
 
 def fetch_comments(client: MoltbookClient, post_id: str, sort: str, limit: int) -> List[Dict[str, Any]]:
@@ -87,32 +82,59 @@ def fetch_comments(client: MoltbookClient, post_id: str, sort: str, limit: int)
         raise
 
 
+async def fetch_comments_async(aclient: Any, post_id: str, sort: str, limit: int) -> List[Dict[str, Any]]:
+    """fetch_comments on AsyncMoltbookClient (--async-http)."""
+    try:
+        return await aclient.get_comments(post_id, sort=sort, limit=limit, no_auth=True) or []
+    except requests.exceptions.HTTPError as e:
+        code = getattr(e.response, "status_code", None)
+        if code in (401, 403):
+            return await aclient.get_comments(post_id, sort=sort, limit=limit, no_auth=False) or []
+        raise
+
+
 def update_post_moderation(
-    store: Neo4jStore,
+    session: Session,
     post_id: str,
     is_spam: Any,
     verification_status: Any,
     observed_at: str,
+    *,
+    status: Optional[str] = None,
+    comments_seen: int = 0,
+    comments_updated: int = 0,
 ) -> None:
+    """
+    With `status` (--mark), also writes what mark_post_status would: the Post is matched
+    and updated once instead of in two round-trips.
+    """
     q = """
     MATCH (p:Post {id: $id})
     SET p.is_spam = $is_spam,
         p.verification_status = $verification_status,
         p.moderation_backfilled_at = datetime($obs)
     """
-    with store.driver.session() as s:
-        s.run(
-            q,
-            id=post_id,
-            is_spam=is_spam,
-            verification_status=verification_status,
-            obs=observed_at,
-        )
+    if status is not None:
+        q += """,
+        p.moderation_backfill_status = $status,
+        p.moderation_comments_seen = $comments_seen,
+        p.moderation_comments_updated = $comments_updated
+    """
+    session.run(
+        q,
+        id=post_id,
+        is_spam=is_spam,
+        verification_status=verification_status,
+        obs=observed_at,
+        status=status,
+        comments_seen=int(comments_seen),
+        comments_updated=int(comments_updated),
+    ).consume()
 
 
 
 def mark_post_deleted_404(
-    store: Neo4jStore,
+    session: Session,
     post_id: str,
     observed_at: str,
     *,
@@ -130,11 +152,10 @@ def mark_post_deleted_404(
         p.deleted_at = datetime($obs),
         p.deletion_reason = $reason
     """
-    with store.driver.session() as s:
-        s.run(q, id=post_id, obs=observed_at, reason=reason)
+    session.run(q, id=post_id, obs=observed_at, reason=reason).consume()
 
 def mark_comments_deleted_by_post_404(
-    store: Neo4jStore,
+    session: Session,
     post_id: str,
     observed_at: str,
     *,
@@ -153,14 +174,13 @@ def mark_comments_deleted_by_post_404(
         c.deletion_reason = $reason
     RETURN count(c) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, id=post_id, obs=observed_at, reason=reason).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    rec = session.run(q, id=post_id, obs=observed_at, reason=reason).single()
+    return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
 
 
 
 def update_comment_moderation_batch(
-    store: Neo4jStore,
+    session: Session,
     rows: List[Dict[str, Any]],
     observed_at: str,
 ) -> int:
@@ -175,13 +195,12 @@ def update_comment_moderation_batch(
         c.moderation_backfilled_at = datetime($obs)
     RETURN count(c) AS updated
     """
-    with store.driver.session() as s:
-        rec = s.run(q, rows=rows, obs=observed_at).single()
-        return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
+    rec = session.run(q, rows=rows, obs=observed_at).single()
+    return int(rec["updated"]) if rec and rec.get("updated") is not None else 0
 
 
 def mark_post_status(
-    store: Neo4jStore,
+    session: Session,
     post_id: str,
     status: str,
     comments_seen: int,
@@ -195,15 +214,14 @@ def mark_post_status(
         p.moderation_comments_seen = $comments_seen,
         p.moderation_comments_updated = $comments_updated
     """
-    with store.driver.session() as s:
-        s.run(
-            q,
-            id=post_id,
-            obs=observed_at,
-            status=status,
-            comments_seen=int(comments_seen),
-            comments_updated=int(comments_updated),
-        )
+    session.run(
+        q,
+        id=post_id,
+        obs=observed_at,
+        status=status,
+        comments_seen=int(comments_seen),
+        comments_updated=int(comments_updated),
+    ).consume()
 
 
 def main() -> int:
@@ -213,7 +231,15 @@ def main() -> int:
     ap.add_argument("--max-comments", type=int, default=500)
     ap.add_argument("--only-missing", action="store_true")
     ap.add_argument("--mark", action="store_true")
+    ap.add_argument("--cursor-file", type=str, default=None,
+                    help="JSON file holding where the previous run stopped; each run resumes with the next "
+                         "--limit-posts posts by last_seen_at and starts over once all are covered")
     ap.add_argument("--sleep-seconds", type=float, default=0.0)
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Concurrent API fetches (default: min(POOL_MAXSIZE, REQUESTS_PER_MINUTE), "
+                         "or MAX_CONCURRENCY with --async-http); rpm still applies")
+    ap.add_argument("--async-http", action="store_true",
+                    help="Fetch with AsyncMoltbookClient (aiohttp, one event loop) instead of worker threads")
     args = ap.parse_args()
 
     for k in ("NEO4J_URI", "NEO4J_USER", "NEO4J_PASSWORD"):
@@ -221,69 +247,112 @@ def main() -> int:
             raise SystemExit(f"Missing env var: {k}")
 
     client = MoltbookClient()
+    aclient: Any = None
+    if args.async_http:
+        from moltbook_client_async import AsyncMoltbookClient
+
+        aclient = AsyncMoltbookClient()
     store = Neo4jStore(
         os.environ["NEO4J_URI"],
         os.environ["NEO4J_USER"],
         os.environ["NEO4J_PASSWORD"],
     )
 
+    # One session for the whole run, shared by every write helper (main thread only)
+    session = store.driver.session()
+
     obs = iso_now()
-    post_ids = get_post_ids(store, args.limit_posts, args.only_missing)
+    post_ids, next_cursor = get_post_ids(store, args.limit_posts, args.only_missing, load_cursor(args.cursor_file))
     print(f"[moderation-backfill] posts={len(post_ids)} only_missing={args.only_missing}")
 
+    # Post details up front, N per GET /posts?ids=... where supported (the client probes
+    # once and falls back to concurrent get_post); comments stay per post in fetch_one
+    posts_by_id: Dict[str, Any] = {}
+    if aclient is None:
+        posts_by_id = client.get_posts_batch(post_ids, return_exceptions=True)
+
+    def fetch_one(post_id: str) -> Tuple[Dict[str, Any], Any]:
+        """
+        API work for one post (runs on client.imap worker threads): (post, comments).
+        A post error propagates; a comments error is returned in place of the tree so the
+        post's own update still happens first, as in the serial flow.
+        """
+        post_obj = posts_by_id.get(post_id)
+        if isinstance(post_obj, Exception):
+            raise post_obj
+        post_obj = post_obj or {}
+        if not post_obj:
+            return post_obj, []
+        try:
+            return post_obj, fetch_comments(client, post_id=post_id, sort=args.sort, limit=args.max_comments)
+        except Exception as e:
+            return post_obj, e
+
+    async def fetch_one_async(post_id: str) -> Tuple[Dict[str, Any], Any]:
+        # fetch_one on the event loop (--async-http)
+        post_obj = await aclient.get_post(post_id) or {}
+        if not post_obj:
+            return post_obj, []
+        try:
+            return post_obj, await fetch_comments_async(aclient, post_id, sort=args.sort, limit=args.max_comments)
+        except Exception as e:
+            return post_obj, e
+
     ok = 0
     errors = 0
     total_comments_seen = 0
     total_comments_updated = 0
 
     try:
-        for i, post_id in enumerate(post_ids, 1):
+        if aclient is not None:
+            fetched = aclient.imap(fetch_one_async, post_ids, workers=args.workers, return_exceptions=True)
+        else:
+            fetched = client.imap(fetch_one, post_ids, workers=args.workers, return_exceptions=True)
+        for i, (post_id, res) in enumerate(zip(post_ids, fetched), 1):
+            # Post moderation fields, written after the comments together with the status
+            post_mod: Optional[Dict[str, Any]] = None
             try:
                 try:
-                    post_obj = fetch_post(client, post_id)
+                    if isinstance(res, Exception):
+                        raise res
+                    post_obj, comments_tree = res
                 except requests.exceptions.HTTPError as e:
                     code = getattr(getattr(e, "response", None), "status_code", None)
                     if code == 404:
-                        mark_post_deleted_404(store, post_id, obs)
-                        mark_comments_deleted_by_post_404(store, post_id, obs)
+                        mark_post_deleted_404(session, post_id, obs)
+                        mark_comments_deleted_by_post_404(session, post_id, obs)
                         if args.mark:
-                            mark_post_status(store, post_id, "post_deleted_404", 0, 0, obs)
+                            mark_post_status(session, post_id, "post_deleted_404", 0, 0, obs)
                         continue
                     raise
 
                 if not post_obj:
                     if args.mark:
-                        mark_post_status(store, post_id, "post_empty", 0, 0, obs)
+                        mark_post_status(session, post_id, "post_empty", 0, 0, obs)
                     continue
 
-                update_post_moderation(
-                    store,
-                    post_id=post_id,
-                    is_spam=post_obj.get("is_spam"),
-                    verification_status=post_obj.get("verification_status"),
-                    observed_at=obs,
-                )
-
+                post_mod = {
+                    "post_id": post_id,
+                    "is_spam": post_obj.get("is_spam"),
+                    "verification_status": post_obj.get("verification_status"),
+                    "observed_at": obs,
+                }
 
                 try:
-                    comments_tree = fetch_comments(
-                        client,
-                        post_id=post_id,
-                        sort=args.sort,
-                        limit=args.max_comments,
-                    )
+                    if isinstance(comments_tree, Exception):
+                        raise comments_tree
                 except requests.exceptions.HTTPError as e:
                     code = getattr(getattr(e, "response", None), "status_code", None)
                     if code == 404:
-                        mark_post_deleted_404(store, post_id, obs)
-                        mark_comments_deleted_by_post_404(store, post_id, obs)
-                        if args.mark:
-                            mark_post_status(store, post_id, "comments_deleted_404", 0, 0, obs)
+                        mark_post_deleted_404(session, post_id, obs)
+                        mark_comments_deleted_by_post_404(session, post_id, obs)
+                        update_post_moderation(session, **post_mod, status="comments_deleted_404" if args.mark else None)
                         continue
                     raise
 
                 comments_flat = flatten_comments(comments_tree)
 
+                # Paginated trees can repeat a comment (top level and as a reply): one row per id
                 rows = []
                 for c in comments_flat:
                     cid = c.get("id")
@@ -298,20 +367,25 @@ def main() -> int:
                     )
 
                 comments_seen = len(comments_flat)
-                comments_updated = update_comment_moderation_batch(store, rows, obs)
+                comments_updated = update_comment_moderation_batch(session, dedupe(rows, "id"), obs)
+
+                if args.mark:
+                    update_post_moderation(session, **post_mod, status="ok", comments_seen=comments_seen, comments_updated=comments_updated)
+                else:
+                    update_post_moderation(session, **post_mod)
 
                 total_comments_seen += comments_seen
                 total_comments_updated += comments_updated
                 ok += 1
 
-                if args.mark:
-                    mark_post_status(store, post_id, "ok", comments_seen, comments_updated, obs)
-
             except Exception as e:
                 errors += 1
                 print(f"[error] post={post_id}: {e}")
-                if args.mark:
-                    mark_post_status(store, post_id, "error", 0, 0, obs)
+                if post_mod is not None:
+                    # the comments step failed: still record the post's own moderation
+                    update_post_moderation(session, **post_mod, status="error" if args.mark else None)
+                elif args.mark:
+                    mark_post_status(session, post_id, "error", 0, 0, obs)
 
             if args.sleep_seconds > 0:
                 time.sleep(args.sleep_seconds)
@@ -323,7 +397,10 @@ def main() -> int:
                     f"comments_seen={total_comments_seen} comments_updated={total_comments_updated}"
                 )
 
+        # Only after a completed run, so a crash re-checks the same page next time
+        save_cursor(args.cursor_file, next_cursor)
     finally:
+        session.close()
         store.close()
 
     print(
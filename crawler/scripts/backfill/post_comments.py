@@ -3,7 +3,7 @@ import os
 import argparse
 import requests
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from moltbook_client import MoltbookClient
 from neo4j_store import Neo4jStore
@@ -58,66 +58,109 @@ def fetch_comments_fallback(client: MoltbookClient, post_id: str, sort: str, lim
     # auth attempt (works only if MOLTBOOK_API_KEY is set)
     return client.get_comments(post_id, sort=sort, limit=limit, shuffle=False, no_auth=False)
 
-def main():
+def _is_404(e: BaseException) -> bool:
+    return isinstance(e, requests.exceptions.HTTPError) and getattr(getattr(e, "response", None), "status_code", None) == 404
+
+
+def read_post_ids(path: str) -> List[str]:
+    """One post id per line; blank lines and #-comments are skipped, repeats dropped."""
+    with open(path, "r", encoding="utf-8") as f:
+        ids = (line.split("#", 1)[0].strip() for line in f)
+        return list(dict.fromkeys(i for i in ids if i))
+
+
+def main() -> int:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--post-id", required=True)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--post-id")
+    src.add_argument("--post-ids-file", help="File with one post id per line (one process for many posts)")
     ap.add_argument("--sort", default="new")
     ap.add_argument("--limit", type=int, default=int(os.getenv("COMMENTS_LIMIT_PER_POST", "200")))
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Posts fetched concurrently (default: min(POOL_MAXSIZE, REQUESTS_PER_MINUTE)); rpm still applies")
+    ap.add_argument("--write-batch", type=int, default=100, help="Posts buffered per post + comment write transaction")
     args = ap.parse_args()
 
+    post_ids = [args.post_id] if args.post_id else read_post_ids(args.post_ids_file)
+
     client = MoltbookClient()
     store = Neo4jStore(os.environ["NEO4J_URI"], os.environ["NEO4J_USER"], os.environ["NEO4J_PASSWORD"])
     obs = iso_now()
 
-    # 1) Fetch post details and upsert the post (so the Comment->Post rel can be created)
-    post_obj: Dict[str, Any] = {}
-    try:
-        post_obj = client.get_post(args.post_id) or {}
-    except requests.exceptions.HTTPError as e:
-        code = getattr(getattr(e, "response", None), "status_code", None)
-        if code == 404:
-            mark_post_deleted_404(store, args.post_id, obs)
-            mark_comments_deleted_for_post(store, args.post_id, obs)
-            print(f"[deleted][post] {args.post_id}: inferred via 404")
-            store.close()
-            return
-        print(f"[backfill][WARN] get_post failed for {args.post_id}: {e}")
-    except Exception as e:
-        print(f"[backfill][WARN] get_post failed for {args.post_id}: {e}")
-
-    if post_obj and isinstance(post_obj, dict):
+    def fetch_one(post_id: str) -> Tuple[Any, Any]:
+        """
+        API work for one post (client.imap worker threads): (post or error, comments or error).
+        The post is fetched first so the Comment->Post rel can be created; a post 404 skips
+        the comments fetch.
+        """
+        try:
+            post_obj: Any = client.get_post(post_id) or {}
+        except Exception as e:
+            post_obj = e
+            if _is_404(e):
+                return post_obj, None
         try:
-            store.upsert_posts([post_obj], obs)
-            print(f"[backfill] upserted Post {args.post_id}")
+            return post_obj, fetch_comments_fallback(client, post_id, sort=args.sort, limit=args.limit)
         except Exception as e:
-            print(f"[backfill][WARN] upsert_posts failed for {args.post_id}: {e}")
+            return post_obj, e
+
+    errors = 0
+    # posts and (post_id, comments) waiting for the next write; posts go first
+    pending_posts: List[Dict[str, Any]] = []
+    pending_trees: List[Tuple[str, List[Dict[str, Any]]]] = []
+
+    def flush() -> None:
+        nonlocal errors
+        if pending_posts or pending_trees:
+            n = sum(len(c) for _, c in pending_trees)
+            try:
+                # posts + comments in one transaction (one commit per flush)
+                store.upsert_posts_with_comments(pending_posts, pending_trees, obs)
+                print(f"[backfill] upserted posts={len(pending_posts)} comments={n} for posts={len(pending_trees)}")
+            except Exception as e:
+                errors += len(pending_trees)
+                print(f"[backfill][ERROR] upsert failed for {len(pending_posts)} posts / {len(pending_trees)} comment trees: {e}")
+        pending_posts.clear()
+        pending_trees.clear()
 
-    # 2) Fetch comments and upsert
-    comments: List[Dict[str, Any]] = []
     try:
-        comments = fetch_comments_fallback(client, args.post_id, sort=args.sort, limit=args.limit)
-    except requests.exceptions.HTTPError as e:
-        code = getattr(getattr(e, "response", None), "status_code", None)
-        if code == 404:
-            mark_post_deleted_404(store, args.post_id, obs)
-            mark_comments_deleted_for_post(store, args.post_id, obs)
-            print(f"[deleted][post] {args.post_id}: inferred via 404 (comments endpoint)")
-            store.close()
-            return
-        print(f"[backfill][ERROR] fetching comments failed for {args.post_id}: {e}")
-        store.close()
-        raise
-    except Exception as e:
-        print(f"[backfill][ERROR] fetching comments failed for {args.post_id}: {e}")
-        store.close()
-        raise
+        for post_id, (post_obj, comments) in zip(post_ids, client.imap(fetch_one, post_ids, workers=args.workers)):
+            # 1) post details (queued below, unless the comments 404 marks it deleted)
+            post_row = None
+            if isinstance(post_obj, Exception):
+                if _is_404(post_obj):
+                    mark_post_deleted_404(store, post_id, obs)
+                    mark_comments_deleted_for_post(store, post_id, obs)
+                    print(f"[deleted][post] {post_id}: inferred via 404")
+                    continue
+                print(f"[backfill][WARN] get_post failed for {post_id}: {post_obj}")
+            elif post_obj and isinstance(post_obj, dict):
+                post_row = post_obj
+
+            # 2) comments
+            if isinstance(comments, Exception):
+                if _is_404(comments):
+                    mark_post_deleted_404(store, post_id, obs)
+                    mark_comments_deleted_for_post(store, post_id, obs)
+                    print(f"[deleted][post] {post_id}: inferred via 404 (comments endpoint)")
+                    continue
+            if post_row is not None:
+                pending_posts.append(post_row)
+            if isinstance(comments, Exception):
+                errors += 1
+                print(f"[backfill][ERROR] fetching comments failed for {post_id}: {comments}")
+                continue
 
-    print(f"[backfill] fetched comments={len(comments)} for post={args.post_id}")
-    if comments:
-        store.upsert_comments(args.post_id, comments, obs)
-        print(f"[backfill] upserted comments={len(comments)} for post={args.post_id}")
+            print(f"[backfill] fetched comments={len(comments)} for post={post_id}")
+            if comments:
+                pending_trees.append((post_id, comments))
+            if len(pending_posts) >= args.write_batch or len(pending_trees) >= args.write_batch:
+                flush()
+        flush()
+    finally:
+        store.close()
 
-    store.close()
+    return 1 if errors else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
@@ -10,16 +10,91 @@ Backfill XAccount ownership links by:
 import os
 import sys
 import argparse
+import itertools
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional
+
+from neo4j import Session
 
 from neo4j_store import Neo4jStore
 from moltbook_client import MoltbookClient
 
+import random
 import time
 import requests
 
+# ---- Cypher ----
+# Module-level constants: built once at import, and the same text on every call (the
+# server's plan cache always hits).
+
+_Q_MARK_PROFILE_FETCHED = """
+MERGE (a:Agent {name:$name})
+ON CREATE SET a.first_seen_at = $obs,
+              a.created_at = $obs
+SET a.last_seen_at = $obs,
+    a.profile_last_fetched_at = $obs,
+    a.profile_last_fetch_status = $status,
+    a.profile_last_fetch_error_code = $error_code
+"""
+_Q_MARK_DELETED_404 = """
+MERGE (a:Agent {name:$name})
+ON CREATE SET a.first_seen_at = $obs,
+              a.created_at = $obs
+SET a.last_seen_at = $obs,
+    a.profile_last_fetched_at = $obs,
+    a.is_deleted = true,
+    a.updated_at = $obs,
+    a.deleted_at = $obs,
+    a.deletion_reason = $reason,
+    a.profile_last_fetch_status = "deleted_404",
+    a.profile_last_fetch_error_code = 404
+"""
+_Q_CANDIDATES_ONLY_MISSING = """
+MATCH (a:Agent)
+WHERE a.name IS NOT NULL
+  AND coalesce(a.is_claimed,false) = true
+  AND NOT (a)-[:HAS_OWNER_X]->(:XAccount)
+RETURN a.name AS name
+ORDER BY coalesce(a.profile_last_fetched_at, datetime("1970-01-01T00:00:00Z")) ASC
+LIMIT $limit
+"""
+_Q_CANDIDATES_ALL = """
+MATCH (a:Agent)
+WHERE a.name IS NOT NULL
+  AND ($claimed_only = false OR coalesce(a.is_claimed,false) = true)
+RETURN a.name AS name
+ORDER BY coalesce(a.profile_last_fetched_at, datetime("1970-01-01T00:00:00Z")) ASC
+LIMIT $limit
+"""
+_Q_UPSERT_OWNER = """
+UNWIND $rows AS row
+MATCH (a:Agent {name:row.agent})
+MERGE (x:XAccount {handle:row.handle})
+  ON CREATE SET x.first_seen_at = $obs
+SET x += row.props,
+    x.last_seen_at = $obs
+
+MERGE (a)-[r:HAS_OWNER_X]->(x)
+  ON CREATE SET r.first_seen_at = $obs
+SET r.last_seen_at = $obs,
+
+    // Helpful: also stamp agent fields if empty
+    a.owner_twitter_handle = coalesce(a.owner_twitter_handle, row.handle)
+"""
+
+
+# Worth another try at this level (on top of the client's own retries); any other HTTP
+# error (400, 404, ...) is permanent and raised at once
+_RETRYABLE = (429, 502, 503, 504)
+
+
 def get_profile_resilient(client, name: str, attempts: int = 6) -> dict:
+    """
+    get_agent_profile with an outer retry on 429/502/503/504 and transport errors.
+    A Retry-After (seconds or HTTP-date) is honored as a floor plus up to 25% jitter;
+    otherwise the doubling backoff gets full jitter (0.5x-1.5x), so concurrent workers
+    don't all wake at once and hit the API together.
+    """
     backoff = 5.0
     for k in range(1, attempts + 1):
         try:
@@ -27,34 +102,27 @@ def get_profile_resilient(client, name: str, attempts: int = 6) -> dict:
         except requests.exceptions.HTTPError as e:
             resp = getattr(e, "response", None)
             code = resp.status_code if resp is not None else None
-            if code == 429 and k < attempts:
-                ra = resp.headers.get("Retry-After") if resp is not None else None
-                if ra:
-                    try:
-                        time.sleep(max(float(ra), 1.0))
-                        continue
-                    except Exception:
-                        pass
-                time.sleep(min(backoff, 60.0))
-                backoff = min(backoff * 2, 60.0)
-                continue
-            raise
+            if code not in _RETRYABLE or k >= attempts:
+                raise
+            ra = resp.headers.get("Retry-After")
+            wait = MoltbookClient._retry_after_seconds(ra) if ra else None
+            if wait is not None:
+                delay = wait * (1.0 + 0.25 * random.random())
+            else:
+                delay = min(backoff, 60.0) * (0.5 + random.random())
         except requests.exceptions.RequestException:
-            if k < attempts:
-                time.sleep(min(backoff, 60.0))
-                backoff = min(backoff * 2, 60.0)
-                continue
-            raise
-
-def iso_now() -> str:
-    # Neo4j datetime() is happiest with a 'Z' suffix
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            if k >= attempts:
+                raise
+            delay = min(backoff, 60.0) * (0.5 + random.random())
+        time.sleep(delay)
+        backoff = min(backoff * 2, 60.0)
+    return {}
 
 def mark_agent_profile_fetched(
-    store: Neo4jStore,
+    session: Session,
     *,
     agent_name: str,
-    observed_at: str,
+    observed_at: datetime,
     status: str,
     error_code: Optional[int] = None,
     dry_run: bool = False,
@@ -62,24 +130,14 @@ def mark_agent_profile_fetched(
     """Stamp that we attempted to fetch an agent profile (even if we didn't find owner/x handle)."""
     if dry_run:
         return
-    q = """
-    MERGE (a:Agent {name:$name})
-    ON CREATE SET a.first_seen_at = datetime($obs),
-                  a.created_at = datetime($obs)
-    SET a.last_seen_at = datetime($obs),
-        a.profile_last_fetched_at = datetime($obs),
-        a.profile_last_fetch_status = $status,
-        a.profile_last_fetch_error_code = $error_code
-    """
-    with store.driver.session() as s:
-        s.run(q, name=agent_name, obs=observed_at, status=status, error_code=error_code)
+    session.execute_write(lambda tx: tx.run(_Q_MARK_PROFILE_FETCHED, name=agent_name, obs=observed_at, status=status, error_code=error_code).consume())
 
 
 def mark_agent_deleted_404(
-    store: Neo4jStore,
+    session: Session,
     *,
     agent_name: str,
-    observed_at: str,
+    observed_at: datetime,
     reason: str = "api_404",
     dry_run: bool = False,
 ) -> None:
@@ -87,21 +145,7 @@ def mark_agent_deleted_404(
     if dry_run:
         print(f"[DRY] mark Agent({agent_name}) deleted via 404")
         return
-    q = """
-    MERGE (a:Agent {name:$name})
-    ON CREATE SET a.first_seen_at = datetime($obs),
-                  a.created_at = datetime($obs)
-    SET a.last_seen_at = datetime($obs),
-        a.profile_last_fetched_at = datetime($obs),
-        a.is_deleted = true,
-        a.updated_at = datetime($obs),
-        a.deleted_at = datetime($obs),
-        a.deletion_reason = $reason,
-        a.profile_last_fetch_status = "deleted_404",
-        a.profile_last_fetch_error_code = 404
-    """
-    with store.driver.session() as s:
-        s.run(q, name=agent_name, obs=observed_at, reason=reason)
+    session.execute_write(lambda tx: tx.run(_Q_MARK_DELETED_404, name=agent_name, obs=observed_at, reason=reason).consume())
 
 
 def clean_handle(h: Any) -> Optional[str]:
@@ -126,94 +170,84 @@ def fetch_candidates(
     claimed_only: bool,
     limit: int,
     agent: Optional[str],
-) -> List[str]:
+) -> Iterator[str]:
+    """
+    Streams candidate names from the cursor, on its own session held open until the
+    generator is exhausted or closed (the run's write session would otherwise buffer the
+    whole open result on its next write).
+    """
     if agent:
-        return [agent]
+        yield agent
+        return
 
     if only_missing:
-        q = """
-        MATCH (a:Agent)
-        WHERE a.name IS NOT NULL
-          AND coalesce(a.is_claimed,false) = true
-          AND NOT (a)-[:HAS_OWNER_X]->(:XAccount)
-        RETURN a.name AS name
-        ORDER BY coalesce(a.profile_last_fetched_at, datetime("1970-01-01T00:00:00Z")) ASC
-        LIMIT $limit
-        """
-        params = {"limit": int(limit)}
+        q, params = _Q_CANDIDATES_ONLY_MISSING, {"limit": int(limit)}
     else:
-        q = """
-        MATCH (a:Agent)
-        WHERE a.name IS NOT NULL
-          AND ($claimed_only = false OR coalesce(a.is_claimed,false) = true)
-        RETURN a.name AS name
-        ORDER BY coalesce(a.profile_last_fetched_at, datetime("1970-01-01T00:00:00Z")) ASC
-        LIMIT $limit
-        """
-        params = {"limit": int(limit), "claimed_only": bool(claimed_only)}
+        q, params = _Q_CANDIDATES_ALL, {"limit": int(limit), "claimed_only": bool(claimed_only)}
 
     with store.driver.session() as s:
-        rows = s.run(q, **params)
-        return [r["name"] for r in rows if r and r.get("name")]
+        for r in s.run(q, **params):
+            if r and r.get("name"):
+                yield r["name"]
 
 
-def upsert_owner_link(
-    store: Neo4jStore,
-    *,
-    agent_name: str,
-    handle: str,
-    observed_at: str,
-    owner: Dict[str, Any],
-    dry_run: bool,
-) -> None:
-    url = owner.get("x_url") or owner.get("xUrl") or f"https://x.com/{handle}"
+def _unique(names: Iterator[str]) -> Iterator[str]:
+    # streaming dict.fromkeys: duplicate Agent rows would cost a profile GET + write each
+    seen = set()
+    for n in names:
+        if n not in seen:
+            seen.add(n)
+            yield n
+
 
-    # Metadata (safe even if missing)
-    x_name = owner.get("x_name") or owner.get("xName")
-    x_avatar = owner.get("x_avatar") or owner.get("xAvatar")
-    x_bio = owner.get("x_bio") or owner.get("xBio")
-    x_follower_count = owner.get("x_follower_count") if "x_follower_count" in owner else owner.get("xFollowerCount")
-    x_following_count = owner.get("x_following_count") if "x_following_count" in owner else owner.get("xFollowingCount")
-    x_verified = owner.get("x_verified") if "x_verified" in owner else owner.get("xVerified")
+# (snake_case key, camelCase key, XAccount prop) for the owner metadata
+_OWNER_FIELDS = (
+    ("x_name", "xName", "name"),
+    ("x_avatar", "xAvatar", "avatar_url"),
+    ("x_bio", "xBio", "bio"),
+    ("x_follower_count", "xFollowerCount", "follower_count"),
+    ("x_following_count", "xFollowingCount", "following_count"),
+    ("x_verified", "xVerified", "is_verified"),
+)
 
+
+def _normalize_owner(owner: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Owner metadata as XAccount props in one pass. snake_case wins over camelCase, and
+    missing / null / "" values are left out, so 0 and False are kept.
+    """
+    g = owner.get
+    props: Dict[str, Any] = {}
+    for snake, camel, out in _OWNER_FIELDS:
+        v = g(snake)
+        if v is None or v == "":
+            v = g(camel)
+        if v is not None and v != "":
+            props[out] = v
+    return props
+
+
+def owner_link_row(*, agent_name: str, handle: str, owner: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One row of flush_owner_links' UNWIND: the agent, its X handle and the owner metadata as
+    XAccount props. Missing fields are left out of `props` (not sent as null), so
+    `SET x += row.props` keeps the stored value, as coalesce() per field used to.
+    """
+    props = _normalize_owner(owner)
+    props["url"] = owner.get("x_url") or owner.get("xUrl") or f"https://x.com/{handle}"
+    return {"agent": agent_name, "handle": handle, "props": props}
+
+
+def flush_owner_links(session: Session, rows: List[Dict[str, Any]], *, observed_at: datetime, dry_run: bool) -> None:
+    """Upsert a batch of owner_link_row()s with one UNWIND in one write transaction."""
+    if not rows:
+        return
     if dry_run:
-        print(f"[DRY] link Agent({agent_name}) -> XAccount({handle}) url={url}")
+        for row in rows:
+            print(f"[DRY] link Agent({row['agent']}) -> XAccount({row['handle']}) url={row['props']['url']}")
         return
 
-    q = """
-    MATCH (a:Agent {name:$agent})
-    MERGE (x:XAccount {handle:$handle})
-      ON CREATE SET x.first_seen_at = datetime($obs)
-    SET x.last_seen_at = datetime($obs),
-        x.url = coalesce($url, x.url),
-        x.name = coalesce($x_name, x.name),
-        x.avatar_url = coalesce($x_avatar, x.avatar_url),
-        x.bio = coalesce($x_bio, x.bio),
-        x.follower_count = coalesce($x_follower_count, x.follower_count),
-        x.following_count = coalesce($x_following_count, x.following_count),
-        x.is_verified = coalesce($x_verified, x.is_verified)
-
-    MERGE (a)-[r:HAS_OWNER_X]->(x)
-      ON CREATE SET r.first_seen_at = datetime($obs)
-    SET r.last_seen_at = datetime($obs),
-
-        // Helpful: also stamp agent fields if empty
-        a.owner_twitter_handle = coalesce(a.owner_twitter_handle, $handle)
-    """
-    with store.driver.session() as s:
-        s.run(
-            q,
-            agent=agent_name,
-            handle=handle,
-            url=url,
-            obs=observed_at,
-            x_name=x_name,
-            x_avatar=x_avatar,
-            x_bio=x_bio,
-            x_follower_count=x_follower_count,
-            x_following_count=x_following_count,
-            x_verified=x_verified,
-        )
+    session.execute_write(lambda tx: tx.run(_Q_UPSERT_OWNER, rows=rows, obs=observed_at).consume())
 
 
 def main() -> int:
@@ -230,6 +264,10 @@ def main() -> int:
     ap.add_argument("--agent", type=str, default=None, help="Process a single agent by name")
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument("--print-every", type=int, default=100)
+    ap.add_argument("--write-batch", type=int, default=500, help="Owner links per UNWIND write")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Concurrent profile fetches (default: min(POOL_MAXSIZE, REQUESTS_PER_MINUTE)); "
+                         "rpm still applies, and each worker keeps its own 429 backoff")
 
     args = ap.parse_args()
 
@@ -252,9 +290,15 @@ def main() -> int:
     store = Neo4jStore(args.neo4j_uri, args.neo4j_user, args.neo4j_password)
     client = MoltbookClient()
 
-    observed_at = iso_now()
+    # One session for the whole run: marks and link batches reuse it (each write is its
+    # own execute_write, retried on transient errors)
+    session = store.driver.session()
 
-    names = fetch_candidates(
+    # Native tz-aware datetime, taken once: the driver sends it as a temporal, so the
+    # queries use $obs directly instead of parsing a string with datetime($obs) per SET
+    observed_at = datetime.now(timezone.utc)
+
+    cands = fetch_candidates(
         store,
         only_missing=only_missing,
         claimed_only=claimed_only,
@@ -262,58 +306,72 @@ def main() -> int:
         agent=args.agent,
     )
 
-    print(f"[backfill] candidates={len(names)} only_missing={only_missing} claimed_only={claimed_only} dry_run={args.dry_run}")
+    print(f"[backfill] streaming candidates limit={args.limit} only_missing={only_missing} claimed_only={claimed_only} dry_run={args.dry_run}")
 
     linked = 0
     skipped_no_owner = 0
     skipped_no_handle = 0
     errors = 0
+    i = 0
+    # owner_link_row()s waiting for the next flush_owner_links
+    pending: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        nonlocal linked, errors
+        batch = pending[:]
+        pending.clear()
+        try:
+            flush_owner_links(session, batch, observed_at=observed_at, dry_run=args.dry_run)
+        except Exception as e:
+            errors += len(batch)
+            print(f"[error] owner-link batch of {len(batch)}: {e}", file=sys.stderr)
+        else:
+            linked += len(batch)
 
     try:
-        for i, name in enumerate(names, 1):
+        # Profiles are fetched on client.imap worker threads (in input order); marks and
+        # link batches stay on this thread; tee: imap reads ahead by at most its window
+        to_fetch, ordered = itertools.tee(_unique(cands))
+        profiles = client.imap(lambda n: get_profile_resilient(client, n), to_fetch, workers=args.workers, return_exceptions=True)
+        for i, (name, prof) in enumerate(zip(ordered, profiles), 1):
             try:
                 try:
-                    prof = get_profile_resilient(client, name)
+                    if isinstance(prof, Exception):
+                        raise prof
                 except requests.exceptions.HTTPError as e:
                     resp = getattr(e, "response", None)
                     code = resp.status_code if resp is not None else None
                     if code == 404:
-                        mark_agent_deleted_404(store, agent_name=name, observed_at=observed_at, dry_run=args.dry_run)
+                        mark_agent_deleted_404(session, agent_name=name, observed_at=observed_at, dry_run=args.dry_run)
                         print(f"[deleted][agent] {name}: inferred via 404")
                         # also stamp fetch attempt so we don't keep re-trying this agent
-                        mark_agent_profile_fetched(store, agent_name=name, observed_at=observed_at, status="deleted_404", error_code=404, dry_run=args.dry_run)
+                        mark_agent_profile_fetched(session, agent_name=name, observed_at=observed_at, status="deleted_404", error_code=404, dry_run=args.dry_run)
                         continue
                     raise
 
                 # record that we fetched the profile (even if no owner/x handle)
-                mark_agent_profile_fetched(store, agent_name=name, observed_at=observed_at, status="ok", dry_run=args.dry_run)
+                mark_agent_profile_fetched(session, agent_name=name, observed_at=observed_at, status="ok", dry_run=args.dry_run)
                 agent_obj = prof.get("agent") or {}
                 if not isinstance(agent_obj, dict) or not agent_obj:
                     skipped_no_owner += 1
-                    mark_agent_profile_fetched(store, agent_name=name, observed_at=observed_at, status="no_agent_obj", dry_run=args.dry_run)
+                    mark_agent_profile_fetched(session, agent_name=name, observed_at=observed_at, status="no_agent_obj", dry_run=args.dry_run)
                     continue
 
                 owner = pick_owner(agent_obj)
                 if not owner:
                     skipped_no_owner += 1
-                    mark_agent_profile_fetched(store, agent_name=name, observed_at=observed_at, status="no_owner", dry_run=args.dry_run)
+                    mark_agent_profile_fetched(session, agent_name=name, observed_at=observed_at, status="no_owner", dry_run=args.dry_run)
                     continue
 
                 handle = clean_handle(owner.get("x_handle") or owner.get("xHandle"))
                 if not handle:
                     skipped_no_handle += 1
-                    mark_agent_profile_fetched(store, agent_name=name, observed_at=observed_at, status="no_x_handle", dry_run=args.dry_run)
+                    mark_agent_profile_fetched(session, agent_name=name, observed_at=observed_at, status="no_x_handle", dry_run=args.dry_run)
                     continue
 
-                upsert_owner_link(
-                    store,
-                    agent_name=name,
-                    handle=handle,
-                    observed_at=observed_at,
-                    owner=owner,
-                    dry_run=args.dry_run,
-                )
-                linked += 1
+                pending.append(owner_link_row(agent_name=name, handle=handle, owner=owner))
+                if len(pending) >= args.write_batch:
+                    flush()
 
             except KeyboardInterrupt:
                 raise
@@ -322,12 +380,16 @@ def main() -> int:
                 print(f"[error] agent={name}: {e}", file=sys.stderr)
 
             if args.print_every > 0 and i % args.print_every == 0:
-                print(f"[backfill] {i}/{len(names)} linked={linked} no_owner={skipped_no_owner} no_handle={skipped_no_handle} errors={errors}")
+                print(f"[backfill] {i}/{args.limit} linked={linked} no_owner={skipped_no_owner} no_handle={skipped_no_handle} errors={errors}")
 
     finally:
+        # also on Ctrl-C: links already fetched are still written
+        flush()
+        cands.close()  # releases the candidate read session if the loop stopped early
+        session.close()
         store.close()
 
-    print(f"[done] linked={linked} no_owner={skipped_no_owner} no_handle={skipped_no_handle} errors={errors}")
+    print(f"[done] candidates={i} linked={linked} no_owner={skipped_no_owner} no_handle={skipped_no_handle} errors={errors}")
     return 0
 
 
@@ -2,15 +2,17 @@ import os
 import time
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 import inspect
 import random
-from email.utils import parsedate_to_datetime
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from moltbook_client import MoltbookClient
-from neo4j_store import Neo4jStore
+from moltbook_client import CircuitOpenError, MoltbookClient, json_loads
+from neo4j_store import SUBMOLT_FIELDS, Neo4jStore, submolt_fields
 
 
 
@@ -40,11 +42,37 @@ def submolt_name(sub: Any) -> Optional[str]:
     return None
 
 
+class SubmoltRec:
+    """
+    A submolt discovered from posts, kept for the whole crawl. Only the fields
+    upsert_submolts persists are kept (slots, not the full API dict); as_dict() feeds it.
+    """
+
+    __slots__ = SUBMOLT_FIELDS
+
+    def __init__(self, name: str):
+        for k in SUBMOLT_FIELDS:
+            setattr(self, k, None)
+        self.name = name
+
+    def update(self, sub: Dict[str, Any]) -> None:
+        # richest wins: later non-null values fill in / override
+        for k, v in submolt_fields(sub).items():
+            if v is not None:
+                setattr(self, k, v)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: v for k in SUBMOLT_FIELDS if (v := getattr(self, k)) is not None}
+
+
 def norm_post_for_store(p: Dict[str, Any]) -> Dict[str, Any]:
-    """Ensure p['submolt'] is a string name so Neo4j doesn't try to store maps."""
-    p2 = dict(p)
-    p2["submolt"] = submolt_name(p.get("submolt"))
-    return p2
+    """
+    Ensure p['submolt'] is a string name so Neo4j doesn't try to store maps.
+    IN PLACE (no copy per post): posts are fresh API dicts, and callers read the submolt
+    dict (submolts_seen discovery) before queueing them.
+    """
+    p["submolt"] = submolt_name(p.get("submolt"))
+    return p
 
 
 def extract_author_name(obj: Dict[str, Any]) -> Optional[str]:
@@ -59,13 +87,27 @@ def extract_author_name(obj: Dict[str, Any]) -> Optional[str]:
 
 
 def collect_authors_from_comments(tree: List[Dict[str, Any]], out: Set[str]) -> None:
-    for c in tree or []:
-        n = extract_author_name(c)
-        if n:
-            out.add(n)
-        replies = c.get("replies") or []
-        if isinstance(replies, list) and replies:
-            collect_authors_from_comments(replies, out)
+    # Iterative (no recursion limit on deep threads); extract_author_name inlined per node
+    stack = list(tree or ())
+    while stack:
+        c = stack.pop()
+        a = c.get("author")
+        if isinstance(a, dict):
+            a = a.get("name")
+        elif not isinstance(a, str):
+            a = c.get("author_name")
+        if a and isinstance(a, str):
+            out.add(a)
+        replies = c.get("replies")
+        if replies and isinstance(replies, list):
+            stack.extend(replies)
+
+
+# Resolved once at import: inspect.signature() is too slow to call per upsert
+try:
+    _UPSERT_AGENTS_MARKS_PROFILE = "mark_profile" in inspect.signature(Neo4jStore.upsert_agents).parameters
+except (TypeError, ValueError):
+    _UPSERT_AGENTS_MARKS_PROFILE = False
 
 
 def upsert_agents_profile_aware(store: Neo4jStore, agents: List[Dict[str, Any]], observed_at: str) -> None:
@@ -76,65 +118,51 @@ def upsert_agents_profile_aware(store: Neo4jStore, agents: List[Dict[str, Any]],
     """
     if not agents:
         return
-    try:
-        sig = inspect.signature(store.upsert_agents)
-        if "mark_profile" in sig.parameters:
-            store.upsert_agents(agents, observed_at, mark_profile=True)  # type: ignore[arg-type]
-        else:
-            store.upsert_agents(agents, observed_at)
-    except TypeError:
+    if _UPSERT_AGENTS_MARKS_PROFILE:
+        store.upsert_agents(agents, observed_at, mark_profile=True)  # type: ignore[arg-type]
+    else:
         store.upsert_agents(agents, observed_at)
 
 
 # --------------------------
 # Public GET wrapper (no Authorization header)
 # --------------------------
+def _spread(wait: float) -> float:
+    # Server-given waits end at the same instant for every worker; add up to +25%
+    return wait * (1.0 + 0.25 * random.random())
+
+
 def _retry_delay_seconds(r: requests.Response, attempt: int, backoff: float) -> float:
     """
-    Prefer Retry-After, then X-RateLimit-Reset / RateLimit-Reset.
-    Supports:
-      - Retry-After: <seconds>
-      - Retry-After: <http-date>
-      - X-RateLimit-Reset: epoch seconds / epoch ms / delta seconds
+    Prefer Retry-After (seconds or HTTP-date), then X-RateLimit-Reset / RateLimit-Reset
+    (epoch seconds / epoch ms / delta seconds); both parsed by MoltbookClient.
     """
-    now = time.time()
-
     retry_after = r.headers.get("Retry-After")
-    if retry_after:
-        # numeric seconds
-        try:
-            return max(float(retry_after), 1.0)
-        except ValueError:
-            pass
+    wait = MoltbookClient._retry_after_seconds(retry_after) if retry_after else None
+    if wait is None:
+        reset = MoltbookClient._reset_seconds(r.headers)
+        if reset:
+            wait = max(reset, 1.0)
+    if wait is not None:
+        return _spread(wait)
 
-        # HTTP date
-        try:
-            dt = parsedate_to_datetime(retry_after)
-            return max(dt.timestamp() - now, 1.0)
-        except Exception:
-            pass
+    # fallback exponential backoff, jittered proportionally (x0.5..1.5) so concurrent
+    # workers that failed together don't retry in lockstep
+    return min(backoff * (2 ** (attempt - 1)), 300.0) * random.uniform(0.5, 1.5)
 
-    reset = r.headers.get("X-RateLimit-Reset") or r.headers.get("RateLimit-Reset")
-    if reset:
-        try:
-            val = float(reset)
+_SESSION: Optional[requests.Session] = None
 
-            # epoch in milliseconds
-            if val > 1e12:
-                val = val / 1000.0
 
-            # epoch in seconds
-            if val > now + 1:
-                return max(val - now, 1.0)
+def _fallback_session() -> requests.Session:
+    """Shared pooled Session for clients that don't expose one (older MoltbookClient)."""
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("POOL_MAXSIZE", "32")), max_retries=0)
+        _SESSION.mount("https://", adapter)
+        _SESSION.mount("http://", adapter)
+    return _SESSION
 
-            # otherwise assume it's a delta
-            if val > 0:
-                return max(val, 1.0)
-        except Exception:
-            pass
-
-    # fallback exponential backoff + jitter
-    return min(backoff * (2 ** (attempt - 1)) + random.uniform(0, 1), 300.0)
 
 def public_get_json(client: MoltbookClient, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
@@ -147,52 +175,124 @@ def public_get_json(client: MoltbookClient, path: str, params: Optional[Dict[str
     ua = getattr(client, "ua", os.getenv("USER_AGENT", "MoltGraphCrawler/0.1"))
 
     url = f"{base}{path}"
-    headers = {
+    # The client's unauthenticated headers (they already carry Cache-Control: no-cache
+    # unless HTTP_CACHE revalidation is on), so both paths ask for the same thing.
+    headers = getattr(client, "_base_headers", None) or {
         "User-Agent": ua,
         "Accept": "application/json",
         "Cache-Control": "no-cache",
         "Pragma": "no-cache",
     }
+    # Reuse the client's pooled keep-alive Session instead of a new TCP+TLS handshake per call
+    session = getattr(client, "session", None) or _fallback_session()
 
     max_tries = int(os.getenv("HTTP_MAX_TRIES", "10"))
     base_backoff = float(os.getenv("HTTP_BACKOFF_SECONDS", "2.0"))
 
-    req_params = dict(params or {})
-    timeout = int(os.getenv("HTTP_TIMEOUT", "60"))
+    # Not copied: only the 429 limit reduction below changes it, copy-on-write
+    req_params = params or {}
+    # The client's (connect, read) pair: a dead host fails in seconds, a slow body still gets time
+    timeout = getattr(client, "_timeout", None) or (float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")), float(os.getenv("HTTP_READ_TIMEOUT", "60")))
+
+    # Share the client's circuit breaker with _req: during an upstream outage every worker
+    # fails fast (CircuitOpenError) instead of each burning its own retries.
+    cb_check = getattr(client, "_cb_check", None)
+    cb_success = getattr(client, "_cb_success", None)
+    cb_failure = getattr(client, "_cb_failure", None)
+    cb_release = getattr(client, "_cb_release", None)
+    # X-RateLimit-Remaining/Reset pacing, shared with _req through the client's token bucket
+    observe_rate_limit = getattr(client, "_observe_rate_limit", None)
+
+    probe = False  # True while this call is the breaker's half-open probe
+    try:
+        for attempt in range(1, max_tries + 1):
+            if cb_check:
+                probe = cb_check(probe)
+            try:
+                client._sleep_if_needed()  # type: ignore[attr-defined]
+            except Exception as e:
+                print(f"[http] limiter warning: {e}")
 
-    for attempt in range(1, max_tries + 1):
-        try:
-            client._sleep_if_needed()  # type: ignore[attr-defined]
-        except Exception as e:
-            print(f"[http] limiter warning: {e}")
+            try:
+                r = session.get(url, headers=headers, params=req_params, timeout=timeout)
+            except requests.exceptions.RequestException:
+                if cb_failure:
+                    cb_failure()
+                raise
+
+            if observe_rate_limit:
+                observe_rate_limit(r)
+
+            if r.status_code in (429, 502, 503, 504):
+                wait = _retry_delay_seconds(r, attempt, base_backoff)
+
+                # On repeated 429s for large post pages, reduce limit adaptively
+                if r.status_code == 429 and path == "/posts":
+                    lim = req_params.get("limit")
+                    if isinstance(lim, int) and lim > 100:
+                        new_lim = max(lim // 2, 100)
+                        if new_lim != lim:
+                            req_params = {**req_params, "limit": new_lim}
+                            print(f"[http] 429 on {path}; reducing limit {lim} -> {new_lim}")
+
+                if attempt < max_tries:
+                    print(f"[http] retryable {r.status_code} on {path}; sleeping {wait:.1f}s (attempt {attempt}/{max_tries})")
+                    time.sleep(wait)
+                    continue
 
-        r = requests.get(url, headers=headers, params=req_params, timeout=timeout)
+            # This call's final answer counts once toward the breaker, as in MoltbookClient._req:
+            # 5xx (incl. exhausted retries) is a failure, 2xx/3xx a success; 4xx leaves it as is.
+            if r.status_code >= 500:
+                if cb_failure:
+                    cb_failure()
+            elif r.status_code < 400 and cb_success:
+                cb_success()
 
-        if r.status_code in (429, 502, 503, 504):
-            wait = _retry_delay_seconds(r, attempt, base_backoff)
+            if r.status_code == 401:
+                raise PermissionError("401 Unauthorized on public_get_json")
 
-            # On repeated 429s for large post pages, reduce limit adaptively
-            if r.status_code == 429 and path == "/posts":
-                lim = req_params.get("limit")
-                if isinstance(lim, int) and lim > 100:
-                    new_lim = max(lim // 2, 100)
-                    if new_lim != lim:
-                        req_params["limit"] = new_lim
-                        print(f"[http] 429 on {path}; reducing limit {lim} -> {new_lim}")
+            r.raise_for_status()
+            return json_loads(r.content)
 
-            if attempt < max_tries:
-                print(f"[http] retryable {r.status_code} on {path}; sleeping {wait:.1f}s (attempt {attempt}/{max_tries})")
-                time.sleep(wait)
-                continue
+        r.raise_for_status()
+        return {}
+    finally:
+        if cb_release:
+            cb_release(probe)
 
-        if r.status_code == 401:
-            raise PermissionError("401 Unauthorized on public_get_json")
 
-        r.raise_for_status()
-        return r.json()
+# `shuffle` cache-buster query param. Single-object GETs (post detail, moderators) skip it
+# unless CACHE_BUST=1: they already send Cache-Control: no-cache, and with HTTP_CACHE=1 an
+# unchanged object revalidates as a body-less 304 instead of a full download. Listing pages
+# keep it by default (LIST_CACHE_BUST=1) because CDNs have been seen ignoring `offset`.
+_CACHE_BUST = os.getenv("CACHE_BUST", "0") == "1"
+_LIST_CACHE_BUST = os.getenv("LIST_CACHE_BUST", "1") == "1"
+
+
+def cache_bust(params: Optional[Dict[str, Any]] = None, *, listing: bool = False) -> Dict[str, Any]:
+    params = params if params is not None else {}
+    if _LIST_CACHE_BUST if listing else _CACHE_BUST:
+        params["shuffle"] = int(time.time() * 1000)
+    return params
+
+
+def circuit_cooldown(client: MoltbookClient) -> float:
+    """Seconds left before the client's open circuit breaker lets a probe through (>= 1s)."""
+    return max(getattr(client, "_cb_open_until", 0.0) - time.monotonic(), 1.0)
 
-    r.raise_for_status()
-    return {}
+
+def id_set(capacity: int) -> Any:
+    """
+    A set of ids for `in` / add() / update(). With capacity > 0 it's an rbloom Bloom filter
+    (SEEN_IDS_ERROR_RATE false positives, ~2.4 bytes per id instead of ~100+ for a str in a
+    set): for crawls too big to track exactly. A false positive just treats a post as
+    already seen / already commented this run (the backfill scripts catch those).
+    """
+    if capacity <= 0:
+        return set()
+    from rbloom import Bloom
+
+    return Bloom(capacity, float(os.getenv("SEEN_IDS_ERROR_RATE", "1e-4")))
 
 
 def get_comments_any(client: MoltbookClient, post_id: str, sort: str, limit: int) -> List[Dict[str, Any]]:
@@ -213,6 +313,25 @@ def get_comments_any(client: MoltbookClient, post_id: str, sort: str, limit: int
     return []
 
 
+def get_post_detail(client: MoltbookClient, post_id: str) -> Optional[Dict[str, Any]]:
+    """GET /posts/:id (public); the post dict (with its nested `comments` tree) or None."""
+    det = public_get_json(client, f"/posts/{post_id}", params=cache_bust())
+    post_obj = det.get("post") if isinstance(det, dict) else None
+    return post_obj if isinstance(post_obj, dict) else None
+
+
+def get_moderators_any(client: MoltbookClient, name: str) -> List[Dict[str, Any]]:
+    """
+    Try public first, then auth fallback.
+    """
+    try:
+        resp = public_get_json(client, f"/submolts/{name}/moderators", params=cache_bust())
+        mods = resp.get("moderators", []) if isinstance(resp, dict) else []
+    except PermissionError:
+        mods = client.get_moderators(name)
+    return mods if isinstance(mods, list) else []
+
+
 # --------------------------
 # Main
 # --------------------------
@@ -224,7 +343,11 @@ def main():
         os.environ["NEO4J_PASSWORD"],
     )
 
-    crawl_id = f"full:{uuid.uuid4()}"
+    # CRAWL_ID=<id of an unfinished crawl> resumes it: begin_crawl MERGEs the Crawl node, so
+    # every view / submolt feed restarts from its posts_offset_* checkpoint (each written only
+    # after that page's posts and comment trees are committed). The profile phase resumes via
+    # PROFILE_TTL_DAYS: agents written before the interruption are skipped as fresh.
+    crawl_id = os.getenv("CRAWL_ID") or f"full:{uuid.uuid4()}"
     cutoff = iso_now()
     observed_at = iso_now()
 
@@ -233,6 +356,8 @@ def main():
     # --------------------------
     fetch_post_details = os.getenv("FETCH_POST_DETAILS", "0") == "1"
     scrape_html = os.getenv("SCRAPE_AGENT_HTML", "0") == "1"
+    # html_scrape's Session keeps requests' default 10 connections per host
+    scrape_workers = max(int(os.getenv("SCRAPE_WORKERS", "8")), 1)
 
     crawl_comments = os.getenv("CRAWL_COMMENTS", "1") == "1"
     comments_limit_per_post = int(os.getenv("COMMENTS_LIMIT_PER_POST", "200"))
@@ -250,12 +375,23 @@ def main():
 
     fetch_agent_profiles = os.getenv("FETCH_AGENT_PROFILES", "1") == "1"
     profile_limit = int(os.getenv("PROFILE_LIMIT", "0"))  # 0 = no cap
+    # Skip agents whose profile was fetched within this many days (any earlier run); 0 = refetch all
+    profile_ttl_days = int(os.getenv("PROFILE_TTL_DAYS", "7"))
+
+    # Concurrent GETs for the per-post / per-submolt / per-agent fan-outs (client.map/imap;
+    # 0 = client default min(POOL_MAXSIZE, REQUESTS_PER_MINUTE)). The token bucket still
+    # caps global RPM: this only overlaps round-trips.
+    workers = int(os.getenv("CRAWL_WORKERS", "0")) or None
+    # Posts / agent profiles buffered per Neo4j write (one UNWIND batch set, one commit)
+    write_batch_size = max(int(os.getenv("WRITE_BATCH_SIZE", "1000")), 1)
 
     # posts paging controls
     page = int(os.getenv("POSTS_PAGE_SIZE", "1000"))
     max_stale_pages = int(os.getenv("MAX_STALE_PAGES", "4"))  # stop if offset ignored (no new IDs)
     max_repeat_pages = int(os.getenv("MAX_REPEAT_PAGES", "2"))  # stop if same signature repeats
     max_pages = int(os.getenv("POSTS_MAX_PAGES", "0"))  # 0 = no cap
+    # An open circuit breaker pauses a listing at its offset; give up on it after this many waits in a row
+    max_circuit_waits = int(os.getenv("MAX_CIRCUIT_WAITS", "30"))
 
     # Additional "views" (sort,time) to widen coverage even if paging is flaky.
     # (Undocumented but used in other crawlers; safe if ignored by API.)
@@ -282,6 +418,7 @@ def main():
         ]
 
     store.begin_crawl(crawl_id, mode="full", cutoff_iso=cutoff)
+    print(f"[crawl] crawl_id={crawl_id}")
 
     # 1) Save "me" (auth)
     try:
@@ -301,65 +438,199 @@ def main():
                 print(f"[submolts] wrote top slice: {len(submolts_seed)} (pagination may be ignored)")
 
             if enrich_submolts and submolts_seed:
+                # the listing can repeat a name (offset is unreliable); fetch each detail once
+                names = list(dict.fromkeys(s.get("name") for s in submolts_seed if s.get("name")))
+                if enrich_submolts_limit:
+                    names = names[:enrich_submolts_limit]
+                by_name = {s.get("name"): s for s in submolts_seed}
                 enriched: List[Dict[str, Any]] = []
-                for i, s in enumerate(submolts_seed, 1):
-                    name = s.get("name")
-                    if not name:
-                        continue
-                    if enrich_submolts_limit and len(enriched) >= enrich_submolts_limit:
-                        break
-                    try:
-                        det = public_get_json(client, f"/submolts/{name}")
+                details = client.imap(lambda n: public_get_json(client, f"/submolts/{n}"), names, workers=workers, return_exceptions=True)
+                for i, (name, det) in enumerate(zip(names, details), 1):
+                    if isinstance(det, dict):
                         # shape can be {"submolt": {...}} or directly {...}
-                        enriched.append(det.get("submolt") if isinstance(det, dict) else s)  # type: ignore[union-attr]
-                    except Exception:
-                        enriched.append(s)
+                        enriched.append(det.get("submolt") or det)
+                    else:
+                        enriched.append(by_name[name])
                     if i % 50 == 0:
-                        print(f"[submolts] enriched {i}/{len(submolts_seed)}")
+                        print(f"[submolts] enriched {i}/{len(names)}")
                 if enriched:
                     store.upsert_submolts(enriched, observed_at)
         except Exception as e:
             print(f"[submolts] seed slice failed: {e}")
 
     # 3) Crawl posts (public) — multi-view scan + robust stop conditions
-    seen_post_ids: Set[str] = set()
-    commented_post_ids: Set[str] = set()
-    # In-batch cache: post_id -> nested comment tree from /posts/:id
-    post_comments_cache: Dict[str, List[Dict[str, Any]]] = {}
+    # SEEN_IDS_BLOOM_CAPACITY > 0 swaps the exact sets for Bloom filters (see id_set)
+    bloom_capacity = int(os.getenv("SEEN_IDS_BLOOM_CAPACITY", "0"))
+    seen_post_ids = id_set(bloom_capacity)
+    commented_post_ids = id_set(bloom_capacity)
+    # Posts are detailed once per run, by the first view that sees them; a failed detail
+    # fetch is parked here so the next view showing the post retries it
+    detail_retry_ids: Set[str] = set()
+    # Same for comment fetches that raised: the post stays claimable (commented_post_ids may
+    # be a Bloom filter, which can't un-add)
+    comment_retry_ids: Set[str] = set()
     seen_agents: Set[str] = set()
-    submolts_seen: Dict[str, Dict[str, Any]] = {}
+    submolts_seen: Dict[str, SubmoltRec] = {}
     comments_posts_with_tree = 0
 
     written_total = 0
 
-    for (sort, time_window) in views:
-        offset = store.get_checkpoint(crawl_id, f"posts_offset_{sort}_{time_window or 'na'}")
+    # Write buffers, flushed every write_batch_size posts/agents and before anything that MATCHes
+    # their nodes. Checkpoints are held back until the data behind them is written.
+    pending_posts: List[Dict[str, Any]] = []
+    pending_trees: List[Tuple[str, List[Dict[str, Any]]]] = []
+    pending_agents: List[Dict[str, Any]] = []  # fetched profiles (stamps profile_last_fetched_at)
+    pending_mod_agents: List[Dict[str, Any]] = []  # moderator payloads (not profile fetches)
+    pending_checkpoints: Dict[str, int] = {}
+    _norm = norm_post_for_store  # bound once: called for every queued post
+
+    # Writes run on one writer thread (the store gives it its own session) so the crawl
+    # keeps fetching while a batch is committed. One batch in flight: the next flush waits
+    # for it (bounding memory, keeping writes in order); flush_writes() waits for both.
+    writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl-writer")
+    inflight: Optional[Future] = None
+    # Concurrent views swap the buffers out under state_lock but submit outside it; batches
+    # are numbered when taken and submitted in that order, so a checkpoint never lands
+    # before the posts queued ahead of it.
+    write_turn = threading.Condition()
+    batches_taken = 0
+    batches_submitted = 0
+
+    stalled_checkpoints: Set[str] = set()  # touched only by the writer thread
+
+    def write_batch(
+        posts: List[Dict[str, Any]],
+        trees: List[Tuple[str, List[Dict[str, Any]]]],
+        mod_agents: List[Dict[str, Any]],
+        agents: List[Dict[str, Any]],
+        checkpoints: Dict[str, int],
+    ) -> None:
+        comments_ok = True
+        if posts or trees:
+            try:
+                # posts first, then their comments, in one transaction
+                store.upsert_posts_with_comments(posts, trees, observed_at)
+            except Exception as e:
+                print(f"[write][WARN] posts+comments transaction failed ({e}); retrying separately")
+                store.upsert_posts(posts, observed_at)
+                try:
+                    store.upsert_comments_bulk(trees, observed_at)
+                except Exception as e2:
+                    print(f"[comments][ERROR] failed: {e2}")
+                    comments_ok = False
+        if mod_agents:
+            store.upsert_agents(mod_agents, observed_at)
+        if agents:
+            upsert_agents_profile_aware(store, agents, observed_at)
+        if not comments_ok:
+            # pin these checkpoints for the rest of the run so a resumed crawl re-covers the posts
+            stalled_checkpoints.update(checkpoints)
+            print(f"[checkpoint][WARN] not advancing {sorted(checkpoints)} after the comment write failed")
+        for key, value in checkpoints.items():
+            if key not in stalled_checkpoints:
+                store.set_checkpoint(crawl_id, key, value)
+
+    def drain() -> None:
+        nonlocal inflight
+        if inflight is not None:
+            f, inflight = inflight, None
+            f.result()  # re-raises a failed write here
+
+    def take_pending() -> Optional[Tuple[int, Tuple[Any, ...]]]:
+        """Swap the write buffers out as one numbered batch (None if empty). Cheap: no I/O."""
+        nonlocal batches_taken
+        if not (pending_posts or pending_trees or pending_mod_agents or pending_agents or pending_checkpoints):
+            return None
+        batch = (pending_posts[:], pending_trees[:], pending_mod_agents[:], pending_agents[:], dict(pending_checkpoints))
+        pending_posts.clear()
+        pending_trees.clear()
+        pending_agents.clear()
+        pending_mod_agents.clear()
+        pending_checkpoints.clear()
+        batches_taken += 1
+        return batches_taken - 1, batch
+
+    def take_if_full() -> Optional[Tuple[int, Tuple[Any, ...]]]:
+        if len(pending_posts) >= write_batch_size or len(pending_agents) + len(pending_mod_agents) >= write_batch_size:
+            return take_pending()
+        return None
+
+    def submit_batch(taken: Optional[Tuple[int, Tuple[Any, ...]]], wait: bool = True) -> None:
+        """Hand a taken batch to the writer (in take order, after the previous one commits)."""
+        nonlocal inflight, batches_submitted
+        with write_turn:
+            if taken is not None:
+                seq, batch = taken
+                write_turn.wait_for(lambda: batches_submitted == seq)
+                try:
+                    drain()
+                    inflight = writer.submit(write_batch, *batch)
+                finally:
+                    batches_submitted += 1
+                    write_turn.notify_all()
+            if wait:
+                drain()
+
+    def flush_writes(wait: bool = True) -> None:
+        submit_batch(take_pending(), wait)
+
+    def flush_if_full() -> None:
+        submit_batch(take_if_full(), wait=False)
+
+    # Views are independent (own paging, own checkpoint key), so several run at once. HTTP
+    # and DB writes happen outside state_lock; claiming ids, updating the shared sets/counters
+    # and queueing writes happen under it, so each post is detailed/commented by one view only.
+    state_lock = threading.Lock()
+    view_workers = max(1, min(int(os.getenv("VIEW_WORKERS", "4")), len(views)))
+    # concurrent views share the client's connection pool: split the per-item fan-out
+    view_fanout = workers or (max(1, getattr(client, "pool_maxsize", 32) // view_workers) if view_workers > 1 else None)
+
+    def crawl_view(sort: str, time_window: Optional[str]) -> None:
+        nonlocal written_total, comments_posts_with_tree
+        key = f"posts_offset_{sort}_{time_window or 'na'}"
+        label = f"sort={sort} time={time_window or '-'}"
+        offset = store.get_checkpoint(crawl_id, key)
         stale_pages = 0
         repeat_pages = 0
         prev_sig = None
         pages = 0
+        circuit_waits = 0
 
-        print(f"[posts] view sort={sort} time={time_window or '-'} starting offset={offset} page={page}")
+        print(f"[posts] view {label} starting offset={offset} page={page}")
+
+        # loop-invariant part of the query; each page only adds offset (+ shuffle)
+        base_params: Dict[str, Any] = {"sort": sort, "limit": page}
+        if time_window:
+            base_params["time"] = time_window
 
         while True:
-            params: Dict[str, Any] = {"sort": sort, "limit": page, "offset": offset}
-            if time_window:
-                params["time"] = time_window
+            params = {**base_params, "offset": offset}
             # cache-buster: helps when CDN ignores offset
-            params["shuffle"] = int(time.time() * 1000)
+            cache_bust(params, listing=True)
 
             try:
                 resp = public_get_json(client, "/posts", params=params)
             except PermissionError:
                 # fallback to auth if public blocked
                 resp = client.list_posts(sort=sort, limit=page, offset=offset)
+            except CircuitOpenError as e:
+                # upstream outage: sit out the cooldown, then retry this same offset
+                circuit_waits += 1
+                if circuit_waits > max_circuit_waits:
+                    print(f"[posts] circuit still open after {max_circuit_waits} waits; stopping view {label}")
+                    break
+                wait = circuit_cooldown(client)
+                print(f"[posts] {label} offset={offset}: {e}; retrying in {wait:.1f}s")
+                time.sleep(wait)
+                continue
             except Exception as e:
-                print(f"[posts] fetch failed sort={sort} time={time_window or '-'} offset={offset}: {e}")
+                print(f"[posts] fetch failed {label} offset={offset}: {e}")
                 break
+            circuit_waits = 0
 
             batch = _as_list(resp, "posts", "data")
             if not batch:
-                print("[posts] empty batch; stopping view")
+                print(f"[posts] empty batch; stopping view {label}")
                 break
 
             # signature of first 10 IDs to detect "same page again"
@@ -370,90 +641,109 @@ def main():
                 repeat_pages = 0
             prev_sig = sig
 
-            # Enrich new posts only
-            new_batch: List[Dict[str, Any]] = []
+            # One pass over the page: discovery, plus which posts need details / comments
             new_ids = 0
-            new_post_ids_this_page: Set[str] = set()
-
-            for p in batch:
-                pid = p.get("id")
-                if not pid:
-                    continue
-                if pid not in seen_post_ids:
-                    seen_post_ids.add(pid)
-                    new_ids += 1
-                    new_post_ids_this_page.add(pid)
-
-                # submolt discovery
-                sub = p.get("submolt")
-                nm = submolt_name(sub)
-                if nm:
-                    if isinstance(sub, dict):
-                        # keep richest dict we have seen for that name
-                        submolts_seen[nm] = {**submolts_seen.get(nm, {"name": nm}), **sub}
-                    else:
-                        submolts_seen.setdefault(nm, {"name": nm})
+            detail_ids: List[str] = []  # first seen (this run) by this view: enrich via /posts/:id
+            todo: List[str] = []  # comments not fetched by any view yet
 
-                # author discovery
-                an = extract_author_name(p)
-                if an:
-                    seen_agents.add(an)
-
-            if fetch_post_details:
-                # enrich only posts we haven't seen before in this run (new_ids gate above isn't per-post),
-                # so we re-check within the loop
+            with state_lock:
                 for p in batch:
                     pid = p.get("id")
                     if not pid:
                         continue
-
-                    # Do NOT re-fetch details for posts we've already seen earlier
-                    if pid not in new_post_ids_this_page:
-                        new_batch.append(p)
-                        continue
-
-                    try:
-                        det = public_get_json(client, f"/posts/{pid}", params={"shuffle": int(time.time() * 1000)})
-                        post_obj = det.get("post") if isinstance(det, dict) else None
-                        new_batch.append(post_obj or p)
-
-                        if crawl_comments and comments_from_post_details and pid not in commented_post_ids:
-                            if isinstance(post_obj, dict):
-                                tree = post_obj.get("comments")
-                                if isinstance(tree, list) and tree:
-                                    post_comments_cache[pid] = tree
-                    except Exception as e:
-                        print(f"[posts][detail] failed pid={pid}: {e}")
-                        new_batch.append(p)
-            else:
-                new_batch = batch
-
-            # Write posts
-            store.upsert_posts([norm_post_for_store(p) for p in new_batch], observed_at)
-            written_total += len(batch)            # Comments: fetch at most once per post ID
-            if crawl_comments:
+                    if pid not in seen_post_ids:
+                        seen_post_ids.add(pid)
+                        new_ids += 1
+                        if fetch_post_details:
+                            detail_ids.append(pid)
+                    elif pid in detail_retry_ids:
+                        detail_retry_ids.discard(pid)
+                        detail_ids.append(pid)
+
+                    # Comments: fetch at most once per post ID (claimed here, across views)
+                    if crawl_comments and pid not in commented_post_ids:
+                        commented_post_ids.add(pid)
+                        todo.append(pid)
+                    elif pid in comment_retry_ids:
+                        comment_retry_ids.discard(pid)
+                        todo.append(pid)
+
+                    # submolt discovery
+                    sub = p.get("submolt")
+                    nm = submolt_name(sub)
+                    if nm:
+                        # keep the richest record we have seen for that name
+                        rec = submolts_seen.get(nm)
+                        if rec is None:
+                            rec = submolts_seen[nm] = SubmoltRec(nm)
+                        if isinstance(sub, dict):
+                            rec.update(sub)
+
+                    # author discovery
+                    an = extract_author_name(p)
+                    if an:
+                        seen_agents.add(an)
+
+            # In-page cache: post_id -> nested comment tree from /posts/:id. Page-local (freed
+            # every page) and only for posts whose comments this view claimed, so nothing lingers.
+            post_comments_cache: Dict[str, List[Dict[str, Any]]] = {}
+            cache_trees = crawl_comments and comments_from_post_details
+            claimed = set(todo) if cache_trees else ()
+            new_batch = batch
+            detail_set = set(detail_ids)
+            # Comments that this page's /posts/:id trees can't serve don't depend on the
+            # details, so they go out in the same client.map wave instead of after it.
+            early = [pid for pid in todo if not (cache_trees and pid in detail_set)]
+            results = client.map(
+                lambda job: get_post_detail(client, job[1]) if job[0]
+                else get_comments_any(client, job[1], sort="new", limit=comments_limit_per_post),
+                [(True, pid) for pid in detail_ids] + [(False, pid) for pid in early],
+                workers=view_fanout, return_exceptions=True,
+            )
+            trees = dict(zip(early, results[len(detail_ids):]))
+            if detail_ids:
+                # details are merged back in page order; posts seen earlier are NOT re-fetched
+                # and keep their list payload
+                details = dict(zip(detail_ids, results))
+                new_batch = []
+                failed: List[str] = []
                 for p in batch:
                     pid = p.get("id")
-                    if not pid or pid in commented_post_ids:
-                        continue
-
-                    # 1) Prefer cached full tree from /posts/:id (when FETCH_POST_DETAILS=1)
-                    tree = post_comments_cache.pop(pid, None)
-                    if not tree:
-                        # 2) Fallback: /posts/:id/comments (NOTE: server-side hard limit; may be incomplete)
-                        try:
-                            tree = get_comments_any(client, pid, sort="new", limit=comments_limit_per_post)
-                        except Exception:
-                            tree = None
-
-                    commented_post_ids.add(pid)
-                    if tree:
-                        try:
-                            store.upsert_comments(pid, tree, observed_at)
-                            collect_authors_from_comments(tree, seen_agents)
-                            comments_posts_with_tree += 1
-                        except Exception as e:
-                            print(f"[comments][ERROR] failed: {e}")
+                    post_obj = details.get(pid) if pid else None
+                    if isinstance(post_obj, Exception):
+                        print(f"[posts][detail] failed pid={pid}: {post_obj}")
+                        failed.append(pid)
+                        post_obj = None
+                    new_batch.append(post_obj or p)
+
+                    if cache_trees and post_obj and pid in claimed:
+                        tree = post_obj.get("comments")
+                        if isinstance(tree, list) and tree:
+                            post_comments_cache[pid] = tree
+                if failed:
+                    with state_lock:
+                        detail_retry_ids.update(failed)
+
+            # 1) Prefer cached full tree from /posts/:id (when FETCH_POST_DETAILS=1)
+            late = [pid for pid in todo if pid not in trees]
+            for pid in late:
+                trees[pid] = post_comments_cache.get(pid)
+            # 2) Fallback: /posts/:id/comments (NOTE: server-side hard limit; may be incomplete)
+            missing = [pid for pid in late if not trees[pid]]
+            fetched = client.map(
+                lambda pid: get_comments_any(client, pid, sort="new", limit=comments_limit_per_post),
+                missing, workers=view_fanout, return_exceptions=True,
+            )
+            trees.update(zip(missing, fetched))
+            # a fetch that raised leaves the post claimable by a later view instead of
+            # silently dropping its comments for the run
+            comment_failed = [pid for pid, tree in trees.items() if isinstance(tree, Exception)]
+            if comment_failed:
+                for pid in comment_failed:
+                    print(f"[comments] failed pid={pid}: {trees[pid]}")
+                    trees[pid] = None
+                with state_lock:
+                    comment_retry_ids.update(comment_failed)
 
             # offset advance
             old_offset = offset
@@ -468,16 +758,32 @@ def main():
             else:
                 offset += len(batch)
 
-            store.set_checkpoint(crawl_id, f"posts_offset_{sort}_{time_window or 'na'}", offset)
-
-            first_id = batch[0].get("id")
-            last_id = batch[-1].get("id")
-            print(
-                f"[posts] wrote_total={written_total} batch={len(batch)} new_ids={new_ids} "
-                f"has_more={resp.get('has_more')} offset:{old_offset}->{offset} "
-                f"first={first_id} last={last_id} "
-                f"submolts_seen={len(submolts_seen)} agents_seen={len(seen_agents)} comments_posts_with_tree={comments_posts_with_tree}"
-            )
+            with state_lock:
+                # Queue posts (and their comment trees after them)
+                pending_posts.extend([_norm(p) for p in new_batch])
+                written_total += len(batch)
+                for pid in todo:
+                    tree = trees[pid]
+                    if tree:
+                        pending_trees.append((pid, tree))
+                        collect_authors_from_comments(tree, seen_agents)
+                        comments_posts_with_tree += 1
+
+                pending_checkpoints[key] = offset
+                full = take_if_full()
+
+                first_id = batch[0].get("id")
+                last_id = batch[-1].get("id")
+                print(
+                    f"[posts] {label} wrote_total={written_total} batch={len(batch)} new_ids={new_ids} "
+                    f"has_more={resp.get('has_more')} offset:{old_offset}->{offset} "
+                    f"first={first_id} last={last_id} "
+                    f"submolts_seen={len(submolts_seen)} agents_seen={len(seen_agents)} comments_posts_with_tree={comments_posts_with_tree}"
+                )
+
+            if full is not None:
+                # waits on the previous write, so only after state_lock is released
+                submit_batch(full, wait=False)
 
             # stop conditions
             if new_ids == 0:
@@ -487,22 +793,33 @@ def main():
 
             pages += 1
             if max_pages and pages >= max_pages:
-                print(f"[posts] reached POSTS_MAX_PAGES={max_pages}; stopping view")
+                print(f"[posts] reached POSTS_MAX_PAGES={max_pages}; stopping view {label}")
                 break
 
             if repeat_pages >= max_repeat_pages:
-                print("[posts] WARNING: same page signature repeating; stopping view to avoid infinite loop.")
+                print(f"[posts] WARNING: same page signature repeating; stopping view {label} to avoid infinite loop.")
                 break
 
             if stale_pages >= max_stale_pages:
-                print("[posts] WARNING: no new post IDs for several pages (offset likely ignored); stopping view.")
+                print(f"[posts] WARNING: no new post IDs for several pages (offset likely ignored); stopping view {label}.")
                 break
 
             if not resp.get("has_more"):
                 break
 
+    if view_workers == 1:
+        for (sort, time_window) in views:
+            crawl_view(sort, time_window)
+    else:
+        print(f"[posts] crawling {len(views)} views, {view_workers} at a time")
+        with ThreadPoolExecutor(max_workers=view_workers, thread_name_prefix="view") as ex:
+            # list() re-raises the first view's exception here
+            list(ex.map(lambda v: crawl_view(*v), views))
+
+    flush_writes()
+
     # 4) Upsert submolts discovered from posts (this is the main scaler)
-    discovered_submolts = list(submolts_seen.values())
+    discovered_submolts = [rec.as_dict() for rec in submolts_seen.values()]
     if discovered_submolts:
         store.upsert_submolts(discovered_submolts, observed_at)
         print(f"[submolts] upserted discovered from posts: {len(discovered_submolts)}")
@@ -519,6 +836,7 @@ def main():
                 names = names[:submolt_feed_limit]
             print(f"[submolt-feed] crawling feeds for {len(names)} submolts (pages={submolt_feed_max_pages}, sort={submolt_feed_sort})")
 
+            feed_params: Dict[str, Any] = {"sort": submolt_feed_sort, "limit": page}
             for sm in names:
                 key = f"submolt_feed_offset_{sm}"
                 offset = store.get_checkpoint(crawl_id, key)
@@ -526,13 +844,22 @@ def main():
                 prev_sig = None
                 repeat_pages = 0
                 stale_pages = 0
+                circuit_waits = 0
 
                 while True:
-                    params = {"sort": submolt_feed_sort, "limit": page, "offset": offset, "shuffle": int(time.time() * 1000)}
+                    params = cache_bust({**feed_params, "offset": offset}, listing=True)
                     try:
                         resp = public_get_json(client, f"/submolts/{sm}/feed", params=params)
+                    except CircuitOpenError:
+                        # same as the views: wait out the outage at this offset
+                        circuit_waits += 1
+                        if circuit_waits > max_circuit_waits:
+                            break
+                        time.sleep(circuit_cooldown(client))
+                        continue
                     except Exception:
                         break
+                    circuit_waits = 0
 
                     batch = _as_list(resp, "posts", "data")
                     if not batch:
@@ -554,12 +881,15 @@ def main():
                         sub = p.get("submolt")
                         nm = submolt_name(sub)
                         if nm and isinstance(sub, dict):
-                            submolts_seen[nm] = {**submolts_seen.get(nm, {"name": nm}), **sub}
+                            rec = submolts_seen.get(nm)
+                            if rec is None:
+                                rec = submolts_seen[nm] = SubmoltRec(nm)
+                            rec.update(sub)
                         an = extract_author_name(p)
                         if an:
                             seen_agents.add(an)
 
-                    store.upsert_posts([norm_post_for_store(p) for p in batch], observed_at)
+                    pending_posts.extend([_norm(p) for p in batch])
 
                     old_offset = offset
                     nxt = resp.get("next_offset")
@@ -573,7 +903,8 @@ def main():
                     else:
                         offset += len(batch)
 
-                    store.set_checkpoint(crawl_id, key, offset)
+                    pending_checkpoints[key] = offset
+                    flush_if_full()
 
                     print(f"[submolt-feed] {sm} batch={len(batch)} new_ids={new_ids} offset:{old_offset}->{offset} has_more={resp.get('has_more')}")
 
@@ -591,24 +922,21 @@ def main():
                         break
                     if not resp.get("has_more"):
                         break
+            flush_writes()
 
     # 5) Moderators for discovered submolts (cap calls)
     if moderators_limit > 0 and discovered_submolts:
         to_mod = discovered_submolts[:moderators_limit]
         print(f"[mods] refreshing moderators for {len(to_mod)} submolts (limit={moderators_limit})")
-        for i, s in enumerate(to_mod, 1):
-            name = s.get("name")
-            if not name:
+        mod_names = [s.get("name") for s in to_mod if s.get("name")]
+        fetched_mods = client.imap(lambda n: get_moderators_any(client, n), mod_names, workers=workers, return_exceptions=True)
+        mod_pairs: List[Tuple[str, List[Dict[str, Any]]]] = []
+        for i, (name, mods) in enumerate(zip(mod_names, fetched_mods), 1):
+            if isinstance(mods, Exception):
                 continue
             try:
-                try:
-                    resp = public_get_json(client, f"/submolts/{name}/moderators", params={"shuffle": int(time.time() * 1000)})
-                    mods = resp.get("moderators", []) if isinstance(resp, dict) else []
-                except PermissionError:
-                    mods = client.get_moderators(name)
-
                 if isinstance(mods, list) and mods:
-                    store.upsert_moderators_for_submolt(name, mods, observed_at)
+                    mod_pairs.append((name, mods))
                     # Moderator payloads can be wrapper objects like {"role": "...", "agent": {<profile>}}.
                     # Extract agent dicts / names so upserts don't silently drop them.
                     mod_agents: List[Dict[str, Any]] = []
@@ -624,7 +952,7 @@ def main():
                             mod_agents.append(mm)
                         elif isinstance(mm.get("agent_name"), str) and mm.get("agent_name"):
                             mod_agents.append({"name": mm.get("agent_name")})
-                    upsert_agents_profile_aware(store, mod_agents, observed_at)
+                    pending_mod_agents.extend(mod_agents)
                     for m in mods:
                         nm = m.get("name") or m.get("agent_name")
                         if not nm:
@@ -639,70 +967,94 @@ def main():
                 continue
             if i % 100 == 0:
                 print(f"[mods] processed {i}/{len(to_mod)}")
+            flush_if_full()
+        try:
+            # one UNWIND per batch of submolts rather than a round trip each
+            store.upsert_moderators_bulk(mod_pairs, observed_at)
+        except Exception as e:
+            print(f"[mods][WARN] bulk upsert failed: {e}")
+        flush_writes()
 
     # 6) Agent profiles
     if fetch_agent_profiles and seen_agents:
         names = sorted(seen_agents)
+        if profile_ttl_days > 0:
+            fresh = store.get_recently_profiled(names, profile_ttl_days)
+            if fresh:
+                names = [n for n in names if n not in fresh]
+                print(f"[agents] skipping {len(fresh)} agents profiled within PROFILE_TTL_DAYS={profile_ttl_days}")
         if profile_limit and len(names) > profile_limit:
             names = names[:profile_limit]
         print(f"[agents] fetching profiles for {len(names)} agents (PROFILE_LIMIT={profile_limit or 'none'})")
 
-        for i, name in enumerate(names, 1):
+        x_owners: List[Dict[str, Any]] = []
+        profiles = client.imap(client.get_agent_profile, names, workers=workers, return_exceptions=True)
+        for i, (name, prof) in enumerate(zip(names, profiles), 1):
+            if isinstance(prof, Exception):
+                continue
             try:
-                prof = client.get_agent_profile(name)
                 agent_obj = prof.get("agent", {}) or {}
                 if agent_obj:
-                    upsert_agents_profile_aware(store, [agent_obj], observed_at)
+                    pending_agents.append(agent_obj)
                     owner = agent_obj.get("owner")
                     if isinstance(owner, dict):
                         handle = owner.get("x_handle") or owner.get("xHandle")
                         if isinstance(handle, str) and handle.strip():
                             h = handle.strip().lstrip("@")
                             url = owner.get("x_url") or owner.get("xUrl") or f"https://x.com/{h}"
-                            store.upsert_x_owner(
-                                agent_obj.get("name") or name,
-                                h,
-                                url,
-                                observed_at,
-                                x_name=owner.get("x_name") or owner.get("xName"),
-                                x_avatar=owner.get("x_avatar") or owner.get("xAvatar"),
-                                x_bio=owner.get("x_bio") or owner.get("xBio"),
-                                x_follower_count=owner.get("x_follower_count") if "x_follower_count" in owner else owner.get("xFollowerCount"),
-                                x_following_count=owner.get("x_following_count") if "x_following_count" in owner else owner.get("xFollowingCount"),
-                                x_verified=owner.get("x_verified") if "x_verified" in owner else owner.get("xVerified"),
-                            )
+                            x_owners.append({
+                                "agent": agent_obj.get("name") or name,
+                                "handle": h,
+                                "url": url,
+                                "x_name": owner.get("x_name") or owner.get("xName"),
+                                "x_avatar": owner.get("x_avatar") or owner.get("xAvatar"),
+                                "x_bio": owner.get("x_bio") or owner.get("xBio"),
+                                "x_follower_count": owner.get("x_follower_count") if "x_follower_count" in owner else owner.get("xFollowerCount"),
+                                "x_following_count": owner.get("x_following_count") if "x_following_count" in owner else owner.get("xFollowingCount"),
+                                "x_verified": owner.get("x_verified") if "x_verified" in owner else owner.get("xVerified"),
+                            })
             except Exception:
                 continue
             if i % 200 == 0:
                 print(f"[agents] profiled {i}/{len(names)}")
+            flush_if_full()
+        # Agents are flushed first, so the batched MATCH finds them
+        flush_writes()
+        if x_owners:
+            store.upsert_x_owners(x_owners, observed_at)
 
     # 7) HTML scrape
     if scrape_html and seen_agents:
         from html_scrape import scrape_agent_page
 
-        print(f"[html] scraping {len(seen_agents)} agents")
-        for name in sorted(seen_agents):
+        print(f"[html] scraping {len(seen_agents)} agents (SCRAPE_WORKERS={scrape_workers})")
+        html_owners: List[Dict[str, Any]] = []
+        names = sorted(seen_agents)
+        # Fetch + parse overlap on threads; the per-agent store writes stay on this thread
+        scraped = client.imap(scrape_agent_page, names, workers=scrape_workers, return_exceptions=True)
+        for name, info in zip(names, scraped):
+            if isinstance(info, Exception):
+                continue
             try:
-                info = scrape_agent_page(name)
                 if info.get("owner_x_handle"):
-                    store.upsert_x_owner(name, info["owner_x_handle"], info.get("owner_x_url"), observed_at)
+                    html_owners.append({"agent": name, "handle": info["owner_x_handle"], "url": info.get("owner_x_url")})
                 if info.get("similar_agents"):
                     store.upsert_similar(name, info["similar_agents"], observed_at, source="html_profile")
             except Exception:
                 continue
+        if html_owners:
+            store.upsert_x_owners(html_owners, observed_at)
 
     # 8) Feed snapshot (auth)
     try:
         feed = client.get_feed(sort="hot", limit=100, offset=0)
         feed_posts = _as_list(feed, "posts", "data")
-        for p in feed_posts:
-            smn = submolt_name(p.get("submolt"))
-            if smn:
-                p["submolt"] = smn
+        # write_feed_snapshot reduces submolt dicts to their name per row itself
         store.write_feed_snapshot(crawl_id, "hot", feed_posts, observed_at)
     except Exception:
         pass
 
+    writer.shutdown(wait=True)
     store.end_crawl(crawl_id)
     store.close()
     print(f"✅ Full crawl done. crawl_id={crawl_id} cutoff={cutoff}")
@@ -1,8 +1,50 @@
 import os
+from typing import List
+
 from neo4j import GraphDatabase
 
+from neo4j_store import UNIQUE_KEYS
+
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "cypher", "schema.cypher")
 
+
+def split_statements(text: str) -> List[str]:
+    """
+    Split a Cypher script on top-level `;`. Semicolons inside '...', "...", `...`
+    and // or /* */ comments don't end a statement.
+    """
+    statements: List[str] = []
+    start = i = 0
+    n = len(text)
+    code = False  # anything but whitespace/comments since `start`
+    while i < n:
+        ch = text[i]
+        if ch in "'\"`":
+            code = True
+            i += 1
+            while i < n and text[i] != ch:
+                # backslash escapes in string literals; backticks escape by doubling
+                i += 2 if ch != "`" and text[i] == "\\" else 1
+            i += 1
+        elif text.startswith("//", i):
+            nl = text.find("\n", i)
+            i = n if nl < 0 else nl + 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+        elif ch == ";":
+            if code:
+                statements.append(text[start:i].strip())
+            i += 1
+            start = i
+            code = False
+        else:
+            code = code or not ch.isspace()
+            i += 1
+    if code:
+        statements.append(text[start:].strip())
+    return statements
+
 def main():
     uri = os.environ["NEO4J_URI"]
     user = os.environ["NEO4J_USER"]
@@ -13,10 +55,15 @@ def main():
 
     driver = GraphDatabase.driver(uri, auth=(user, pwd))
     with driver.session() as session:
-        # Split on semicolons carefully
-        statements = [s.strip() for s in schema.split(";") if s.strip()]
+        statements = split_statements(schema)
         for stmt in statements:
             session.run(stmt)
+        # Every MERGE key must be index-backed (same list as Neo4jStore.ensure_schema),
+        # even if schema.cypher drifts; IF NOT EXISTS makes these no-ops normally.
+        for name, label, prop in UNIQUE_KEYS:
+            session.run(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE").consume()
+        # Indexes populate in the background; until ONLINE, MERGE falls back to a label scan
+        session.run("CALL db.awaitIndexes(300)").consume()
     driver.close()
     print("✅ Neo4j schema applied.")
 
@@ -0,0 +1,23 @@
+from unittest import mock
+
+import requests
+
+from moltbook_client import MoltbookClient
+from scripts.full_crawl import public_get_json
+
+
+def _response(status: int, body: bytes = b"{}", headers=None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = body
+    r.headers.update(headers or {})
+    r.url = "https://example.invalid/api/v1/posts"
+    return r
+
+
+def test_public_get_json_low_remaining_puts_bucket_into_debt():
+    client = MoltbookClient()
+    r = _response(200, b'{"posts": []}', {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "30"})
+    with mock.patch.object(client.session, "get", return_value=r):
+        assert public_get_json(client, "/posts") == {"posts": []}
+    assert client._tokens < 0
@@ -0,0 +1,68 @@
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from moltbook_client import CircuitOpenError, MoltbookClient
+
+
+def _response(status: int, body: bytes = b"{}", headers=None) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r._content = body
+    r.headers.update(headers or {})
+    r.url = "https://example.invalid/api/v1/posts"
+    return r
+
+
+def _cooled_down(client: MoltbookClient) -> MoltbookClient:
+    """Trip the breaker, then let its cooldown pass so the next check goes half-open."""
+    client._cb_state = "open"
+    client._cb_trips = 1
+    client._cb_open_until = time.monotonic() - 1.0
+    return client
+
+
+def test_half_open_admits_a_single_probe():
+    client = _cooled_down(MoltbookClient())
+    assert client._cb_check() is True
+    with pytest.raises(CircuitOpenError):
+        client._cb_check()
+    client._cb_success()
+    assert client._cb_check() is False
+
+
+def test_probe_without_verdict_frees_the_slot():
+    client = _cooled_down(MoltbookClient())
+    probe = client._cb_check()
+    client._cb_release(probe)
+    assert client._cb_state == "half_open"
+    assert client._cb_check() is True
+
+
+def test_4xx_during_half_open_does_not_close_breaker():
+    client = _cooled_down(MoltbookClient())
+    with mock.patch.object(client, "_send", return_value=_response(404)):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._req("GET", "/posts/missing")
+    assert client._cb_state == "half_open"
+    assert client._cb_trips == 1
+    assert client._cb_check() is True  # the next caller may probe
+
+
+def test_posts_batch_falls_back_when_multi_id_probe_fails():
+    client = MoltbookClient()
+    calls = []
+
+    def fake_req(method, path, params=None, **kw):
+        calls.append(path)
+        if path == "/posts":
+            raise requests.exceptions.ConnectionError("connection reset")
+        return {"post": {"id": path.rsplit("/", 1)[1]}}
+
+    with mock.patch.object(client, "_req", side_effect=fake_req):
+        out = client.get_posts_batch(["a", "b"], return_exceptions=True)
+    assert out == {"a": {"id": "a"}, "b": {"id": "b"}}
+    assert client._multi_id_posts is False
+    assert calls.count("/posts") == 1